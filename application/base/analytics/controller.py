@@ -1,15 +1,20 @@
-
+import os
 from datetime import datetime, timedelta
 
+from fastapi import status
 from starlette.responses import Response
-from application.base.api_response import SuccessResponse
+from application.base.api_response import SuccessResponse, CustomException
 from starlette_context import context 
 from sqlalchemy.orm.session import Session 
 from sqlalchemy import func 
 from ...project.models import Project, Members
 from ...project.helpers import project_status_list
 from ...project import schema as ProjectSchema
-from ...utils.db_connection import get_db
+from ...utils.db_connection import get_db, get_mongodb
+from ...utils.pool_stats import mongo_pool_stats, sql_pool_stats
+from ...utils import job_ledger
+from ...utils.worker_pool import WORKER_METRICS_COLLECTION
+from ..models import Job
 
 from pprint import pprint 
 
@@ -80,4 +85,53 @@ def dashboard_information():
         "project_status": get_project_status(),
         "graph_data": get_graph_data()
     }
-    return SuccessResponse(data=data).response()
\ No newline at end of file
+    return SuccessResponse(data=data).response()
+
+
+def connection_pool_information():
+    data = {
+        "pid": os.getpid(),
+        "sql": sql_pool_stats.snapshot(),
+        "mongodb": mongo_pool_stats.snapshot()
+    }
+    return SuccessResponse(data=data).response()
+
+
+def worker_information():
+    workers = list(get_mongodb()[WORKER_METRICS_COLLECTION].find({}).sort("pool", 1))
+    data = {
+        "in_flight": sum(worker["in_flight"] for worker in workers),
+        "workers": workers
+    }
+    return SuccessResponse(data=data).response()
+
+
+def job_information(days:int = 7):
+    since = datetime.utcnow() - timedelta(days=days)
+    data = {
+        "since": since,
+        "tasks": job_ledger.task_statistics(since)
+    }
+    return SuccessResponse(data=data).response()
+
+
+def get_dead_jobs(skip:int = 0, limit:int = 50):
+    db: Session = get_db()
+    jobs = db.query(Job).filter(Job.status == Job.progress.DEAD).order_by(Job.finished_at.desc()).offset(skip).limit(limit).all()
+    data = [
+        {
+            "id": job.id, "task": job.task, "data": job.data, "attempts": job.attempts, "error": job.error,
+            "submitted_at": job.submitted_at, "finished_at": job.finished_at
+        } for job in jobs
+    ]
+    return SuccessResponse(data=data).response()
+
+
+def retry_dead_job(job_id:int):
+    from ...factory import gm_client
+    db: Session = get_db()
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if job is None or job.status != Job.progress.DEAD:
+        raise CustomException(error=f"Dead job with id {job_id} not found.", status=status.HTTP_404_NOT_FOUND)
+    job_ledger.requeue(job, gm_client, reset_attempts=True)
+    return SuccessResponse(data={"id": job.id, "status": job.status}, message="Job submitted again.").response()
@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends
 from . import controller 
 from .. import schema as BaseSchema 
 from ...session.controller import get_current_active_user
+from ...permission import schema as PermissionSchema
+from ...permission.lib.core import Permission
 
 router = APIRouter(
     prefix="/analytics", 
@@ -13,4 +15,31 @@ router = APIRouter(
 
 @router.get('/dashboard', response_model=BaseSchema.SuccessResponse)
 def dashboard_information():
-    return controller.dashboard_information()
\ No newline at end of file
+    return controller.dashboard_information()
+
+
+@router.get('/pools', response_model=BaseSchema.SuccessResponse)
+def connection_pool_information(acl: list = Permission("view", PermissionSchema.AdminOnlyACL)):
+    return controller.connection_pool_information()
+
+
+@router.get('/workers', response_model=BaseSchema.SuccessResponse, description="Jobs in flight, queue latency and run time per task of every background worker process.")
+def worker_information(acl: list = Permission("view", PermissionSchema.AdminOnlyACL)):
+    return controller.worker_information()
+
+
+@router.get('/jobs', response_model=BaseSchema.SuccessResponse, description="Per task job counts by status, queue wait and run time (seconds) of the last <days> days.")
+def job_information(days:int = 7, acl: list = Permission("view", PermissionSchema.AdminOnlyACL)):
+    return controller.job_information(days)
+
+
+@router.get('/jobs/dead', response_model=BaseSchema.SuccessResponse, description="Jobs which failed on every attempt.")
+def get_dead_jobs(skip:int = 0, limit:int = 50, acl: list = Permission("view", PermissionSchema.AdminOnlyACL)):
+    return controller.get_dead_jobs(skip, limit)
+
+
+@router.post('/jobs/{job_id}/retry', response_model=BaseSchema.SuccessResponse, responses={
+    404: {"model": BaseSchema.FailedResponse, "description": "Dead Job Not Found"}
+})
+def retry_dead_job(job_id:int, acl: list = Permission("edit", PermissionSchema.AdminOnlyACL)):
+    return controller.retry_dead_job(job_id)
@@ -1,5 +1,38 @@
+from sqlalchemy import Column, DateTime, Float, Integer, String
+from sqlalchemy.dialects.mysql import JSON
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql import func
 
 Base = declarative_base()
 
 
+class JobStatus:
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    RETRYING = 'retrying'
+    DEAD = 'dead'
+
+
+class Job(Base):
+    """Ledger entry of a background (gearman) job, see utils.job_ledger."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task = Column(String(100), index=True, nullable=False)
+    data = Column(JSON, nullable=True)
+    status = Column(String(20), index=True, default=JobStatus.QUEUED)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=1)
+    error = Column(String(2000), nullable=True)
+    submitted_at = Column(DateTime, nullable=False)
+    queued_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)
+    queue_wait = Column(Float, nullable=True)
+    run_time = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    progress = JobStatus()
@@ -15,6 +15,15 @@ class Config(object):
     SECRET_KEY = config.get('base', 'secret_key')
     ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = 360
+    # resolved users of authenticated requests (session.cache), ttl in seconds, 0 disables the cache
+    PRINCIPAL_CACHE_TTL = config.getfloat('user', 'principal_cache_ttl', fallback=60)
+    PRINCIPAL_CACHE_SIZE = config.getint('user', 'principal_cache_size', fallback=10000)
+    # project memberships of users (project.membership), ttl in seconds, 0 disables the cache
+    MEMBERSHIP_CACHE_TTL = config.getfloat('user', 'membership_cache_ttl', fallback=60)
+    MEMBERSHIP_CACHE_SIZE = config.getint('user', 'membership_cache_size', fallback=10000)
+    # password hashing (session.passwords), 0 workers means one per cpu
+    BCRYPT_ROUNDS = config.getint('user', 'bcrypt_rounds', fallback=12)
+    PASSWORD_HASH_WORKERS = config.getint('user', 'password_hash_workers', fallback=0)
     SERVER_BASE_URL = config.get("base", "server_base_url")
 
     PROJECT_NAME = config.get('base', 'project_name')
@@ -30,6 +39,11 @@ class Config(object):
 
     SQLALCHEMY_DATABASE_URI = f'mysql+mysqldb://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = config.getint('database', 'pool_size', fallback=10)
+    DB_MAX_OVERFLOW = config.getint('database', 'max_overflow', fallback=20)
+    DB_POOL_TIMEOUT = config.getint('database', 'pool_timeout', fallback=30)
+    DB_POOL_RECYCLE = config.getint('database', 'pool_recycle', fallback=3600)
+    DB_POOL_PRE_PING = config.getboolean('database', 'pool_pre_ping', fallback=True)
     
 
     # mongodb database configs
@@ -44,6 +58,22 @@ class Config(object):
     STAGGING_MONGODB_NAME = config.get('mongodb', 'stagging_name')
     MONGODB_STAGGING_DATABASE_URI = f"mongodb://{MONGODB_HOST}:{MONGODB_PORT}/?authSource={STAGGING_MONGODB_NAME}"
 
+    # mongodb connection pool (one client per uri and process)
+    MONGODB_MAX_POOL_SIZE = config.getint('mongodb', 'max_pool_size', fallback=100)
+    MONGODB_MIN_POOL_SIZE = config.getint('mongodb', 'min_pool_size', fallback=0)
+    MONGODB_CONNECT_TIMEOUT_MS = config.getint('mongodb', 'connect_timeout_ms', fallback=20000)
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS = config.getint('mongodb', 'server_selection_timeout_ms', fallback=30000)
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS = config.getint('mongodb', 'wait_queue_timeout_ms', fallback=0) or None
+
+    # dataset ingestion
+    DATASET_INGESTION_MODE = config.get('dataset', 'ingestion_mode', fallback='streaming')
+    DATASET_INGESTION_SAMPLE_SIZE = config.getint('dataset', 'ingestion_sample_size', fallback=1000)
+    DATASET_LOADER_BATCH_SIZE = config.getint('dataset', 'loader_batch_size', fallback=1000)
+    DATASET_LOADER_WORKERS = config.getint('dataset', 'loader_workers', fallback=4)
+    DATASET_EXPORT_BATCH_SIZE = config.getint('dataset', 'export_batch_size', fallback=1000)
+    DATASET_EXPORT_CACHE_MAX_BYTES = config.getint('dataset', 'export_cache_max_mb', fallback=2048) * 1024 * 1024
+    DATASET_MAX_UPLOAD_BYTES = config.getint('dataset', 'max_upload_mb', fallback=500) * 1024 * 1024
+
     BASE_DIR = basedir
     VERIFICATION_URL = config.get('base', 'verification_url')
     PASSWORD_RESET_URL = config.get('base', 'password_reset_url')
@@ -58,12 +88,23 @@ class Config(object):
 
     # Media Settings
     IMAGE_FORMATS = config.get('media', 'image_formats')
+    MAX_IMAGE_UPLOAD_BYTES = config.getint('media', 'max_image_upload_mb', fallback=5) * 1024 * 1024
     MEDIA_BASE_URL = f"{SERVER_BASE_URL}/cdn"
 
     # gearman
     GEARMAN_CLIENT_HOST_LIST = config.get('server', 'gearman_client_host_list').replace(" ", "").split(',')
     GEARMAN_WORKER_HOST_LIST = config.get('server', 'gearman_worker_host_list').replace(" ", "").split(',')
 
+    # gearman worker pool (worker.py), see utils.worker_pool.parse_worker_pools
+    WORKER_POOLS = config.get('worker', 'pools', fallback='dataset.stagging.extract:2, dataset.download.export:2, *:4')
+    WORKER_POLL_TIMEOUT = config.getfloat('worker', 'poll_timeout', fallback=1.0)
+
+    # job ledger retries (utils.job_ledger), delays in seconds
+    WORKER_MAX_ATTEMPTS = config.getint('worker', 'max_attempts', fallback=3)
+    WORKER_RETRY_BASE_DELAY = config.getfloat('worker', 'retry_base_delay', fallback=30)
+    WORKER_RETRY_MAX_DELAY = config.getfloat('worker', 'retry_max_delay', fallback=3600)
+    WORKER_RETRY_SWEEP_INTERVAL = config.getfloat('worker', 'retry_sweep_interval', fallback=5)
+
     # redis
     REDIS_SERVER_HOST = config.get('server', 'redis_server_host')
     REDIS_SERVER_PORT = config.get('server', 'redis_server_port')
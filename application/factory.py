@@ -1,7 +1,7 @@
 from application import notification
 import json 
 
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from starlette.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
@@ -11,6 +11,7 @@ from starlette_context.middleware import RawContextMiddleware
 
 from .config import settings
 from .utils.gearman import JSONGearmanClient, JSONGearmanWorker
+from .utils.db_connection import request_session_scope
 
 gm_client: JSONGearmanClient = JSONGearmanClient(settings.GEARMAN_CLIENT_HOST_LIST)
 gm_worker: JSONGearmanWorker = JSONGearmanWorker(settings.GEARMAN_WORKER_HOST_LIST)
@@ -24,7 +25,11 @@ origins = [
 ]
 
 def create_app():
-    app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+    app = FastAPI(
+        title=settings.PROJECT_NAME, 
+        version=settings.PROJECT_VERSION, 
+        dependencies=[Depends(request_session_scope)]
+    )
 
     # middlewares 
     app.add_middleware(
@@ -53,6 +58,10 @@ def create_app():
     app.include_router(notificationRoutes.router)
     app.include_router(analyticsRoutes.router)
 
+    from .permission.registry import role_registry
+    @app.on_event("startup")
+    def load_role_registry():
+        role_registry.load()
 
     # override validation error
     @app.exception_handler(RequestValidationError)
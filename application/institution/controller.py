@@ -5,6 +5,7 @@ from uuid import uuid4
 from fastapi import UploadFile
 
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 from starlette_context import context 
 
 from ..base.api_response import SuccessResponse, CustomException
@@ -40,7 +41,7 @@ def create_or_update_company(schema: InstitutionSchema.Institution):
     return SuccessResponse(data=InstitutionSchema.Institution.from_orm(institution)).response()
 
 
-def upload_logo(file: UploadFile):
+async def upload_logo(file: UploadFile):
      
     active_user_roles = [role["code"] for role in context.get('user').get('roles')]
     if CONSTANTS.ADMIN not in active_user_roles:
@@ -52,15 +53,20 @@ def upload_logo(file: UploadFile):
 
     filepath = Path("institution", "media", "logo", f"{str(uuid4()).replace('-', '')}{file_format.lower()}")
     storage_path = Path(settings.BASE_DIR, filepath)
-    saved = filemanagement.save_upload_file(file, storage_path)
+    try:
+        await filemanagement.save_upload_file_async(file, storage_path, settings.MAX_IMAGE_UPLOAD_BYTES)
+    except OSError:
+        raise CustomException(error="Unable to Save the image.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    return await run_in_threadpool(_save_logo, filepath)
+
+
+def _save_logo(filepath: Path):
     db = get_db()
     company = Institution.get_institution(db)
-    if saved:
-        company.logo = filepath
-        db.add(company)
-        db.flush()
-    
+    company.logo = filepath
+    db.add(company)
+    db.flush()
     return SuccessResponse(data=InstitutionSchema.Institution.from_orm(company)).response()
 
 
@@ -6,12 +6,15 @@ from ..session import controller as user_controller
 from . import schema as InstitutionSchema
 from ..base import schema as BaseSchema 
 from . import controller 
+from ..config import settings
+from ..utils import filemanagement
 
 
 router = APIRouter(
     prefix="/v1/institution",
     tags=["institution"],
-    dependencies=[Depends(user_controller.get_current_active_user)]
+    dependencies=[Depends(user_controller.get_current_active_user)],
+    route_class=filemanagement.UploadLimitRoute
 )
 
 
@@ -24,10 +27,12 @@ async def update_company(schema: InstitutionSchema.Institution):
 
 @router.put('/uploadlogo', response_model=InstitutionSchema.Institution, responses={
     403: {"model": BaseSchema.FailedResponse, "description": "Insufficient Permission"},
-    406: {"model": BaseSchema.FailedResponse, "description": "Invalid Image format"}
+    406: {"model": BaseSchema.FailedResponse, "description": "Invalid Image format"},
+    413: {"model": BaseSchema.FailedResponse, "description": "Image too large"}
 })
+@filemanagement.max_upload_size(settings.MAX_IMAGE_UPLOAD_BYTES)
 async def upload_logo(file: UploadFile = File(...)):
-    return controller.upload_logo(file)
+    return await controller.upload_logo(file)
 
 
 @router.get('', response_model=InstitutionSchema.Institution)
@@ -2,6 +2,8 @@ from starlette import status
 from starlette_context import context 
 from ..base.api_response import CustomException, SuccessResponse
 from ..permission.models import Role
+from ..permission.registry import role_registry
+from ..session.cache import principal_cache
 from ..session.models import User, Principals 
 from ..permission import schema as PermissionsSchema
 from ..utils.db_connection import get_db
@@ -33,6 +35,7 @@ def create_role(schema: PermissionsSchema._Role):
     db.add(role)
     db.flush()
     db.refresh(role)
+    role_registry.refresh()
     return SuccessResponse(data=PermissionsSchema._Role.from_orm(role)).response()
 
 
@@ -53,6 +56,7 @@ def add_role_to_user(schema: PermissionsSchema._UserRole):
     else:
         user.principals.append(Principals(**{"value": f"role:{code}"}))
         db.flush()
+        principal_cache.invalidate(user.id)
     return_schema = PermissionsSchema._Role(**{"code": code, "name": role.name, "key": role.key})
     return SuccessResponse(data=return_schema).response()
 
@@ -75,6 +79,7 @@ def remove_role_from_user(schema: PermissionsSchema._UserRole):
 
     if code in user.get_roles():
         db.query(Principals).filter(Principals.user_id == user_id).filter(Principals.value == f"role:{code}").delete()
+        principal_cache.invalidate(user_id)
     else:
         pass
     return SuccessResponse(data={}, message="Role successfully removed.").response()
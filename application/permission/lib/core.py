@@ -242,12 +242,14 @@ def is_like_list(something):
 
 async def get_active_principals():
 
-    db = get_db()
-    user_id = context.data.get("user").get("id")
-    user = UserInDB.get_user_by_id(db, user_id)
-
     principals = [Everyone, Authenticated]
-    principals.extend(user.get_principals())
+    # resolved with the user by get_current_user.
+    user_principals = context.data.get("principals")
+    if user_principals is None:
+        db = get_db()
+        user_id = context.data.get("user").get("id")
+        user_principals = UserInDB.get_user_by_id(db, user_id).get_principals()
+    principals.extend(user_principals)
     return principals 
 
 
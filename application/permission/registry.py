@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm.session import Session
+
+from ..permission.models import Role
+from ..utils.db_connection import session_hook
+
+# an unknown code reloads the roles (created by another process) at most once per interval, in seconds.
+MISS_RELOAD_INTERVAL = 30
+
+
+@session_hook
+def _query_roles(db: Session) -> List[dict]:
+    return [{"code": role.code.lower(), "name": role.name, "key": role.key} for role in db.query(Role).all()]
+
+
+class RoleRegistry:
+    """
+    The roles table held in memory, so resolving the role codes of user principals needs no query. Loaded at
+    startup (or on first use) and refreshed when a role is created.
+
+    usage example:
+        role_registry.get("admin") => {"code": "admin", "name": "Administrator", "key": 1}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roles: Optional[Dict[str, dict]] = None
+        self._loaded_at = 0.0
+
+    def load(self) -> None:
+        roles = {role["code"]: role for role in _query_roles()}
+        with self._lock:
+            self._roles = roles
+            self._loaded_at = time.monotonic()
+
+    refresh = load
+
+    def get(self, code: str) -> Optional[dict]:
+        if self._roles is None:
+            self.load()
+        code = code.lower()
+        role = self._roles.get(code)
+        if role is None and time.monotonic() - self._loaded_at > MISS_RELOAD_INTERVAL:
+            self.load()
+            role = self._roles.get(code)
+        return dict(role) if role is not None else None
+
+
+role_registry = RoleRegistry()
@@ -5,11 +5,13 @@ from pathlib import Path
 from sqlalchemy import and_
 from starlette_context import context
 from sqlalchemy.orm.session import Session 
+from starlette.concurrency import run_in_threadpool
 
 from . import schema as ProjectSchema
 from ..base.api_response import SuccessResponse, CustomException
 from ..config import settings 
 from ..factory import gm_client
+from .membership import membership_index
 from .models import ProjectTags, Project, Tags, Members, Logs
 from ..utils import filemanagement 
 from ..utils.db_connection import get_db
@@ -20,20 +22,12 @@ permission_list = [CONSTANTS.OWNER, CONSTANTS.MANAGER, CONSTANTS.DATAENTRY, CONS
 
 
 def has_project_modification_permission(project_id:int) -> bool:
-    db:Session = get_db()
-    project = db.query(Project).filter(
-        Project.deleted ==False, Project.id == project_id
-    ).first()
-
     active_user_roles = [role["code"] for role in context.get('user').get('roles')]
     if CONSTANTS.ADMIN in active_user_roles:
         return True 
     
-    for member in project.members:
-        if member.user_id == context.get("user").get('id'):
-            if member.permission in [CONSTANTS.OWNER, CONSTANTS.MANAGER]:
-                return True 
-    return False 
+    permission = membership_index.permission(context.get("user").get('id'), project_id)
+    return permission in [CONSTANTS.OWNER, CONSTANTS.MANAGER]
 
 def create_log_item(project_id:int, description:str, dataset_id:int = None) -> None:
     db:Session = get_db()
@@ -87,6 +81,7 @@ def _add_project_creator_to_member_list(db:Session, project_id:int, user_id:int)
     )
     db.add(member)
     db.flush()
+    membership_index.invalidate_user(user_id)
     description = f"{context.get('user').get('fullname')} added to project as Owner"
     create_log_item(project_id=project_id, description=description)
 
@@ -177,14 +172,8 @@ def remove_tag_from_project(tag_name, project_id):
     return SuccessResponse(data=ProjectSchema._Project.from_orm(project)).response()
 
 
-def upload_banner_photo(project_id:int, file: UploadFile):
-    db:Session = get_db()
-    project = db.query(Project).filter(Project.deleted == False).filter(Project.id == project_id).first() 
-    if project is None:
-        raise CustomException(error=f"Project with id {project_id} not found.", status=status.HTTP_404_NOT_FOUND)
-    
-    if has_project_modification_permission(project_id) == False:
-        raise CustomException(error="Insufficient Permission", status=status.HTTP_403_FORBIDDEN)
+async def upload_banner_photo(project_id:int, file: UploadFile):
+    await run_in_threadpool(_check_project_modification, project_id)
     
     file_format = Path(file.filename).suffix.lower()
     if not file_format in settings.IMAGE_FORMATS:
@@ -192,17 +181,32 @@ def upload_banner_photo(project_id:int, file: UploadFile):
 
     filepath = Path("project", "media", "banner", date.today().strftime("%b-%Y"), f"{str(uuid4()).replace('-', '')}{file_format.lower()}")
     storage_path = Path(settings.BASE_DIR, filepath)
-    saved = filemanagement.save_upload_file(file, storage_path)
+    try:
+        await filemanagement.save_upload_file_async(file, storage_path, settings.MAX_IMAGE_UPLOAD_BYTES)
+    except OSError:
+        raise CustomException(error="Unable to Save the image.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    if saved:
-        project.banner_photo = filepath
-        db.add(project)
-        db.flush
-        return SuccessResponse(data=ProjectSchema._Project.from_orm(project)).response()
-    raise CustomException(error="Unable to Save the image.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return await run_in_threadpool(_save_project_photo, project_id, "banner_photo", filepath)
+    
+
+async def upload_profile_photo(project_id:int, file: UploadFile):
+    await run_in_threadpool(_check_project_modification, project_id)
     
+    file_format = Path(file.filename).suffix.lower()
+    if not file_format in settings.IMAGE_FORMATS:
+        raise CustomException(error="Image format not supported.", status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    filepath = Path("project", "media", "profile", date.today().strftime("%b-%Y"), f"{str(uuid4()).replace('-', '')}{file_format.lower()}")
+    storage_path = Path(settings.BASE_DIR, filepath)
+    try:
+        await filemanagement.save_upload_file_async(file, storage_path, settings.MAX_IMAGE_UPLOAD_BYTES)
+    except OSError:
+        raise CustomException(error="Unable to Save the image.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return await run_in_threadpool(_save_project_photo, project_id, "profile_photo", filepath)
+
 
-def upload_profile_photo(project_id:int, file: UploadFile):
+def _check_project_modification(project_id:int) -> None:
     db:Session = get_db()
     project = db.query(Project).filter(Project.deleted == False).filter(Project.id == project_id).first() 
     if project is None:
@@ -210,21 +214,16 @@ def upload_profile_photo(project_id:int, file: UploadFile):
     
     if has_project_modification_permission(project_id) == False:
         raise CustomException(error="Insufficient Permission", status=status.HTTP_403_FORBIDDEN)
-    
-    file_format = Path(file.filename).suffix.lower()
-    if not file_format in settings.IMAGE_FORMATS:
-        raise CustomException(error="Image format not supported.", status=status.HTTP_406_NOT_ACCEPTABLE)
 
-    filepath = Path("project", "media", "profile", date.today().strftime("%b-%Y"), f"{str(uuid4()).replace('-', '')}{file_format.lower()}")
-    storage_path = Path(settings.BASE_DIR, filepath)
-    saved = filemanagement.save_upload_file(file, storage_path)
 
-    if saved:
-        project.profile_photo = filepath
-        db.add(project)
-        db.flush
-        return SuccessResponse(data=ProjectSchema._Project.from_orm(project)).response()
-    raise CustomException(error="Unable to Save the image.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+def _save_project_photo(project_id:int, attribute:str, filepath:Path):
+    """attribute: banner_photo or profile_photo"""
+    db:Session = get_db()
+    project = Project.get_project_by_id(db, project_id)
+    project.__setattr__(attribute, filepath)
+    db.add(project)
+    db.flush()
+    return SuccessResponse(data=ProjectSchema._Project.from_orm(project)).response()
      
 
 def _add_member_to_project(db:Session, project_id:int, user_id:int, perm:str) -> bool:
@@ -245,14 +244,14 @@ def _add_member_to_project(db:Session, project_id:int, user_id:int, perm:str) ->
         return false_response
 
     if project.user_id == active_user_id: # if it's the project creator
-        if user_id in project.project_members: # If he/she is already in the member list.
-            member = db.query(Members).filter(and_(Members.project_id == project_id, Members.user_id == user_id)).first()
-
+        member = db.query(Members).filter(and_(Members.project_id == project_id, Members.user_id == user_id)).first()
+        if member is not None: # If he/she is already in the member list.
             description = f"Changed {member.user.fullname}'s permission from {member.permission} to {perm}."
 
             member.permission = perm
             db.add(member)
             db.flush()
+            membership_index.invalidate_user(user_id)
             create_log_item(project_id, description)
             return True, member, project  
         else:
@@ -261,18 +260,14 @@ def _add_member_to_project(db:Session, project_id:int, user_id:int, perm:str) ->
             )
             db.add(member)
             db.flush()
+            membership_index.invalidate_user(user_id)
             description = f"Granted {perm} permission to {member.user.fullname}."
             create_log_item(project_id, description)
             message = f"{context.get('user').get('fullname')} added you to the project <<{project.name}>> with <<{perm}>> permission ."
             gm_client.submit_job('notification.single', {'user_id': member.user_id, 'message': message}, background=True, wait_until_complete=False)
             return True, member, project  
     
-    if active_user_id not in project.project_members:
-        return false_response
-    
-    member = db.query(Members).filter(and_(Members.project_id == project_id, Members.user_id == active_user_id)).first()
-    
-    if member.permission != CONSTANTS.MANAGER:
+    if membership_index.permission(active_user_id, project_id) != CONSTANTS.MANAGER:
         return false_response 
     
     member = Members(
@@ -280,6 +275,7 @@ def _add_member_to_project(db:Session, project_id:int, user_id:int, perm:str) ->
         )
     db.add(member)
     db.flush()
+    membership_index.invalidate_user(user_id)
     description = f"Granted {perm} permission to {member.user.fullname}."
     create_log_item(project_id, description)
     message = f"{context.get('user').get('fullname')} added you to the project <<{project.name}>> with <<{perm}>> permission ."
@@ -305,26 +301,27 @@ def remove_user_from_project_members(project_id: int, user_id:int):
     active_user = context.get('user')
     active_user_roles = [role["code"] for role in context.get('user').get('roles')]
     db:Session = get_db()
-    project = db.query(Project).filter(Project.deleted == False).first()
+    project = Project.get_project_by_id(db, project_id)
     if project is None:
         raise CustomException(error=f"Project with id {project_id} not found.", status=status.HTTP_404_NOT_FOUND)
 
     if project.user_id == user_id:
         raise CustomException(error="You cannot remove the project owner", status=status.HTTP_403_FORBIDDEN)
 
-    if not user_id in project.project_members:
+    member = db.query(Members).filter(
+        and_(Members.project_id == project_id, Members.user_id==user_id)
+    ).first()
+    if member is None:
         raise CustomException(error="This member is not yet part of the project", status=status.HTTP_404_NOT_FOUND)
 
-    if not CONSTANTS.ADMIN in active_user_roles and not active_user['id'] in project.project_members:
+    if not CONSTANTS.ADMIN in active_user_roles and membership_index.permission(active_user['id'], project_id) is None:
         raise CustomException(error="Insufficient Permission", status=status.HTTP_403_FORBIDDEN)
     
     if has_project_modification_permission(project.id) == True:
-        member = db.query(Members).filter(
-            and_(Members.project_id == project_id, Members.user_id==user_id)
-        ).first()
         description = f"Removed {member.user.fullname} from project."
         db.delete(member)
         db.flush()
+        membership_index.invalidate_user(user_id)
         project = Project.get_project_by_id(db, project_id)
         create_log_item(project_id=project_id, description=description)
         message = f"You are no longer a member of the project <<{project.name}>>."
@@ -336,21 +333,22 @@ def remove_user_from_project_members(project_id: int, user_id:int):
 def remove_self_from_project(project_id:int):
     active_user = context.get('user')
     db:Session = get_db()
-    project = db.query(Project).filter(Project.deleted == False).first()
+    project = Project.get_project_by_id(db, project_id)
     if project is None:
         raise CustomException(error="Project not found.", status=status.HTTP_404_NOT_FOUND)
 
     if project.user_id == active_user["id"]:
         raise CustomException(error="You cannot exit from your project.", status=status.HTTP_403_FORBIDDEN)
 
-    if not active_user["id"] in project.project_members:
-        return SuccessResponse(data={}).response()
-    
     member = db.query(Members).filter(
             and_(Members.project_id == project_id, Members.user_id==active_user["id"])
     ).first()
+    if member is None:
+        return SuccessResponse(data={}).response()
+    
     db.delete(member)
     db.flush()
+    membership_index.invalidate_user(active_user["id"])
     description = f"Exited the project."
     create_log_item(project_id, description)
     return SuccessResponse(data={}, message="success").response()
@@ -407,7 +405,7 @@ def get_projects(skip:int = 0, limit:int = 20):
             Project.deleted == False 
         ).offset(skip).limit(limit).all() 
     else:
-        user_project_ids = Members.get_user_project_id_list(db, context.get("user").get('id'))
+        user_project_ids = membership_index.project_ids(context.get("user").get('id'))
         projects = db.query(Project).filter(
             Project.id.in_(user_project_ids)
         ).offset(skip).limit(limit).all()
@@ -469,6 +467,7 @@ def delete_project(project_id:int):
         project.deleted = True 
         db.add(project)
         db.flush()
+        membership_index.invalidate_project(project.id)
         description = f"Deleted the project."
         create_log_item(project_id, description)
         message = f"{context.get('user').get('fullname')} deleted the project <<{project.name}>>."
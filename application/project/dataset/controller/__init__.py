@@ -4,4 +4,6 @@ from . import change
 from . import delete 
 from . import read 
 from . import write 
-from . import report 
\ No newline at end of file
+from . import report
+from . import index 
+from . import aio 
@@ -0,0 +1,113 @@
+"""
+Coroutine versions of the dataset data endpoints. The Mongo operations are awaited on motor (get_async_mongodb)
+instead of blocking one of the threads sync endpoints run on, the checks, casts, counts and responses are the ones
+of the read, write and change controllers.
+
+Everything that touches SQLAlchemy (a pool checkout can wait up to DB_POOL_TIMEOUT) or casts rows runs in the
+threadpool with run_in_threadpool, which copies the context: the request's SessionScope is used there as well.
+Only the motor calls run on the event loop.
+"""
+from typing import Dict, List
+
+from bson.objectid import ObjectId
+from fastapi import status
+from pymongo.collection import ReturnDocument
+from starlette.concurrency import run_in_threadpool
+
+from . import change, read, write
+from ...plugins.indexes import QueryStats
+from ...plugins.profile import DatasetProfiler
+from .. import schama as DatasetSchema
+from ....base.api_response import SuccessResponse, CustomException
+from ....utils.db_connection import get_async_mongodb, get_mongodb
+
+
+async def get_dataset_data(
+    dataset_id:int, skip:int = 0, limit:int=100, columns:List[str] = [], pagination:str = "offset", after:str = None,
+    before:str = None, count:str = "estimated", filters:List[str] = [], sort:List[str] = []
+):
+    """See read.get_dataset_data."""
+    total = 0
+    next_token = None
+    prev_token = None
+    keyset = pagination == "keyset" or after is not None or before is not None
+    mongodb = get_async_mongodb()
+    dataset = await run_in_threadpool(read.get_readable_dataset, dataset_id)
+    tablename = dataset.prod_tablename
+
+    rows = []
+    if tablename and dataset.locked == False:
+        fields, query = await run_in_threadpool(read.prepare_data_query, dataset, columns, filters, sort, keyset)
+        if query.columns:
+            await QueryStats(mongodb).record_async(dataset.id, query.columns)
+
+        if keyset:
+            keyset_filter, direction = read.keyset_query(query.filter, after, before)
+            cursor = mongodb[tablename].find(keyset_filter, fields).sort("_id", direction).limit(limit + 1)
+            rows, next_token, prev_token = read.keyset_page(await cursor.to_list(None), limit, after, before)
+        else:
+            cursor = mongodb[tablename].find(query.filter, fields)
+            if query.is_sorted:
+                cursor = cursor.sort(query.sort)
+            rows = await cursor.skip(skip).limit(limit).to_list(None)
+
+        for row in rows:
+            row['_id'] = str(row['_id'])
+
+        if query.is_filtered:
+            total = await run_in_threadpool(read.get_filtered_row_count, get_mongodb()[tablename], query.filter, count)
+        else:
+            total = await run_in_threadpool(read.get_dataset_row_count, dataset, get_mongodb()[tablename], count)
+
+    # the dataset may have been expired by correct_row_count's flush, its columns are loaded in the threadpool.
+    response = await run_in_threadpool(
+        read.dataset_data_response, dataset, rows, skip, limit, total, keyset, next_token, prev_token, count
+    )
+    return SuccessResponse(data=DatasetSchema.DatasetData(data=response)).response()
+
+
+async def add_dataset_data_manually(dataset_id:int, data:List[Dict]=[]):
+    """See write.add_dataset_data_manually."""
+    mongodb = get_async_mongodb()
+    dataset, tablename, recordcount, dataset_column_dict, documents = await run_in_threadpool(
+        _prepare_manual_insert, dataset_id, data
+    )
+
+    if len(documents) > 0 and tablename:
+        result = await mongodb[tablename].insert_many(documents)
+        await DatasetProfiler.apply_async(
+            dataset.id, dataset_column_dict, mongodb, lambda profiler: profiler.update_rows(documents)
+        )
+        count = len(result.inserted_ids)
+        collection_count = None if recordcount else await mongodb[tablename].estimated_document_count()
+        await run_in_threadpool(write.record_manual_insert, dataset, count, collection_count)
+        return write.manual_insert_response(count, len(data))
+    return write.manual_insert_response(0, len(data))
+
+
+def _prepare_manual_insert(dataset_id:int, data:List[Dict]):
+    """
+    write.prepare_manual_insert, plus the dataset attributes read on the event loop: the flush of a newly created
+    collection expires the dataset, they're loaded here instead of lazily on the loop.
+    """
+    dataset, dataset_column_dict, documents = write.prepare_manual_insert(dataset_id, data)
+    return dataset, dataset.prod_tablename, dataset.prod_recordcount, dataset_column_dict, documents
+
+
+async def update_dataset_row_manually(schema: DatasetSchema.UpdateDatasetRowManually):
+    """See change.update_dataset_row_manually."""
+    mongodb = get_async_mongodb()
+    dataset, dataset_column_dict, _id, update = await run_in_threadpool(change.prepare_row_update, schema)
+    collection = mongodb[dataset.prod_tablename]
+
+    if len(update) > 0:
+        previous = await collection.find_one_and_update({'_id': ObjectId(_id)}, {'$set': update}, return_document=ReturnDocument.BEFORE)
+    else:
+        previous = await collection.find_one({'_id': ObjectId(_id)})
+    if previous is None:
+        raise CustomException(error=f"Row Item with _id {_id} not found.", status=status.HTTP_404_NOT_FOUND)
+    if len(update) > 0:
+        await DatasetProfiler.apply_async(
+            dataset.id, dataset_column_dict, mongodb, lambda profiler: profiler.replace_values(previous, update)
+        )
+    return await run_in_threadpool(change.row_update_response, dataset, previous, update)
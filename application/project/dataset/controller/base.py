@@ -1,66 +1,83 @@
-from typing import Any 
+import base64
+import binascii
+from typing import Any, Dict, List
 
 import arrow 
-from frictionless import types, Field 
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import status
 from starlette_context import context 
 
+from ....base.api_response import CustomException
 from ...controller import CONSTANTS
-from ...models import Dataset
-from ....utils.db_connection import get_db 
+from ...helpers import get_frictionless_cell_caster
+from ...membership import membership_index
 
 def cast_value_to_frictionless_datatype(value:Any, to_datatype:str):
-    if to_datatype in ['date', 'datetime']:
-        value = str(value).replace(' ', '')
-    FrictionlessType = frictionless_cell_type_mapper.get(to_datatype, types.StringType)
-    field = Field(type=to_datatype, group_char=',', bare_number=False)
-    cell = FrictionlessType(field)
-    return cell.read_cell(value)
-
-
-frictionless_cell_type_mapper = {
-    "any": types.AnyType,
-    "array": types.ArrayType,
-    "boolean": types.BooleanType,
-    "date": types.DateType, 
-    "datetime": types.DatetimeType, 
-    "duration": types.DurationType, 
-    "geojson": types.GeojsonType, 
-    "geopoint": types.GeopointType,
-    "integer": types.IntegerType, 
-    "number": types.NumberType, 
-    "object": types.ObjectType, 
-    "string": types.StringType, 
-    "time": types.TimeType, 
-    "year": types.YearType, 
-    "yearmonth": types.YearmonthType
-}
+    return get_frictionless_cell_caster(to_datatype)(value)
 
 
-def has_dataset_modification_permission(dataset_id:int) -> bool:
-    db  = get_db()
-    dataset = Dataset.get_dataset_by_id(db, dataset_id)
+def cast_column_to_frictionless_datatype(values:List[Any], to_datatype:str) -> List[Any]:
+    """Casts a whole column of values with a single caster."""
+    return list(map(get_frictionless_cell_caster(to_datatype), values))
+
+
+def cast_rows_to_frictionless_datatypes(rows:List[Dict], column_types:Dict[str, str]) -> List[Dict]:
+    """
+    Keeps the known columns ({column name: datatype}) of every dictionary row and casts them a column at a time.
+    Items which are not dictionaries and rows left without any known column are dropped.
+    """
+    documents = []
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        document = {k: v for k, v in row.items() if k in column_types}
+        if len(document) > 0:
+            documents.append(document)
+
+    for name, datatype in column_types.items():
+        holders = [document for document in documents if name in document]
+        if len(holders) == 0:
+            continue
+        values = cast_column_to_frictionless_datatype([document[name] for document in holders], datatype)
+        for document, value in zip(holders, values):
+            document[name] = value
+    return documents
+
+
+def encode_row_cursor(_id:ObjectId) -> str:
+    """Opaque keyset pagination token of a dataset row."""
+    return base64.urlsafe_b64encode(_id.binary).decode().rstrip('=')
+
 
+def decode_row_cursor(token:str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise CustomException(error=f"Invalid pagination token {token}.", status=status.HTTP_406_NOT_ACCEPTABLE)
+
+
+def has_dataset_modification_permission(dataset_id:int) -> bool:
     active_user_roles = [role["code"] for role in context.get('user').get('roles')]
     if CONSTANTS.ADMIN in active_user_roles:
         return True 
     
-    for member in dataset.project.members:
-        if member.user_id == context.get("user").get('id'):
-            if member.permission in [CONSTANTS.OWNER, CONSTANTS.MANAGER, CONSTANTS.DATAENTRY]:
-                return True 
-    return False 
+    permission = _dataset_member_permission(dataset_id)
+    return permission in [CONSTANTS.OWNER, CONSTANTS.MANAGER, CONSTANTS.DATAENTRY]
 
 
 def has_dataset_view_permission(dataset_id:int) -> bool:
-    db  = get_db()
-    dataset = Dataset.get_dataset_by_id(db, dataset_id)
-
     active_user_roles = [role["code"] for role in context.get('user').get('roles')]
     if CONSTANTS.ADMIN in active_user_roles:
         return True 
     
-    for member in dataset.project.members:
-        if member.user_id == context.get("user").get('id'):
-            # if member.permission in [CONSTANTS.OWNER, CONSTANTS.MANAGER, CONSTANTS.DATAENTRY, CONSTANTS.VIEWER]:
-            return True 
-    return False 
+    # any member can view: CONSTANTS.OWNER, CONSTANTS.MANAGER, CONSTANTS.DATAENTRY, CONSTANTS.VIEWER
+    return _dataset_member_permission(dataset_id) is not None
+
+
+def _dataset_member_permission(dataset_id:int):
+    """Project permission of the active user on the dataset's project, None when not a member."""
+    project_id = membership_index.dataset_project_id(dataset_id)
+    if project_id is None:
+        return None
+    return membership_index.permission(context.get("user").get('id'), project_id) 
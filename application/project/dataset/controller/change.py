@@ -1,15 +1,14 @@
-import datetime 
-from decimal import Decimal 
 from typing import Dict 
 
-from bson.decimal128 import Decimal128 
 from bson.objectid import ObjectId
 from fastapi import status
 from pymongo.collection import ReturnDocument
 
-from .base import cast_value_to_frictionless_datatype
+from .base import cast_rows_to_frictionless_datatypes
 from ....base.api_response import CustomException, SuccessResponse
-from ... import helpers 
+from ...plugins.coercion import BSONCoercer
+from ...plugins.exportcache import ExportCache
+from ...plugins.profile import DatasetProfiler
 from .. import schama as DatasetSchema
 from ...models import Dataset   
 from ....utils.db_connection import get_db, get_mongodb
@@ -42,6 +41,25 @@ def delete_dataset(dataset_id: int):
 
 def update_dataset_row_manually(schema: DatasetSchema.UpdateDatasetRowManually):
     mongodb = get_mongodb()
+    dataset, dataset_column_dict, _id, update = prepare_row_update(schema)
+    collection = mongodb[dataset.prod_tablename]
+
+    if len(update) > 0:
+        previous = collection.find_one_and_update({'_id': ObjectId(_id)}, {'$set': update}, return_document=ReturnDocument.BEFORE)
+    else: # none of the submitted columns exist, an empty $set is rejected by Mongo.
+        previous = collection.find_one({'_id': ObjectId(_id)})
+    if previous is None:
+        raise CustomException(error=f"Row Item with _id {_id} not found.", status=status.HTTP_404_NOT_FOUND)
+    if len(update) > 0:
+        DatasetProfiler.apply(dataset.id, dataset_column_dict, mongodb, lambda profiler: profiler.replace_values(previous, update))
+    return row_update_response(dataset, previous, update)
+
+
+def prepare_row_update(schema: DatasetSchema.UpdateDatasetRowManually):
+    """
+    Checks the dataset and the submitted row, the values are cast to the column types.
+    returns; dataset, {column name: datatype}, row _id, values to set
+    """
     db = get_db()
     dataset: Dataset = Dataset.get_dataset_by_id(db, schema.dataset_id)
     if dataset is None:
@@ -64,25 +82,18 @@ def update_dataset_row_manually(schema: DatasetSchema.UpdateDatasetRowManually):
     if tablename is None or dataset.fields == 0:
         raise CustomException(error="This dataset does not contain any previous data.", status=status.HTTP_417_EXPECTATION_FAILED)
 
-    if mongodb[tablename].find_one({'_id': ObjectId(_id)}) == None:
-        raise CustomException(error=f"Row Item with _id {_id} not found.", status=status.HTTP_404_NOT_FOUND)
-
     update = {}
-    for k, v in data.items():
-        if k in dataset_column_dict.keys():
-            field_type = dataset_column_dict.get(k)
-            val = cast_value_to_frictionless_datatype(v, field_type)
-            if type(val) == Decimal:
-                val = Decimal128(val)
-            if type(val) == int and val > helpers.MAX_INTEGER:
-                val = Decimal128(Decimal(val))
-            if type(val) == datetime.date:
-                val = datetime.datetime(year=val.year, month=val.month, day=val.day, hour=0, minute=0, second=0)
-            update[k] = val 
-
-    doc = mongodb[tablename].find_one_and_update({'_id': ObjectId(_id)}, {'$set': update}, return_document=ReturnDocument.AFTER)
-    doc['_id'] = str(doc['_id'])
+    documents = cast_rows_to_frictionless_datatypes([data], dataset_column_dict)
+    if len(documents) > 0:
+        update = BSONCoercer(dataset_column_dict).coerce_rows(documents)[0]
+    return dataset, dataset_column_dict, _id, update
 
+
+def row_update_response(dataset: Dataset, previous: dict, update: dict):
+    """previous: the row before the update."""
+    doc = {**previous, **update}
+    doc['_id'] = str(doc['_id'])
+    ExportCache(get_db()).invalidate(dataset)
     return SuccessResponse(data=doc).response()
     
 
@@ -0,0 +1,79 @@
+from fastapi import status
+from starlette_context import context 
+
+from .base import has_dataset_modification_permission
+from .. import schama as DatasetSchema 
+from ....base.api_response import SuccessResponse, CustomException
+from ....factory import gm_client
+from ...models import Dataset, DatasetIndex
+from ...plugins.indexes import IndexManager, QueryStats
+from ....utils.db_connection import get_db, get_mongodb
+
+
+def create_dataset_indexes(schema: DatasetSchema.DatasetIndexCreate):
+    db = get_db()
+    dataset = Dataset.get_dataset_by_id(db, schema.dataset_id)
+    if dataset is None:
+        raise CustomException(error=f"Dataset with id {schema.dataset_id} not found.", status=status.HTTP_404_NOT_FOUND)
+
+    if not has_dataset_modification_permission(dataset.id):
+        raise CustomException(error="You don't have permission to index this dataset.", status=status.HTTP_403_FORBIDDEN)
+
+    dataset_columns = dataset.get_column_name_list()
+    invalid = [col for col in schema.columns if col not in dataset_columns]
+    if len(schema.columns) == 0 or len(invalid) > 0:
+        raise CustomException(error=f"Columns not found in dataset: {', '.join(invalid) or 'none submitted'}.", status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    indexed = [index.column for index in dataset.indexes]
+    for col in schema.columns:
+        if col not in indexed:
+            db.add(DatasetIndex(dataset_id=dataset.id, column=col, user_id=context.get('user').get('id')))
+            indexed.append(col)
+    db.flush()
+    db.refresh(dataset)
+
+    if dataset.prod_tablename and not dataset.locked:
+        gm_client.submit_job('dataset.index.build', {'dataset_id': dataset.id}, background=True, wait_until_complete=False)
+    return SuccessResponse(data=DatasetSchema.DatasetIndexList(data=dataset.indexes)).response()
+
+
+def get_dataset_indexes(dataset_id:int):
+    db = get_db()
+    dataset = Dataset.get_dataset_by_id(db, dataset_id)
+    if dataset is None:
+        raise CustomException(error=f"Dataset with id {dataset_id} not found.", status=status.HTTP_404_NOT_FOUND)
+    return SuccessResponse(data=DatasetSchema.DatasetIndexList(data=dataset.indexes)).response()
+
+
+def delete_dataset_index(index_id:int):
+    db = get_db()
+    index = DatasetIndex.get_index_by_id(db, index_id)
+    if index is None:
+        raise CustomException(error=f"Index with id {index_id} not found.", status=status.HTTP_404_NOT_FOUND)
+
+    if not has_dataset_modification_permission(index.dataset_id):
+        raise CustomException(error="You don't have permission to modify the indexes of this dataset.", status=status.HTTP_403_FORBIDDEN)
+
+    if index.status == DatasetIndex.progress.BUILDING:
+        raise CustomException(error="Index is being built, try again once it is ready.", status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    IndexManager(db, get_mongodb()).drop(index.dataset, index)
+    return SuccessResponse(data={"id": index_id}, message="Index deleted.").response()
+
+
+def get_index_suggestions(dataset_id:int, min_queries:int = 10):
+    db = get_db()
+    dataset = Dataset.get_dataset_by_id(db, dataset_id)
+    if dataset is None:
+        raise CustomException(error=f"Dataset with id {dataset_id} not found.", status=status.HTTP_404_NOT_FOUND)
+    suggestions = QueryStats(get_mongodb()).suggest(dataset, min_queries)
+    return SuccessResponse(data=suggestions).response()
+
+
+def build_dataset_indexes(dataset_id:int, rebuild:bool = False) -> int:
+    """Runs on the gearman worker (dataset.index.build)."""
+    db = get_db()
+    dataset = Dataset.get_dataset_by_id(db, dataset_id)
+    if dataset is None or dataset.prod_tablename is None:
+        return 0
+    return IndexManager(db, get_mongodb()).build(dataset, rebuild)
@@ -1,11 +1,18 @@
 from typing import List
 from fastapi import  status
+from starlette_context import context
 
-from ...models import Project, Dataset
+from ...exception import DatasetException
+from ...models import Project, Dataset, DownloadRequest
+from ...plugins.aggregate import RowAggregation
+from ...plugins.indexes import QueryStats
+from ...plugins.profile import DatasetProfiler
+from ...plugins.query import RowQuery
 from .. import schama as DatasetSchema
 from ....base.api_response import SuccessResponse, CustomException 
 from ....utils.db_connection import get_db, get_mongodb 
 from ...helpers import api_data_types
+from .base import encode_row_cursor, decode_row_cursor
 
 
 def get_data_type_list():
@@ -29,6 +36,16 @@ def get_project_datasets(project_id:int, skip:int = 0, limit:int = 20):
     return SuccessResponse(data=DatasetSchema.DatasetList(data=datasets)).response()
     
 
+def get_download_request(download_request_id:int):
+    db = get_db()
+    request = db.query(DownloadRequest).filter(
+        DownloadRequest.id == download_request_id, DownloadRequest.user_id == context.get('user').get('id')
+    ).first()
+    if request is None:
+        raise CustomException(error=f"Download request with id {download_request_id} not found.", status=status.HTTP_404_NOT_FOUND)
+    return SuccessResponse(data=DatasetSchema.DownloadRequest.from_orm(request)).response()
+
+
 def get_dataset_columns(dataset_id:int):
     db = get_db()
     dataset = Dataset.get_dataset_by_id(db, dataset_id)
@@ -37,52 +54,208 @@ def get_dataset_columns(dataset_id:int):
     return SuccessResponse(data=DatasetSchema.ColumnList(data=dataset.columns)).response()
 
 
-def get_dataset_data(dataset_id:int, skip:int = 0, limit:int=100, columns:List[str] = []):
-    returned = 0
+def get_dataset_data(
+    dataset_id:int, skip:int = 0, limit:int=100, columns:List[str] = [], pagination:str = "offset", after:str = None, 
+    before:str = None, count:str = "estimated", filters:List[str] = [], sort:List[str] = []
+):
+    """
+    pagination: "offset" pages with skip/limit (default). "keyset" pages over _id with the `after`/`before` tokens
+    returned as `next`/`prev`, which costs the same on every page. A token implies keyset pagination.
+    count: how `total` is obtained, see get_dataset_row_count.
+    filters, sort: expressions run by Mongo, see plugins.query.RowQuery. Keyset pagination can't be sorted.
+    """
     total = 0 
-    left = 0
-    tablename = None
+    next_token = None
+    prev_token = None
+    keyset = pagination == "keyset" or after is not None or before is not None
     mongodb = get_mongodb()
-    db = get_db()
-    dataset: Dataset = Dataset.get_dataset_by_id(db, dataset_id)
-    if dataset is None:
-        raise CustomException(error=f"Dataset with id {dataset_id} not found.", status=status.HTTP_404_NOT_FOUND)
-    
-    # if dataset.status in [Dataset.progress.EXTRACTED, Dataset.progress.READY, Dataset.progress.FAILED]:
+    dataset = get_readable_dataset(dataset_id)
     tablename = dataset.prod_tablename
     
     result = []
     if tablename and dataset.locked == False:
-        fields = {}
-        cursor = mongodb[tablename].find().skip(skip).limit(limit)
-
-        if len(columns) > 0:
-            dataset_columns = dataset.get_column_name_list()
-            for col in columns:
-                if col in dataset_columns:
-                    fields[col] = 1
-            
-            if fields:
-                cursor = mongodb[tablename].find({}, fields).skip(skip).limit(limit)
+        fields, query = prepare_data_query(dataset, columns, filters, sort, keyset)
+        if query.columns:
+            QueryStats(mongodb).record(dataset.id, query.columns)
+
+        if keyset:
+            rows, next_token, prev_token = get_keyset_page(mongodb[tablename], fields, limit, after, before, query.filter)
+        else:
+            rows = mongodb[tablename].find(query.filter, fields)
+            if query.is_sorted:
+                rows = rows.sort(query.sort)
+            rows = rows.skip(skip).limit(limit)
         
-        for row in cursor:
+        for row in rows:
             row['_id'] = str(row['_id'])
             result.append(row)
-            returned += 1
 
-        total = mongodb[tablename].count_documents({})
-        left = total - (skip + limit)
-        if left < 0:
-            left = 0
+        if query.is_filtered:
+            total = get_filtered_row_count(mongodb[tablename], query.filter, count)
+        else:
+            total = get_dataset_row_count(dataset, mongodb[tablename], count)
 
-    response = {
+    response = dataset_data_response(dataset, result, skip, limit, total, keyset, next_token, prev_token, count)
+    return SuccessResponse(data=DatasetSchema.DatasetData(data=response)).response()
+
+
+def get_readable_dataset(dataset_id:int) -> Dataset:
+    db = get_db()
+    dataset: Dataset = Dataset.get_dataset_by_id(db, dataset_id)
+    if dataset is None:
+        raise CustomException(error=f"Dataset with id {dataset_id} not found.", status=status.HTTP_404_NOT_FOUND)
+    return dataset
+
+
+def prepare_data_query(dataset:Dataset, columns:List[str], filters:List[str], sort:List[str], keyset:bool):
+    """
+    returns; the projection of the requested columns (None for all of them) and the RowQuery of filters and sort
+    """
+    fields = None
+    if len(columns) > 0:
+        dataset_columns = dataset.get_column_name_list()
+        fields = {col: 1 for col in columns if col in dataset_columns} or None
+
+    try:
+        query = RowQuery(dataset.get_column_name_dict(), filters, sort)
+    except DatasetException as e:
+        raise CustomException(error=str(e), status=status.HTTP_406_NOT_ACCEPTABLE)
+    if keyset and query.is_sorted:
+        raise CustomException(error="Keyset pagination is always ordered by _id, sort is not supported.", status=status.HTTP_406_NOT_ACCEPTABLE)
+    return fields, query
+
+
+def dataset_data_response(
+    dataset:Dataset, rows:list, skip:int, limit:int, total:int, keyset:bool, next_token:str, prev_token:str, count:str
+) -> dict:
+    if keyset or total is None:
+        left = None
+    else:
+        left = max(total - (skip + limit), 0)
+    return {
         "skip": skip,
         "limit": limit, 
         "total": total, 
-        "returned": returned,
+        "returned": len(rows),
         "columns": dataset.get_column_name_list(),
         "left": left,
-        "rows": result,
-        "locked": dataset.locked
+        "rows": rows,
+        "locked": dataset.locked,
+        "next": next_token,
+        "prev": prev_token,
+        "count": count
     }
-    return SuccessResponse(data=DatasetSchema.DatasetData(data=response)).response()
+
+
+def get_dataset_profiles(dataset_id:int):
+    """Column profiles computed at ingestion and kept up to date by manual inserts and row updates."""
+    db = get_db()
+    dataset: Dataset = Dataset.get_dataset_by_id(db, dataset_id)
+    if dataset is None:
+        raise CustomException(error=f"Dataset with id {dataset_id} not found.", status=status.HTTP_404_NOT_FOUND)
+    profiler = DatasetProfiler.load(dataset.id, dataset.get_column_name_dict(), get_mongodb())
+    return SuccessResponse(data=DatasetSchema.DatasetProfileList(data=profiler.summaries())).response()
+
+
+def get_dataset_aggregate(dataset_id:int, schema: DatasetSchema.DatasetAggregate):
+    """Group-by and metrics computed by Mongo, see plugins.aggregate.RowAggregation."""
+    db = get_db()
+    dataset: Dataset = Dataset.get_dataset_by_id(db, dataset_id)
+    if dataset is None:
+        raise CustomException(error=f"Dataset with id {dataset_id} not found.", status=status.HTTP_404_NOT_FOUND)
+
+    if dataset.locked or dataset.prod_tablename is None:
+        raise CustomException(error="Dataset is locked or has no data to aggregate.", status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    try:
+        aggregation = RowAggregation(
+            dataset.get_column_name_dict(), schema.group_by, [metric.dict() for metric in schema.metrics],
+            schema.filter, schema.limit
+        )
+    except DatasetException as e:
+        raise CustomException(error=str(e), status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    mongodb = get_mongodb()
+    rows = list(mongodb[dataset.prod_tablename].aggregate(aggregation.pipeline, allowDiskUse=True))
+    response = {
+        "columns": aggregation.columns,
+        "returned": len(rows),
+        "rows": rows
+    }
+    return SuccessResponse(data=DatasetSchema.DatasetAggregateResult(data=response)).response()
+
+
+def get_keyset_page(collection, fields:dict, limit:int, after:str = None, before:str = None, filter:dict = None):
+    """
+    Reads one page ordered by _id from the row after `after` (or up to the row before `before`), on the _id index
+    only. One extra row is read to know whether another page exists in that direction.
+    returns; rows, next token, prev token
+    """
+    query, direction = keyset_query(filter, after, before)
+    rows = list(collection.find(query, fields).sort("_id", direction).limit(limit + 1))
+    return keyset_page(rows, limit, after, before)
+
+
+def keyset_query(filter:dict = None, after:str = None, before:str = None):
+    """returns; the filter of a keyset page and the _id sort direction to read it in"""
+    filter = filter or {}
+    if before is not None:
+        return {**filter, "_id": {"$lt": decode_row_cursor(before)}}, -1
+    if after is not None:
+        return {**filter, "_id": {"$gt": decode_row_cursor(after)}}, 1
+    return filter, 1
+
+
+def keyset_page(rows:list, limit:int, after:str = None, before:str = None):
+    """rows: up to limit + 1 rows read with keyset_query. returns; rows, next token, prev token"""
+    has_more = len(rows) > limit
+    if before is not None:
+        rows = rows[:limit][::-1]
+        if len(rows) == 0:
+            return rows, None, None
+        return rows, encode_row_cursor(rows[-1]["_id"]), encode_row_cursor(rows[0]["_id"]) if has_more else None
+
+    rows = rows[:limit]
+    if len(rows) == 0:
+        return rows, None, None
+    next_token = encode_row_cursor(rows[-1]["_id"]) if has_more else None
+    prev_token = encode_row_cursor(rows[0]["_id"]) if after is not None else None
+    return rows, next_token, prev_token
+
+
+def get_dataset_row_count(dataset:Dataset, collection, count:str = "estimated"):
+    """
+    count:
+        exact: counts the collection (a full scan) and corrects the dataset's row counter with the result.
+        estimated: the row counter maintained by ingestion and manual inserts, or the collection metadata count
+            when the counter was never set.
+        none: no count, returns None.
+    """
+    if count == "none":
+        return None
+
+    if count == "exact":
+        total = collection.count_documents({})
+        correct_row_count(dataset, total)
+        return total
+
+    if dataset.prod_recordcount:
+        return dataset.prod_recordcount
+    return collection.estimated_document_count()
+
+
+def correct_row_count(dataset:Dataset, total:int):
+    if dataset.prod_recordcount != total:
+        db = get_db()
+        dataset.prod_recordcount = total
+        db.add(dataset)
+        db.flush()
+
+
+def get_filtered_row_count(collection, filter:dict, count:str = "estimated"):
+    """
+    Number of rows matching a filter. There is no maintained counter for a filter, only exact counts them.
+    """
+    if count == "exact":
+        return collection.count_documents(filter)
+    return None
@@ -0,0 +1,66 @@
+import pytest
+from bson import ObjectId
+
+from .base import decode_row_cursor, encode_row_cursor
+from .read import keyset_page, keyset_query
+from ....base.api_response import CustomException
+
+IDS = [ObjectId(i.to_bytes(12, 'big')) for i in range(1, 11)]
+
+
+def rows(ids):
+    return [{"_id": _id} for _id in ids]
+
+
+def test_row_cursor_round_trip():
+    token = encode_row_cursor(IDS[3])
+    assert '=' not in token
+    assert decode_row_cursor(token) == IDS[3]
+
+
+def test_invalid_row_cursor_raises():
+    with pytest.raises(CustomException):
+        decode_row_cursor("not a token")
+
+
+def test_keyset_query_first_page():
+    assert keyset_query({"age": {"$gte": 18}}) == ({"age": {"$gte": 18}}, 1)
+
+
+def test_keyset_query_after_and_before():
+    token = encode_row_cursor(IDS[4])
+    assert keyset_query({"age": {"$gte": 18}}, after=token) == ({"age": {"$gte": 18}, "_id": {"$gt": IDS[4]}}, 1)
+    assert keyset_query(None, before=token) == ({"_id": {"$lt": IDS[4]}}, -1)
+
+
+def test_keyset_page_first_page():
+    page, next_token, prev_token = keyset_page(rows(IDS[:4]), 3)
+    assert page == rows(IDS[:3])
+    assert decode_row_cursor(next_token) == IDS[2]
+    assert prev_token is None
+
+
+def test_keyset_page_last_page_after():
+    page, next_token, prev_token = keyset_page(rows(IDS[8:]), 3, after=encode_row_cursor(IDS[7]))
+    assert page == rows(IDS[8:])
+    assert next_token is None
+    assert decode_row_cursor(prev_token) == IDS[8]
+
+
+def test_keyset_page_before_is_put_back_in_order():
+    # read backwards from IDS[6] with _id descending.
+    page, next_token, prev_token = keyset_page(rows(IDS[5::-1][:4]), 3, before=encode_row_cursor(IDS[6]))
+    assert page == rows(IDS[3:6])
+    assert decode_row_cursor(next_token) == IDS[5]
+    assert decode_row_cursor(prev_token) == IDS[3]
+
+
+def test_keyset_page_before_the_first_rows():
+    page, next_token, prev_token = keyset_page(rows(IDS[1::-1]), 3, before=encode_row_cursor(IDS[2]))
+    assert page == rows(IDS[:2])
+    assert decode_row_cursor(next_token) == IDS[1]
+    assert prev_token is None
+
+
+def test_keyset_page_empty():
+    assert keyset_page([], 3, after=encode_row_cursor(IDS[9])) == ([], None, None)
@@ -1,19 +1,22 @@
 import datetime
 from datetime import date
-from decimal import Decimal 
 from pathlib import Path
 from typing import  List, Dict
 from uuid import uuid4
 
-from bson.decimal128 import Decimal128 
 from fastapi import UploadFile, status
 from fastapi.responses import FileResponse
 from frictionless import Schema, Field
 from frictionless.resource import Resource   
 import pandas as pd 
+from starlette.concurrency import run_in_threadpool
 from starlette_context import context
 
-from .base import cast_value_to_frictionless_datatype
+from .base import cast_rows_to_frictionless_datatypes
+from ...plugins.coercion import BSONCoercer
+from ...plugins.export import DatasetExporter, SNAPSHOT_FORMATS
+from ...plugins.exportcache import ExportCache
+from ...plugins.profile import DatasetProfiler
 from ...models import Project, Dataset, DatasetColumn, DownloadRequest
 from .. import schama as DatasetSchema
 from ... import controller as project_controller 
@@ -41,7 +44,28 @@ def create_dataset(schema: DatasetSchema.DatasetCreate):
     return SuccessResponse(data=DatasetSchema.Dataset.from_orm(dataset)).response()
 
 
-def upload_data_file(dataset_id:int, file: UploadFile):
+async def upload_data_file(dataset_id:int, file: UploadFile):
+    dataset_name = await run_in_threadpool(_check_data_file_upload, dataset_id)
+    
+    file_format = Path(file.filename).suffix
+    if file_format not in helpers.accepted_dataset_file_formats:
+        raise CustomException(error=f"File format not supported. Must be one of: {', '.join(helpers.accepted_dataset_file_formats)}", status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    uuid_filename = f"{dataset_name.rstrip().replace(' ', '_').lower()}_{str(uuid4()).replace('-', '')[:5]}{file_format.lower()}"
+    filedir = Path("project", "media", "dataset", date.today().strftime("%b-%Y"))
+    storage_path =  Path(settings.BASE_DIR, filedir, f"{uuid_filename}")
+    try:
+        file_hash = await filemanagement.save_upload_file_async(file, storage_path, settings.DATASET_MAX_UPLOAD_BYTES)
+    except OSError:
+        raise CustomException(error="Could not save the file for data extraction. Check the file and try again.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return await run_in_threadpool(
+        _save_data_file, dataset_id, str(Path(filedir, uuid_filename)), file_hash, file.filename, uuid_filename, file_format
+    )
+
+
+def _check_data_file_upload(dataset_id:int) -> str:
+    """returns; the dataset name"""
     db = get_db()
     dataset = Dataset.get_dataset_by_id(db, dataset_id)
     if dataset is None:
@@ -55,21 +79,15 @@ def upload_data_file(dataset_id:int, file: UploadFile):
             error="This dataset already has an existing table schema. Try adding new data that follows existing template.", 
             status=status.HTTP_406_NOT_ACCEPTABLE
         )
-    
-    file_format = Path(file.filename).suffix
-    if file_format not in helpers.accepted_dataset_file_formats:
-        raise CustomException(error=f"File format not supported. Must be one of: {', '.join(helpers.accepted_dataset_file_formats)}", status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    return dataset.name
 
-    uuid_filename = f"{dataset.name.rstrip().replace(' ', '_').lower()}_{str(uuid4()).replace('-', '')[:5]}{file_format.lower()}"
-    filedir = Path("project", "media", "dataset", date.today().strftime("%b-%Y"))
-    storage_path =  Path(settings.BASE_DIR, filedir, f"{uuid_filename}")
-    saved = filemanagement.save_upload_file(file, storage_path)
 
-    if not saved:
-        raise CustomException(error="Could not save the file for data extraction. Check the file and try again.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    dataset.file = str(Path(filedir, uuid_filename))
-    dataset.filename = file.filename
+def _save_data_file(dataset_id:int, file:str, file_hash:str, filename:str, uuid_filename:str, file_format:str):
+    db = get_db()
+    dataset = Dataset.get_dataset_by_id(db, dataset_id)
+    dataset.file = file
+    dataset.file_hash = file_hash
+    dataset.filename = filename
     dataset.uuid_filename = uuid_filename
     dataset.source = "file"
     dataset.format = file_format.replace('.', "")
@@ -105,8 +123,26 @@ def save_dataset_columns(dataset_id:int, columns: list):
  
 
 def add_dataset_data_manually(dataset_id:int, data:List[Dict]=[]):
-    db = get_db()
     mongodb = get_mongodb()
+    dataset, dataset_column_dict, documents = prepare_manual_insert(dataset_id, data)
+    tablename = dataset.prod_tablename
+
+    if len(documents) > 0 and tablename:
+        inserted_ids = mongodb[tablename].insert_many(documents).inserted_ids
+        DatasetProfiler.apply(dataset.id, dataset_column_dict, mongodb, lambda profiler: profiler.update_rows(documents))
+        count = len(inserted_ids)
+        collection_count = None if dataset.prod_recordcount else mongodb[tablename].estimated_document_count()
+        record_manual_insert(dataset, count, collection_count)
+        return manual_insert_response(count, len(data))
+    return manual_insert_response(0, len(data))
+
+
+def prepare_manual_insert(dataset_id:int, data:List[Dict]):
+    """
+    Checks the dataset, creates its collection if it has none yet and casts the rows to the column types.
+    returns; dataset, {column name: datatype}, documents to insert
+    """
+    db = get_db()
     dataset: Dataset = Dataset.get_dataset_by_id(db, dataset_id)
     if dataset is None:
         raise CustomException(error=f"Dataset with id {dataset_id} not found.", status=status.HTTP_404_NOT_FOUND)
@@ -115,53 +151,44 @@ def add_dataset_data_manually(dataset_id:int, data:List[Dict]=[]):
         raise CustomException(error="No data added. The data list did not contain any data dictionary.", status=status.HTTP_417_EXPECTATION_FAILED)
     
     dataset_column_dict = dataset.get_column_name_dict()
-    tablename = dataset.prod_tablename
-    if not tablename:
-        tablename = helpers.get_collection(dataset.name, mongodb).name
+    if not dataset.prod_tablename:
+        tablename = helpers.get_collection(dataset.name, get_mongodb()).name
         dataset.prod_tablename = tablename
         dataset.stagging_tablename = tablename
         db.add(dataset)
         db.flush()
+        if len(dataset.indexes) > 0:
+            gm_client.submit_job('dataset.index.build', {'dataset_id': dataset.id}, background=True, wait_until_complete=False)
 
-    documents = []
-    for row in data:
-        if not isinstance(row, dict):
-            continue 
-        
-        row_dict = {}
-        for k, v in row.items():
-            if k in dataset_column_dict.keys():
-                field_type = dataset_column_dict[k]
-                val = cast_value_to_frictionless_datatype(v, field_type)
-                if type(val) == Decimal:
-                    val = Decimal128(val)
-                if type(val) == int and val > helpers.MAX_INTEGER:
-                    val = Decimal128(Decimal(val))
-                if type(val) == datetime.date:
-                    val = datetime.datetime(year=val.year, month=val.month, day=val.day, hour=0, minute=0, second=0)
-                row_dict[k] = val 
-        
-        if len(row_dict) > 0:
-            documents.append(row_dict)
+    documents = cast_rows_to_frictionless_datatypes(data, dataset_column_dict)
+    BSONCoercer(dataset_column_dict).coerce_rows(documents)
+    return dataset, dataset_column_dict, documents
 
-    if len(documents) > 0 and tablename:
-        inserted_ids = mongodb[tablename].insert_many(documents).inserted_ids
-        count = len(inserted_ids)
-        dataset.stagging_recordcount += count
-        dataset.prod_recordcount += count 
-        dataset.status = Dataset.progress.READY
-        db.add(dataset)
-        db.flush()
-        response = {
-            "created": count, 
-            "submitted": len(data)
-        }
-        return SuccessResponse(data=response, message=f"{count} rows inserted successffully.").response()
-    
+
+def record_manual_insert(dataset:Dataset, count:int, collection_count:int = None):
+    """collection_count: the collection metadata count, only needed when the row counter was never set."""
+    db = get_db()
+    if dataset.prod_recordcount:
+        # incremented in the UPDATE statement, concurrent inserts can't overwrite each other's count.
+        dataset.stagging_recordcount = Dataset.stagging_recordcount + count
+        dataset.prod_recordcount = Dataset.prod_recordcount + count 
+    else:
+        # counter never maintained for this collection (e.g. ingested before it was), start from the metadata count.
+        dataset.stagging_recordcount = Dataset.stagging_recordcount + count
+        dataset.prod_recordcount = collection_count
+    dataset.status = Dataset.progress.READY
+    db.add(dataset)
+    db.flush()
+    ExportCache(db).invalidate(dataset)
+
+
+def manual_insert_response(count:int, submitted:int):
     response = {
-            "created": 0, 
-            "submitted": len(data)
-        }
+        "created": count, 
+        "submitted": submitted
+    }
+    if count > 0:
+        return SuccessResponse(data=response, message=f"{count} rows inserted successffully.").response()
     return SuccessResponse(data=response, message=f"0 rows inserted.").response()
 
 
@@ -283,28 +310,91 @@ def download_dataset(schema: DatasetSchema.CreateDownloadRequest):
     request.columns = {'columns': columns}
     request.exclude = {'exclude': exclude}
     request.format = schema.format
+    request.ready = False
+
+    export_columns = [col for col in dataset_columns if col not in exclude]
+    export = ExportCache(db).lookup(dataset, export_columns, schema.format)
+    if export is not None:
+        request.file = export.file
+        request.ready = True
     db.add(request)
     db.flush()
+    if request.ready:
+        return SuccessResponse(data=DatasetSchema.DownloadRequest.from_orm(request)).response()
+
+    gm_client.submit_job('dataset.download.export', {'download_request_id': request.id}, background=True, wait_until_complete=False)
+    return SuccessResponse(data=DatasetSchema.DownloadRequest.from_orm(request)).response()
+
+
+def export_download_request(download_request_id: int) -> bool:
+    """
+    Writes the file of a download request, runs on the gearman worker (dataset.download.export).
+    The request gets its file link and is flagged ready, the user is notified. A failed export raises and is
+    retried by the job ledger, the user is only told about the failure after the last attempt (notify_failed_download).
+    """
+    db = get_db()
+    request = db.query(DownloadRequest).filter(DownloadRequest.id == download_request_id).first()
+    if request is None or request.ready:
+        return False
+
+    dataset = Dataset.get_dataset_by_id(db, request.dataset_id)
+    if dataset is None or dataset.prod_tablename is None:
+        gm_client.submit_job('notification.single', {
+            'user_id': request.user_id, 'message': f"Download request {request.id} failed: the dataset has no data to download."
+        }, background=True, wait_until_complete=False)
+        return False
+
+    exclude = (request.exclude or {}).get('exclude', [])
+    export_columns = [col for col in dataset.get_column_name_list() if col not in exclude]
+    data_version = dataset.data_version
 
-    mongodb = get_mongodb()
-    data = mongodb[collection].find({})
-    df = pd.DataFrame.from_records(data, index=['_id'], exclude=exclude)
     folder = Path('project', 'media', 'downloads', 'files', date.today().strftime("%b-%Y"))
-    filename = f"{dataset.name} - {datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{schema.format}"
+    filename = f"{dataset.name} - {datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{request.format}"
     storage_path = Path(settings.BASE_DIR, folder, filename)
     storage_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # column_name_dict = dataset.get_column_name_dict()
-    # for k, v in column_name_dict.items():
-    #     if v == 'number':
-    #         df[k] = df[k].astype(str).astype(float, errors='ignore')
 
-    if schema.format == 'xlsx':
-        df.to_excel(storage_path, sheet_name='data')
-    if schema.format == 'csv':
-        df.to_csv(storage_path)
-    download_link = f"{settings.SERVER_BASE_URL}/cdn/{folder}/{filename}"
-    return SuccessResponse(data=download_link).response()
+    snapshot = None
+    if request.format in SNAPSHOT_FORMATS and dataset.snapshot_file and dataset.snapshot_version == data_version:
+        snapshot = Path(settings.BASE_DIR, dataset.snapshot_file)
+        if not snapshot.exists():
+            snapshot = None
+
+    mongodb = get_mongodb()
+    exporter = DatasetExporter(
+        mongodb[dataset.prod_tablename], export_columns, dataset.get_column_name_dict(), snapshot=snapshot
+    )
+    try:
+        exporter.export(storage_path, request.format)
+    except Exception:
+        storage_path.unlink(missing_ok=True)
+        raise
+
+    request.file = f"{settings.SERVER_BASE_URL}/cdn/{folder}/{filename}"
+    request.ready = True
+    db.add(request)
+    db.flush()
+
+    db.refresh(dataset)
+    if dataset.data_version == data_version:
+        ExportCache(db).store(dataset.id, data_version, export_columns, request.format, Path(folder, filename), request.file)
+
+    gm_client.submit_job('notification.single', {
+        'user_id': request.user_id, 'message': f"Your {request.format} download of dataset {dataset.name} is ready: {request.file}"
+    }, background=True, wait_until_complete=False)
+    return True
+
+
+def notify_failed_download(download_request_id: int):
+    """Tells the user that the download request failed, once its export job is dead-lettered."""
+    db = get_db()
+    request = db.query(DownloadRequest).filter(DownloadRequest.id == download_request_id).first()
+    if request is None or request.ready:
+        return
+    dataset = Dataset.get_dataset_by_id(db, request.dataset_id)
+    name = dataset.name if dataset is not None else request.dataset_id
+    gm_client.submit_job('notification.single', {
+        'user_id': request.user_id, 'message': f"Download of dataset {name} failed. Please try again."
+    }, background=True, wait_until_complete=False)
 
 
 def download_dataset_template(schema: DatasetSchema.CreateDownloadRequest):
@@ -321,8 +411,8 @@ def download_dataset_template(schema: DatasetSchema.CreateDownloadRequest):
     if dataset.locked or dataset.fields == 0: 
         raise CustomException(error="Dataset is locked impossible to read rows.", status=status.HTTP_406_NOT_ACCEPTABLE)
 
-    if schema.format not in helpers.download_file_formats:
-        raise CustomException(error=f"Download format not supported. Must be one of {', '.join(helpers.download_file_formats)}", status=status.HTTP_406_NOT_ACCEPTABLE)
+    if schema.format not in helpers.template_file_formats:
+        raise CustomException(error=f"Download format not supported. Must be one of {', '.join(helpers.template_file_formats)}", status=status.HTTP_406_NOT_ACCEPTABLE)
     dataset_columns = dataset.get_column_name_list()
     include = []
     valid_columns = 0
@@ -364,8 +454,8 @@ def download_dataset_columns(schema: DatasetSchema.CreateDownloadRequest):
     if dataset.locked or dataset.fields == 0: 
         raise CustomException(error="Dataset is locked impossible to read rows.", status=status.HTTP_406_NOT_ACCEPTABLE)
 
-    if schema.format not in helpers.download_file_formats:
-        raise CustomException(error=f"Download format not supported. Must be one of {', '.join(helpers.download_file_formats)}", status=status.HTTP_406_NOT_ACCEPTABLE)
+    if schema.format not in helpers.template_file_formats:
+        raise CustomException(error=f"Download format not supported. Must be one of {', '.join(helpers.template_file_formats)}", status=status.HTTP_406_NOT_ACCEPTABLE)
     dataset_columns_list = dataset.get_column_name_list()
     dataset_columns_dict = dataset.get_name_as_key_column_dict() 
 
@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta 
 from ..plugins import fdw 
+from . import controller
+from ..models import Dataset
 from ...scheduler import scheduler
 from ...factory import gm_worker
-from ...utils import printer 
+from ...utils import job_ledger, printer 
+from ...utils.db_connection import get_db, session_scope
 
 
 def start_file_data_warehousing_process(dataset_id:int):
@@ -19,11 +22,63 @@ def __start_file_data_warehousing_process(worker, job):
         "project.dataset.jobs.__start_file_data_warehousing_process"
     )
     dataset_id = job.data.get('dataset_id')
-    process = fdw.FileDataWarehousing(dataset_id=dataset_id)
-    process.run_data_extraction_processes()
+    with session_scope():
+        process = fdw.FileDataWarehousing(dataset_id=dataset_id)
+        process.run_data_extraction_processes()
     printer.rprint(
         f"Task on dataset id: {job.data.get('dataset_id')} Completed.",
         "project.dataset.jobs.__start_file_data_warehousing_process"
     )
 
-gm_worker.register_task('dataset.stagging.extract', __start_file_data_warehousing_process)
\ No newline at end of file
+
+@job_ledger.on_failure('dataset.stagging.extract')
+def mark_dataset_extraction_as_failed(data:dict, error:str, dead:bool):
+    """The error is shown on the dataset, after the last attempt it is FAILED and unlocked."""
+    db = get_db()
+    dataset = Dataset.get_dataset_by_id(db, data.get('dataset_id'))
+    if dataset is None:
+        return
+    dataset.error = error[:2000]
+    if dead:
+        dataset.status = Dataset.progress.FAILED
+        dataset.locked = False
+    db.add(dataset)
+    db.flush()
+
+
+@job_ledger.on_failure('dataset.download.export')
+def notify_failed_download(data:dict, error:str, dead:bool):
+    """The user is notified once, when the export won't be retried anymore."""
+    if dead:
+        controller.write.notify_failed_download(data.get('download_request_id'))
+
+
+def export_download_request(worker, job):
+    download_request_id = job.data.get('download_request_id')
+    printer.rprint(
+        f"Task Received for download request id: {download_request_id}",
+        "project.dataset.jobs.export_download_request"
+    )
+    with session_scope():
+        controller.write.export_download_request(download_request_id)
+    printer.rprint(
+        f"Task on download request id: {download_request_id} Completed.",
+        "project.dataset.jobs.export_download_request"
+    )
+
+def build_dataset_indexes(worker, job):
+    dataset_id = job.data.get('dataset_id')
+    printer.rprint(
+        f"Task Received for indexes of dataset id: {dataset_id}",
+        "project.dataset.jobs.build_dataset_indexes"
+    )
+    with session_scope():
+        ready = controller.index.build_dataset_indexes(dataset_id, job.data.get('rebuild', False))
+    printer.rprint(
+        f"Task on indexes of dataset id: {dataset_id} Completed, {ready} ready.",
+        "project.dataset.jobs.build_dataset_indexes"
+    )
+
+gm_worker.register_task('dataset.stagging.extract', __start_file_data_warehousing_process)
+gm_worker.register_task('dataset.download.export', export_download_request)
+gm_worker.register_task('dataset.index.build', build_dataset_indexes)
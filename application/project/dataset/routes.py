@@ -10,10 +10,13 @@ from .. import helpers
 from . import schama as DatasetSchema 
 from ..dataset import controller
 from ...base import schema as BaseSchema 
+from ...config import settings
+from ...utils import filemanagement
 
 
 router = APIRouter(
-    tags=['dataset']
+    tags=['dataset'],
+    route_class=filemanagement.UploadLimitRoute
 )
 
 
@@ -27,12 +30,14 @@ def create_dataset(schema: DatasetSchema.DatasetCreate):
 @router.post('/datasets/uploadfile', response_model=BaseSchema.SuccessResponse, responses={
         404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not found"},
         406: {"model": BaseSchema.FailedResponse, "description": "Dataset Locked"},
+        413: {"model": BaseSchema.FailedResponse, "description": "File too large"},
         415: {"model": BaseSchema.FailedResponse, "description": "File format invalid"},
     },
     description=f"File uploaded must be one of following formats: {', '.join(helpers.accepted_dataset_file_formats)}"
 )
-def upload_data_file(dataset_id:int = Body(...), file:UploadFile = File(...)):
-    return controller.write.upload_data_file(dataset_id, file)
+@filemanagement.max_upload_size(settings.DATASET_MAX_UPLOAD_BYTES)
+async def upload_data_file(dataset_id:int = Body(...), file:UploadFile = File(...)):
+    return await controller.write.upload_data_file(dataset_id, file)
 
 
 @router.post('/datasets/columns/create', response_model=DatasetSchema.ColumnList, responses={
@@ -69,8 +74,8 @@ def create_dataset(dataset_id:int):
     406: {'model': BaseSchema.FailedResponse, 'description': 'data object not a dictionary'},
     417: {'model': BaseSchema.FailedResponse, 'description': 'No data submitted'}
 }, description='The datatype must match if not the field value in question may be set to Null')
-def update_dataset_row_manually(schema: DatasetSchema.UpdateDatasetRowManually):
-    return controller.change.update_dataset_row_manually(schema)
+async def update_dataset_row_manually(schema: DatasetSchema.UpdateDatasetRowManually):
+    return await controller.aio.update_dataset_row_manually(schema)
 
 
 @router.get('/{project_id}/datasets', response_model=DatasetSchema.DatasetList, responses={
@@ -88,22 +93,47 @@ def get_dataset_columns(dataset_id:int):
 
 
 @router.get('/datasets/{dataset_id}/data', response_model=DatasetSchema.DatasetData, responses={
-    404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"}
+    404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"},
+    406: {"model": BaseSchema.FailedResponse, "description": "Invalid pagination token, filter or sort"}
 })
-def get_dataset_data(dataset_id:int, skip:int=0, limit:int=100, columns:List[str] = Query(None, description="A list of column names to be returned. Any non-existing column will be silently ignored.")):
+async def get_dataset_data(
+    dataset_id:int, skip:int=0, limit:int=100, 
+    columns:List[str] = Query(None, description="A list of column names to be returned. Any non-existing column will be silently ignored."),
+    pagination:str = Query("offset", regex="^(offset|keyset)$", description="offset: skip/limit paging. keyset: paging with the next/prev tokens, same cost on every page."),
+    after:Optional[str] = Query(None, description="<next> token of the previous page. Implies keyset pagination."),
+    before:Optional[str] = Query(None, description="<prev> token of the next page. Implies keyset pagination."),
+    count:str = Query("estimated", regex="^(exact|estimated|none)$", description="exact: counts the rows (slow on large datasets). estimated: maintained row counter, no total when filtered. none: no total."),
+    filter:List[str] = Query(None, description="column:operator[:value], all must match. Operators: eq, ne, gt, gte, lt, lte, between (low,high), in (a,b,c), nin, contains (string columns), null, notnull."),
+    sort:List[str] = Query(None, description="column for ascending, -column for descending order. Not available with keyset pagination.")
+):
     if columns == None:
         columns = []
-    return controller.read.get_dataset_data(dataset_id, skip, limit, columns)
+    return await controller.aio.get_dataset_data(dataset_id, skip, limit, columns, pagination, after, before, count, filter or [], sort or [])
+
+
+@router.get('/datasets/{dataset_id}/profiles', response_model=DatasetSchema.DatasetProfileList, responses={
+    404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"}
+}, description="Per column null count, distinct estimate, min/max, mean/stddev, top values and histogram. Computed at ingestion, without reading the data.")
+def get_dataset_profiles(dataset_id:int):
+    return controller.read.get_dataset_profiles(dataset_id)
+
+
+@router.post('/datasets/{dataset_id}/aggregate', response_model=DatasetSchema.DatasetAggregateResult, responses={
+    404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"},
+    406: {"model": BaseSchema.FailedResponse, "description": "Invalid group, metric or filter"}
+}, description="Group-by computed by the database. Metric functions: count, sum, mean, min, max, distinct. filter takes the same expressions as /datasets/{dataset_id}/data.")
+def get_dataset_aggregate(dataset_id:int, schema: DatasetSchema.DatasetAggregate):
+    return controller.read.get_dataset_aggregate(dataset_id, schema)
 
 
 @router.post('/datasets/adddata/manually', response_model=BaseSchema.SuccessResponse, responses={
      404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"},
      417: {"model": BaseSchema.FailedResponse, "description": "No content submitted."}
 }, description="column names must already exist and data values should match existing types otherwise, it will fail silently.")
-def add_dataset_data_manually(dataset_id:int = Body(...), data:List[Dict] = Body(...)):
+async def add_dataset_data_manually(dataset_id:int = Body(...), data:List[Dict] = Body(...)):
     if data == None:
         data = []
-    return controller.write.add_dataset_data_manually(dataset_id, data)
+    return await controller.aio.add_dataset_data_manually(dataset_id, data)
 
 
 @router.get('/datasets/datatypes/list', response_model=BaseSchema.SuccessResponse)
@@ -114,11 +144,18 @@ def get_datatypes():
 @router.post('/datasets/download/dataset', response_model=BaseSchema.SuccessResponse, responses={
     404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"},
     406: {"model": BaseSchema.FailedResponse, "description": "Wrong values or Data Not Available."}
-})
+}, description="Returns the download request at once, the file is written in the background. Poll /datasets/download/requests/{download_request_id} until ready.")
 def download_dataset(schema: DatasetSchema.CreateDownloadRequest):
     return controller.write.download_dataset(schema)
 
 
+@router.get('/datasets/download/requests/{download_request_id}', response_model=BaseSchema.SuccessResponse, responses={
+    404: {"model": BaseSchema.FailedResponse, "description": "Download Request Not Found"},
+}, description="file is set once ready is true.")
+def get_download_request(download_request_id:int):
+    return controller.read.get_download_request(download_request_id)
+
+
 @router.post('/datasets/download/template', response_model=BaseSchema.SuccessResponse, responses={
     404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"},
     406: {"model": BaseSchema.FailedResponse, "description": "Wrong values or Data Not Available."}
@@ -135,6 +172,38 @@ def download_dataset_columns(schema: DatasetSchema.CreateDownloadRequest):
     return controller.write.download_dataset_columns(schema)
 
 
+@router.post('/datasets/indexes/create', response_model=DatasetSchema.DatasetIndexList, responses={
+    403: {"model": BaseSchema.FailedResponse, "description": "Permission Denied"},
+    404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"},
+    406: {"model": BaseSchema.FailedResponse, "description": "Invalid columns"}
+}, description="Declares indexed columns. Indexes are built in the background, see their status.")
+def create_dataset_indexes(schema: DatasetSchema.DatasetIndexCreate):
+    return controller.index.create_dataset_indexes(schema)
+
+
+@router.get('/datasets/{dataset_id}/indexes', response_model=DatasetSchema.DatasetIndexList, responses={
+    404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"}
+})
+def get_dataset_indexes(dataset_id:int):
+    return controller.index.get_dataset_indexes(dataset_id)
+
+
+@router.get('/datasets/{dataset_id}/indexes/suggestions', response_model=BaseSchema.SuccessResponse, responses={
+    404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"}
+}, description="Columns most used by data filters and sorts which are not indexed yet.")
+def get_index_suggestions(dataset_id:int, min_queries:int = 10):
+    return controller.index.get_index_suggestions(dataset_id, min_queries)
+
+
+@router.delete('/datasets/indexes/{index_id}', response_model=BaseSchema.SuccessResponse, responses={
+    403: {"model": BaseSchema.FailedResponse, "description": "Permission Denied"},
+    404: {"model": BaseSchema.FailedResponse, "description": "Index Not Found"},
+    406: {"model": BaseSchema.FailedResponse, "description": "Index being built"}
+})
+def delete_dataset_index(index_id:int):
+    return controller.index.delete_dataset_index(index_id)
+
+
 @router.post('/datasets/reports/create', response_model=DatasetSchema.DatasetReport, responses={
     404: {"model": BaseSchema.FailedResponse, "description": "Dataset Not Found"},
     406: {"model": BaseSchema.FailedResponse, "description": "Wrong values or Data Not Available."}
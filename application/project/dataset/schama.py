@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Dict, Optional, List
-from pydantic import BaseModel, validator 
+from typing import Any, Dict, Optional, List
+from pydantic import BaseModel, conint, validator 
 
 from ...base.schema import SuccessResponse 
 from ...session.schema import MiniUser
@@ -37,6 +37,30 @@ class DatasetColumnCreate(BaseModel):
     columns: List[BaseColumn]
 
 
+class DatasetIndex(BaseModel):
+    id: int 
+    column: str 
+    status: str 
+    error: Optional[str]
+    created_at: datetime 
+    updated_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True 
+
+
+class DatasetIndexList(SuccessResponse):
+    data: List[DatasetIndex]
+
+    class Config:
+        orm_mode = True 
+
+
+class DatasetIndexCreate(BaseModel):
+    dataset_id: int 
+    columns: List[str]
+
+
 class BaseDataset(BaseModel):
     name: Optional[str]
     description: Optional[str]
@@ -56,12 +80,15 @@ class Dataset(BaseDataset):
     format: Optional[str] 
     source: Optional[str] 
     filename: Optional[str] 
+    file_hash: Optional[str]
     columns: List[Column]
+    indexes: List[DatasetIndex] = []
     fields: int 
     user: MiniUser
     prod_recordcount: int = 0
     stagging_recordcount: int = 0
     status: Optional[str] 
+    error: Optional[str]
     imported: bool 
     archived: bool
     locked: bool = False 
@@ -108,16 +135,58 @@ class DatasetData(SuccessResponse):
     class _DatasetData(BaseModel):
         skip: int = 0
         limit: int = 100
-        total: int 
+        total: Optional[int]
         returned: int
         columns: List 
-        left: int 
+        left: Optional[int]
         rows: List[Dict]
         locked: bool = False 
+        next: Optional[str] = None
+        prev: Optional[str] = None
+        count: str = "estimated"
     
     data: _DatasetData
 
 
+class AggregateMetric(BaseModel):
+    function: str 
+    column: Optional[str]
+
+
+class DatasetAggregate(BaseModel):
+    group_by: List[str] = []
+    metrics: List[AggregateMetric]
+    filter: List[str] = []
+    limit: conint(gt=0, le=10000) = 1000
+
+
+class DatasetAggregateResult(SuccessResponse):
+    class _DatasetAggregateResult(BaseModel):
+        columns: List[str]
+        returned: int 
+        rows: List[Dict]
+
+    data: _DatasetAggregateResult
+
+
+class ColumnProfile(BaseModel):
+    column: str 
+    datatype: str 
+    rows: int = 0
+    null_count: int = 0
+    distinct_estimate: int = 0
+    min: Optional[Any]
+    max: Optional[Any]
+    mean: Optional[float]
+    stddev: Optional[float]
+    top: List[Dict] = []
+    histogram: List[Dict] = []
+
+
+class DatasetProfileList(SuccessResponse):
+    data: List[ColumnProfile]
+
+
 class UpdateDatasetRowManually(BaseModel):
     dataset_id: int 
     data: Dict 
@@ -129,6 +198,20 @@ class CreateDownloadRequest(BaseModel):
     columns: Optional[List[str]]
 
 
+class DownloadRequest(BaseModel):
+    id: int 
+    dataset_id: int 
+    format: str 
+    ready: bool = False 
+    expired: bool = False
+    file: Optional[str]
+    created_at: datetime 
+    updated_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True 
+
+
 class ReportDatasetColumn(BaseModel):
     name: str 
 
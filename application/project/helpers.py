@@ -1,10 +1,17 @@
 import re 
+from functools import lru_cache
+from typing import Any, Callable
+
+from frictionless import types, Field
 
 # constants 
 MAX_INTEGER = 9223372036854775807
+MIN_INTEGER = -9223372036854775808
 DEFAULT_FIELD_MISSING_VALUES = ['n/a', 'NULL', 'Null', 'null', 'N/A', ""]
 accepted_dataset_file_formats = [".xls", ".xlsx", ".csv"]
-download_file_formats = ['xlsx', 'csv']
+download_file_formats = ['xlsx', 'csv', 'parquet', 'feather']
+# templates and column lists are written with pandas, only to the spreadsheet formats.
+template_file_formats = ['xlsx', 'csv']
 api_data_types = [
     "string", "number", "integer", "boolean", "object", "array", "date", "time", "datetime", 
     "geopoint", "geojson", "any"
@@ -96,3 +103,36 @@ class CONSTANTS:
 
 
 project_status_list = [CONSTANTS.ACTIVE, CONSTANTS.CANCELLED, CONSTANTS.CLOSED, CONSTANTS.SUSPENDED]
+
+
+@lru_cache(maxsize=None)
+def get_frictionless_cell_caster(to_datatype:str, group_char:str=',', bare_number:bool=False) -> Callable[[Any], Any]:
+    """
+    Returns the cell reader of a frictionless type, built once per (datatype, options). Building the Field and the
+    Type for every cell also meant compiling their cell processors again for every value.
+    """
+    FrictionlessType = frictionless_cell_type_mapper.get(to_datatype, types.StringType)
+    field = Field(type=to_datatype, group_char=group_char, bare_number=bare_number)
+    read_cell = FrictionlessType(field).read_cell
+    if to_datatype in ['date', 'datetime']:
+        return lambda value: read_cell(str(value).replace(' ', ''))
+    return read_cell
+
+
+frictionless_cell_type_mapper = {
+    "any": types.AnyType,
+    "array": types.ArrayType,
+    "boolean": types.BooleanType,
+    "date": types.DateType, 
+    "datetime": types.DatetimeType, 
+    "duration": types.DurationType, 
+    "geojson": types.GeojsonType, 
+    "geopoint": types.GeopointType,
+    "integer": types.IntegerType, 
+    "number": types.NumberType, 
+    "object": types.ObjectType, 
+    "string": types.StringType, 
+    "time": types.TimeType, 
+    "year": types.YearType, 
+    "yearmonth": types.YearmonthType
+}
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm.session import Session
+
+from ..config import settings
+from ..utils.db_connection import get_db
+from .models import Dataset, Members, Project
+
+
+class MembershipIndex:
+    """
+    Per process index of project memberships: {user_id: {project_id: permission}} over the projects that are not
+    deleted, loaded with one query the first time a user is checked. Datasets are mapped to their project the same
+    way, so a permission check is a dictionary lookup. Member changes made by this process invalidate the user
+    (`invalidate_user`), other processes see them after at most `ttl` seconds.
+
+    usage example:
+        membership_index.permission(user_id, project_id) => "Manager" or None
+        membership_index.dataset_project_id(dataset_id) => 4
+        membership_index.invalidate_user(user_id)
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[int, tuple]" = OrderedDict()
+        self._datasets: "OrderedDict[int, int]" = OrderedDict()
+
+    def permission(self, user_id: int, project_id: int) -> Optional[str]:
+        return self.memberships(user_id).get(project_id)
+
+    def project_ids(self, user_id: int) -> List[int]:
+        return list(self.memberships(user_id))
+
+    def memberships(self, user_id: int) -> Dict[int, str]:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._users.move_to_end(user_id)
+                return entry[1]
+
+        memberships = self._load_user(user_id)
+        if self._ttl > 0:
+            with self._lock:
+                self._users[user_id] = (time.monotonic() + self._ttl, memberships)
+                self._users.move_to_end(user_id)
+                while len(self._users) > self._max_size:
+                    self._users.popitem(last=False)
+        return memberships
+
+    def dataset_project_id(self, dataset_id: int) -> Optional[int]:
+        """A dataset never moves to another project, the mapping doesn't expire."""
+        with self._lock:
+            project_id = self._datasets.get(dataset_id)
+            if project_id is not None:
+                self._datasets.move_to_end(dataset_id)
+                return project_id
+
+        db: Session = get_db()
+        row = db.query(Dataset.project_id).filter(Dataset.id == dataset_id).first()
+        if row is None or row.project_id is None:
+            return None
+        with self._lock:
+            self._datasets[dataset_id] = row.project_id
+            while len(self._datasets) > self._max_size:
+                self._datasets.popitem(last=False)
+        return row.project_id
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def invalidate_project(self, project_id: int) -> None:
+        """Every loaded user of the project, after the project itself changed (e.g. deleted)."""
+        with self._lock:
+            for user_id in [user_id for user_id, (_, memberships) in self._users.items() if project_id in memberships]:
+                del self._users[user_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self._datasets.clear()
+
+    @staticmethod
+    def _load_user(user_id: int) -> Dict[int, str]:
+        db: Session = get_db()
+        rows = db.query(Members.project_id, Members.permission).join(
+            Project, Project.id == Members.project_id
+        ).filter(
+            Members.user_id == user_id, Project.deleted == False
+        ).all()
+        return {project_id: permission for project_id, permission in rows}
+
+
+membership_index = MembershipIndex(settings.MEMBERSHIP_CACHE_TTL, settings.MEMBERSHIP_CACHE_SIZE)
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, UniqueConstraint, DECIMAL
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Integer, String, DateTime, UniqueConstraint, DECIMAL
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.orm.session import Session
 from sqlalchemy.sql import func
@@ -33,6 +33,7 @@ class Dataset(Base):
     file = Column(String(600), nullable=True)
     filename = Column(String(100), nullable=True)
     uuid_filename = Column(String(50), nullable=True)
+    file_hash = Column(String(64), nullable=True, index=True)
     photo = Column(String(400), nullable=True)
     format = Column(String(10), nullable=True)
     stagging_tablename = Column(String(30), nullable=True)
@@ -40,7 +41,10 @@ class Dataset(Base):
     prod_tablename = Column(String(30), nullable=True)
     prod_recordcount = Column(Integer, default=0)
     resource_file = Column(String(1000), nullable=True)
+    snapshot_file = Column(String(1000), nullable=True)
+    snapshot_version = Column(Integer, nullable=True)
     status = Column(String(20), nullable=True)
+    error = Column(String(2000), nullable=True)
     extraction_duration = Column(DECIMAL(10, 4), nullable=True)
     processing_duration = Column(DECIMAL(10, 4), nullable=True)
     loading_duration = Column(DECIMAL, nullable=True)
@@ -48,9 +52,11 @@ class Dataset(Base):
     archived = Column(Boolean, default=False)
     deleted = Column(Boolean, default=False)
     locked = Column(Boolean, default=False)
+    data_version = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     columns = relationship("DatasetColumn", back_populates="dataset")
+    indexes = relationship("DatasetIndex", back_populates="dataset")
 
     progress = Progress()
 
@@ -102,6 +108,40 @@ class DatasetColumn(Base):
         return column 
 
 
+class IndexStatus:
+    PENDING = 'pending'
+    BUILDING = 'building'
+    READY = 'ready'
+    FAILED = 'failed'
+
+
+class DatasetIndex(Base):
+    """A secondary index declared on a column of the dataset collection, built by the gearman worker."""
+    __tablename__ = "datasetindexes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    dataset_id = Column(Integer, ForeignKey("datasets.id"))
+    dataset = relationship("Dataset", back_populates="indexes")
+    column = Column(String(100), nullable=False)
+    status = Column(String(20), default=IndexStatus.PENDING)
+    error = Column(String(1000), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    progress = IndexStatus()
+
+    @property
+    def name(self):
+        return f"rims_{self.column}"
+
+    @staticmethod
+    def get_index_by_id(db: Session, id:int):
+        return db.query(DatasetIndex).filter(DatasetIndex.id == id).first()
+
+UniqueConstraint(DatasetIndex.dataset_id, DatasetIndex.column)
+
+
 class Tags(Base):
     __tablename__ = "tags"
 
@@ -191,10 +231,10 @@ class Members(Base):
 
     @staticmethod
     def get_user_project_id_list(db: Session, user_id:int):
-        memberships = db.query(Members).filter(
-            Members.user_id == user_id
+        rows = db.query(Members.project_id).join(Project, Project.id == Members.project_id).filter(
+            Members.user_id == user_id, Project.deleted == False
         ).all()
-        return [m.project_id for m in memberships if m.project.deleted == False]
+        return [row.project_id for row in rows]
 
 
 class DownloadRequest(Base):
@@ -206,12 +246,32 @@ class DownloadRequest(Base):
     format = Column(String(10))
     file = Column(String(1000), nullable=True)
     ready = Column(Boolean, default=False)
+    # the file was removed from the export cache (data changed or evicted), the link is gone.
+    expired = Column(Boolean, default=False)
     exclude = Column(JSON, nullable=True)
     columns = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
+class DatasetExport(Base):
+    """An export file of a dataset, reusable as long as the dataset data_version doesn't change."""
+    __tablename__ = 'datasetexports'
+
+    id = Column(Integer, primary_key=True)
+    dataset_id = Column(Integer, ForeignKey('datasets.id'), index=True)
+    data_version = Column(Integer, default=0)
+    columns_key = Column(String(64), nullable=False)
+    format = Column(String(10))
+    path = Column(String(1000))
+    file = Column(String(1000))
+    size = Column(BigInteger, default=0)
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+UniqueConstraint(DatasetExport.dataset_id, DatasetExport.data_version, DatasetExport.columns_key, DatasetExport.format)
+
+
 class Report(Base):
     __tablename__ = 'reports'
 
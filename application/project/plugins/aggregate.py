@@ -0,0 +1,140 @@
+from typing import Dict, List
+
+from ..exception import DatasetException
+from ..plugins.query import RowQuery, UNORDERED_TYPES
+
+FUNCTIONS = ['count', 'sum', 'mean', 'min', 'max', 'distinct']
+NUMERIC_TYPES = ['number', 'integer']
+NUMERIC_BSON_TYPES = ['double', 'int', 'long', 'decimal']
+
+
+class RowAggregation:
+    """
+    Compiles a group-by on dataset rows to a Mongo aggregation pipeline. Group columns and metrics are checked
+    against the dataset column types ({column name: datatype}): sum and mean need numeric columns, min and max
+    ordered ones. Rows can be filtered first with RowQuery filter expressions.
+
+    metrics: {"function": "count|sum|mean|min|max|distinct", "column": "age"}, the column is optional for count.
+    A metric is returned as <function>_<column> (or count), group columns under their own name.
+    distinct is counted with two groups (group columns and value, then group columns) instead of collecting the
+    values of a group in one document, so it applies to one column per aggregation.
+
+    usage example:
+        aggregation = RowAggregation({"country": "string", "age": "integer"}, ["country"], [{"function": "mean", "column": "age"}])
+        collection.aggregate(aggregation.pipeline, allowDiskUse=True) => [{"country": "CM", "mean_age": 31.5}]
+    """
+
+    def __init__(
+        self, column_types: Dict[str, str], group_by: List[str], metrics: List[Dict[str, str]],
+        filters: List[str] = None, limit: int = 1000
+    ):
+        self._column_types = column_types
+        self._group_by = group_by
+        self._metrics = metrics
+        self._query = RowQuery(column_types, filters)
+        self._limit = limit
+        self.pipeline = self._compile()
+
+    @property
+    def columns(self) -> List[str]:
+        return self._group_by + [self._metric_name(metric) for metric in self._metrics]
+
+    def _compile(self) -> List[dict]:
+        for column in self._group_by:
+            if column not in self._column_types:
+                raise DatasetException(f"Group column {column} not found.")
+        if len(self._metrics) == 0:
+            raise DatasetException("At least one metric is required.")
+
+        distinct = {metric.get('column') for metric in self._metrics if metric.get('function') == 'distinct'}
+        if len(distinct) > 1:
+            raise DatasetException("distinct applies to one column per aggregation.")
+
+        pipeline = []
+        if self._query.is_filtered:
+            pipeline.append({'$match': self._query.filter})
+        if distinct:
+            pipeline.extend(self._compile_distinct_groups(distinct.pop()))
+        else:
+            group = {'_id': {column: f"${column}" for column in self._group_by} or None}
+            project = {'_id': 0}
+            for column in self._group_by:
+                project[column] = f"$_id.{column}"
+            for metric in self._metrics:
+                name = self._metric_name(metric)
+                group[name] = self._compile_metric(metric)
+                project[name] = 1
+            pipeline.append({'$group': group})
+            pipeline.append({'$project': project})
+        if self._group_by:
+            pipeline.append({'$sort': {column: 1 for column in self._group_by}})
+        pipeline.append({'$limit': self._limit})
+        return pipeline
+
+    def _compile_distinct_groups(self, distinct_column: str) -> List[dict]:
+        """
+        Rows are grouped by the group columns and the value of `distinct_column`, the other metrics are computed
+        per value and combined by the second group (on the group columns), which counts the values.
+        """
+        first = {'_id': {'group': {column: f"${column}" for column in self._group_by}, 'value': f"${distinct_column}"}}
+        second = {'_id': '$_id.group'}
+        project = {'_id': 0}
+        for column in self._group_by:
+            project[column] = f"$_id.{column}"
+        for metric in self._metrics:
+            name = self._metric_name(metric)
+            function = metric['function']
+            accumulator = self._compile_metric(metric)
+            project[name] = 1
+            if function == 'distinct':
+                # missing and null values aren't counted, like $addToSet.
+                second[name] = {'$sum': {'$cond': [{'$gt': ['$_id.value', None]}, 1, 0]}}
+            elif function == 'mean':
+                column = f"${metric['column']}"
+                first[f"{name}__sum"] = {'$sum': column}
+                first[f"{name}__count"] = {'$sum': {'$cond': [{'$in': [{'$type': column}, NUMERIC_BSON_TYPES]}, 1, 0]}}
+                second[f"{name}__sum"] = {'$sum': f"${name}__sum"}
+                second[f"{name}__count"] = {'$sum': f"${name}__count"}
+                project[name] = {'$cond': [
+                    {'$gt': [f"${name}__count", 0]}, {'$divide': [f"${name}__sum", f"${name}__count"]}, None
+                ]}
+            else:
+                # count and sum add up, min and max of the partial results.
+                first[name] = accumulator
+                operator = '$sum' if function in ['count', 'sum'] else f"${function}"
+                second[name] = {operator: f"${name}"}
+        return [{'$group': first}, {'$group': second}, {'$project': project}]
+
+    def _compile_metric(self, metric: Dict[str, str]) -> dict:
+        function = metric.get('function')
+        column = metric.get('column')
+        if function not in FUNCTIONS:
+            raise DatasetException(f"Metric function {function} not supported. Must be one of: {', '.join(FUNCTIONS)}.")
+        if function == 'count' and column is None:
+            return {'$sum': 1}
+        if column not in self._column_types:
+            raise DatasetException(f"Metric column {column} not found.")
+
+        datatype = self._column_types[column]
+        if function == 'count':
+            # rows where the column has a value.
+            return {'$sum': {'$cond': [{'$gt': [f"${column}", None]}, 1, 0]}}
+        if function in ['sum', 'mean'] and datatype not in NUMERIC_TYPES:
+            raise DatasetException(f"Metric {function} needs a numeric column, {column} is {datatype}.")
+        if function in ['min', 'max'] and datatype in UNORDERED_TYPES:
+            raise DatasetException(f"Metric {function} doesn't apply to {datatype} column {column}.")
+        if function == 'sum':
+            return {'$sum': f"${column}"}
+        if function == 'mean':
+            return {'$avg': f"${column}"}
+        if function == 'min':
+            return {'$min': f"${column}"}
+        if function == 'max':
+            return {'$max': f"${column}"}
+        return None  # distinct, counted by the second group of _compile_distinct_groups.
+
+    @staticmethod
+    def _metric_name(metric: Dict[str, str]) -> str:
+        if metric.get('column') is None:
+            return metric.get('function')
+        return f"{metric.get('function')}_{metric.get('column')}"
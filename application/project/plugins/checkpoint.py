@@ -0,0 +1,86 @@
+import datetime
+import time
+
+from bson import ObjectId
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+CHECKPOINTS_COLLECTION = "rims_load_checkpoints"
+
+
+class LoadCheckpoint:
+    """
+    Progress of the load of a dataset file into its collection, so a load interrupted by a crash continues where it
+    stopped instead of starting over in a new collection.
+
+    Rows get deterministic _ids: the 4 bytes epoch of the load (like an ObjectId timestamp) followed by the 8 bytes
+    row number, so writing a batch again is harmless and rows keep the file order. `rows` is the number of rows
+    from the start of the file that are known to be written. `file` identifies the upload, a load of another upload
+    drops the leftover.
+
+    usage example:
+        checkpoint = LoadCheckpoint(staggingdb, dataset.id, str(Path(dataset.file).with_suffix("")), "streaming")
+        collection = checkpoint.resume()
+        if collection is None:
+            collection = checkpoint.start(helpers.get_collection(name, staggingdb))
+        for row_number, row in enumerate(rows):
+            if row_number < checkpoint.rows: continue
+            row["_id"] = checkpoint.row_id(row_number)
+        checkpoint.commit(rows_written)
+        checkpoint.clear()
+    """
+
+    def __init__(self, mongodb: Database, dataset_id: int, file: str, mode: str):
+        self._mongodb = mongodb
+        self._checkpoints = mongodb[CHECKPOINTS_COLLECTION]
+        self._id = dataset_id
+        self._file = file
+        self._mode = mode
+        self.epoch = None
+        self.rows = 0
+        self.resumed = False
+
+    def resume(self) -> Collection:
+        """The collection of an interrupted load of the same file, or None. An unrelated leftover is dropped."""
+        state = self._checkpoints.find_one({'_id': self._id})
+        if state is None:
+            return None
+        if state.get('file') != self._file or state.get('mode') != self._mode:
+            self._mongodb[state['collection']].drop()
+            self.clear()
+            return None
+        self.epoch = state['epoch']
+        self.rows = state.get('rows', 0)
+        self.resumed = True
+        return self._mongodb[state['collection']]
+
+    @staticmethod
+    def interrupted_mode(mongodb: Database, dataset_id: int, file: str) -> str:
+        """The mode of an interrupted load of the same file, or None."""
+        state = mongodb[CHECKPOINTS_COLLECTION].find_one({'_id': dataset_id}, {'file': 1, 'mode': 1})
+        if state is None or state.get('file') != file:
+            return None
+        return state.get('mode')
+
+    def start(self, collection: Collection) -> Collection:
+        self.epoch = int(time.time())
+        self.rows = 0
+        self._checkpoints.replace_one({'_id': self._id}, {
+            'file': self._file, 'mode': self._mode, 'collection': collection.name, 'epoch': self.epoch,
+            'rows': 0, 'started_at': datetime.datetime.utcnow(), 'updated_at': datetime.datetime.utcnow()
+        }, upsert=True)
+        return collection
+
+    def row_id(self, row_number: int) -> ObjectId:
+        return ObjectId(self.epoch.to_bytes(4, 'big') + row_number.to_bytes(8, 'big'))
+
+    def commit(self, rows: int):
+        if rows <= self.rows:
+            return
+        self.rows = rows
+        self._checkpoints.update_one(
+            {'_id': self._id}, {'$max': {'rows': rows}, '$set': {'updated_at': datetime.datetime.utcnow()}}
+        )
+
+    def clear(self):
+        self._checkpoints.delete_one({'_id': self._id})
@@ -0,0 +1,111 @@
+import datetime
+import decimal
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+from bson.decimal128 import Decimal128
+
+from ..helpers import MAX_INTEGER, MIN_INTEGER
+
+# wide enough to shift any 34 digits significand to an integer, traps make sure nothing is ever rounded.
+_SIGNIFICAND_CONTEXT = decimal.Context(prec=34, Emax=6144, Emin=-6210, traps=[decimal.Inexact, decimal.Rounded])
+_EXPONENT_BIAS = 6176
+_LOW_MASK = (1 << 64) - 1
+_SIGN = 1 << 63
+
+
+class BSONCoercer:
+    """
+    Converts frictionless cell values to values that can be stored in MongoDB: Decimal -> Decimal128,
+    integers out of the int64 range -> Decimal128 and date -> datetime.
+
+    The work is done a column at a time. The schema ({column name: frictionless type}) tells which columns
+    can hold such values, every other column is left untouched and costs nothing.
+
+    usage example:
+        coercer = BSONCoercer({"name": "string", "amount": "number", "born": "date"})
+        coercer.coerce_rows([{"name": "Joe", "amount": Decimal("1.5"), "born": date(1990, 1, 1)}])
+        coercer.coerce_columns(["name", "amount", "born"], [["Joe"], [Decimal("1.5")], [date(1990, 1, 1)]])
+
+        coercer.modified_columns => {"column_name": "number"} for integer columns that received big integers.
+    """
+
+    def __init__(self, field_types: Dict[str, str]):
+        self.modified_columns = {}
+        self._converters = {}
+        for name, field_type in field_types.items():
+            converter = self._get_converter(name, field_type)
+            if converter is not None:
+                self._converters[name] = converter
+
+    def coerce_rows(self, rows: List[dict]) -> List[dict]:
+        """Coerces a batch of row dictionaries in place and returns it."""
+        for name, convert in self._converters.items():
+            for row in rows:
+                if name in row:
+                    row[name] = convert(row[name])
+        return rows
+
+    def coerce_columns(self, names: List[str], columns: List[list]) -> List[list]:
+        """Coerces a batch stored column by column (`columns[i]` holds the values of `names[i]`) in place."""
+        for name, column in zip(names, columns):
+            convert = self._converters.get(name)
+            if convert is not None:
+                column[:] = map(convert, column)
+        return columns
+
+    def _get_converter(self, name: str, field_type: str) -> Callable:
+        if field_type == 'number':
+            return _number_to_bson
+        if field_type == 'integer':
+            return self._integer_converter(name)
+        if field_type == 'date':
+            return _date_to_bson
+        if field_type in ['string', 'boolean', 'datetime', 'time', 'year', 'yearmonth', 'duration', 'geopoint', 'geojson', 'object', 'array']:
+            return None
+        return _any_to_bson
+
+    def _integer_converter(self, name: str) -> Callable:
+        modified_columns = self.modified_columns
+
+        def convert(value):
+            if value.__class__ is int and not MIN_INTEGER <= value <= MAX_INTEGER:
+                modified_columns[name] = "number"
+                return Decimal128(Decimal(value))
+            return value
+        return convert
+
+
+def decimal_to_decimal128(value: Decimal) -> Decimal128:
+    """
+    Same result as Decimal128(value), without the bit by bit loops of bson's pure python implementation. Values
+    needing rounding or clamping, NaN and Infinity are handed over to Decimal128.
+    """
+    sign, digits, exponent = value.as_tuple()
+    if exponent.__class__ is not int or len(digits) > 34 or not -_EXPONENT_BIAS <= exponent <= 6111:
+        return Decimal128(value)
+    significand = int(value.scaleb(-exponent, _SIGNIFICAND_CONTEXT))
+    high = (exponent + _EXPONENT_BIAS) << 49
+    if sign:
+        significand = -significand
+        high |= _SIGN
+    return Decimal128((high | (significand >> 64), significand & _LOW_MASK))
+
+
+def _number_to_bson(value):
+    cls = value.__class__
+    if cls is Decimal:
+        return decimal_to_decimal128(value)
+    if cls is int and not MIN_INTEGER <= value <= MAX_INTEGER:
+        return Decimal128(Decimal(value))
+    return value
+
+
+def _date_to_bson(value):
+    if value.__class__ is datetime.date:
+        return datetime.datetime(year=value.year, month=value.month, day=value.day)
+    return value
+
+
+def _any_to_bson(value):
+    return _date_to_bson(_number_to_bson(value))
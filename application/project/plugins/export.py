@@ -0,0 +1,197 @@
+import csv
+import datetime
+import json
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from openpyxl import Workbook
+from pymongo.collection import Collection
+
+from ...config import settings
+
+# maximum number of rows of a worksheet, including the header row.
+XLSX_MAX_ROWS = 1048576
+
+# arrow type of each DatasetColumn datatype, anything else is written as a string.
+ARROW_TYPES = {
+    'number': pa.float64(),
+    'integer': pa.int64(),
+    'boolean': pa.bool_(),
+    'date': pa.date32(),
+    'datetime': pa.timestamp('us'),
+}
+
+# export formats read from the columnar snapshot when there is one, see DatasetExporter.
+SNAPSHOT_FORMATS = ['parquet', 'feather']
+
+
+class DatasetExporter:
+    """
+    Writes the rows of a dataset collection to a file while reading them: only the selected columns are fetched
+    (projection in Mongo) and at most one cursor batch is held in memory, whatever the size of the dataset.
+    XLSX files are written with a write-only workbook, rows that don't fit in a worksheet go to the next one.
+    Parquet and Feather files are written a record batch at a time, typed from `field_types`
+    ({column name: DatasetColumn datatype}).
+
+    When `snapshot` (a parquet file of the whole dataset, see `write_snapshot`) is given, Parquet and Feather files
+    are read from it instead of the collection. CSV and XLSX files always come from the collection: the snapshot
+    holds the arrow typed values (numbers as float64, mismatching cells as nulls), not the stored ones.
+
+    usage example:
+        exporter = DatasetExporter(mongodb[dataset.prod_tablename], ["name", "age"], {"name": "string", "age": "integer"})
+        exporter.export(Path("/tmp/survey.csv"), "csv") => number of rows written
+    """
+
+    def __init__(
+        self, collection: Collection, columns: List[str], field_types: Dict[str, str] = None,
+        batch_size: int = None, snapshot: Path = None
+    ):
+        self._collection = collection
+        self._columns = columns
+        self._field_types = field_types or {}
+        self._batch_size = batch_size or settings.DATASET_EXPORT_BATCH_SIZE
+        self._snapshot = snapshot
+
+    @property
+    def header(self) -> List[str]:
+        return ['_id'] + self._columns
+
+    @property
+    def arrow_schema(self) -> pa.Schema:
+        return pa.schema(
+            [pa.field('_id', pa.string())] +
+            [pa.field(column, ARROW_TYPES.get(self._field_types.get(column), pa.string())) for column in self._columns]
+        )
+
+    def export(self, path: Path, format: str) -> int:
+        if format == 'csv':
+            return self.to_csv(path)
+        if format == 'xlsx':
+            return self.to_xlsx(path)
+        if format == 'parquet':
+            return self.to_parquet(path)
+        if format == 'feather':
+            return self.to_feather(path)
+        raise ValueError(f"Export format {format} not supported.")
+
+    def to_csv(self, path: Path) -> int:
+        written = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.header)
+            for batch in self.iter_batches():
+                writer.writerows(batch)
+                written += len(batch)
+        return written
+
+    def to_xlsx(self, path: Path) -> int:
+        workbook = Workbook(write_only=True)
+        sheet = None
+        sheet_rows = XLSX_MAX_ROWS
+        written = 0
+        for batch in self.iter_batches():
+            for row in batch:
+                if sheet_rows == XLSX_MAX_ROWS:
+                    sheet = workbook.create_sheet('data' if sheet is None else f'data_{len(workbook.worksheets) + 1}')
+                    sheet.append(self.header)
+                    sheet_rows = 1
+                sheet.append(row)
+                sheet_rows += 1
+            written += len(batch)
+        if sheet is None:
+            workbook.create_sheet('data').append(self.header)
+        workbook.save(path)
+        return written
+
+    def to_parquet(self, path: Path) -> int:
+        written = 0
+        with pq.ParquetWriter(str(path), self.arrow_schema) as writer:
+            for batch in self.iter_record_batches():
+                writer.write_table(pa.Table.from_batches([batch]))
+                written += batch.num_rows
+        return written
+
+    def to_feather(self, path: Path) -> int:
+        """Feather v2, i.e. the Arrow IPC file format."""
+        written = 0
+        with pa.ipc.new_file(str(path), self.arrow_schema) as writer:
+            for batch in self.iter_record_batches():
+                writer.write_batch(batch)
+                written += batch.num_rows
+        return written
+
+    def iter_batches(self) -> Iterator[List[list]]:
+        """Yields the rows (lists of cells following `header`) a cursor batch at a time, read from the collection."""
+        projection = {column: 1 for column in self._columns}
+        cursor = self._collection.find({}, projection, batch_size=self._batch_size)
+        columns = self._columns
+        batch = []
+        for document in cursor:
+            batch.append([str(document['_id'])] + [_to_cell(document.get(column)) for column in columns])
+            if len(batch) == self._batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def iter_record_batches(self) -> Iterator[pa.RecordBatch]:
+        """Same as iter_batches, as arrow record batches following `arrow_schema`, read from the snapshot if any."""
+        if self._snapshot is not None:
+            yield from self._iter_snapshot_batches()
+            return
+
+        schema = self.arrow_schema
+        for batch in self.iter_batches():
+            columns = list(zip(*batch))
+            arrays = [_to_arrow_array(values, field.type) for values, field in zip(columns, schema)]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def _iter_snapshot_batches(self) -> Iterator[pa.RecordBatch]:
+        snapshot = pq.ParquetFile(str(self._snapshot))
+        yield from snapshot.iter_batches(batch_size=self._batch_size, columns=self.header)
+
+
+def write_snapshot(collection: Collection, field_types: Dict[str, str], path: Path) -> int:
+    """Writes the whole collection to a parquet file, read back by DatasetExporter(snapshot=path)."""
+    exporter = DatasetExporter(collection, list(field_types.keys()), field_types)
+    return exporter.to_parquet(path)
+
+
+def _to_cell(value):
+    cls = value.__class__
+    if cls is Decimal128:
+        return value.to_decimal()
+    if cls in (str, int, float, bool, Decimal, datetime.datetime, datetime.date, datetime.time) or value is None:
+        return value
+    if cls is ObjectId:
+        return str(value)
+    if cls in (list, dict):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _to_arrow_array(values, arrow_type: pa.DataType) -> pa.Array:
+    if arrow_type == pa.date32():
+        values = [v.date() if isinstance(v, datetime.datetime) else v for v in values]
+    elif arrow_type == pa.float64():
+        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+    elif arrow_type == pa.string():
+        values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # values that don't match the column type (manual entries) are written as nulls.
+        return pa.array([_to_arrow_value(v, arrow_type) for v in values], type=arrow_type)
+
+
+def _to_arrow_value(value, arrow_type: pa.DataType):
+    try:
+        pa.array([value], type=arrow_type)
+        return value
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return None
@@ -0,0 +1,114 @@
+import datetime
+import hashlib
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.session import Session
+
+from ..models import Dataset, DatasetExport, DownloadRequest
+from ...config import settings
+
+
+class ExportCache:
+    """
+    Export files of datasets, keyed by dataset id, data version, selected columns and format. A version is only
+    reachable while the dataset's data_version is unchanged; `invalidate` bumps the version and removes the files of
+    the dataset. Files are evicted least recently used first once their total size exceeds the disk budget
+    (config `[dataset] export_cache_max_mb`, 0 disables the cache). The download requests linking to a removed file
+    are marked expired and lose their link.
+
+    usage example:
+        cache = ExportCache(db)
+        export = cache.lookup(dataset, ["name", "age"], "csv") => DatasetExport or None
+        cache.store(dataset_id, version, ["name", "age"], "csv", storage_path, download_link)
+    """
+
+    def __init__(self, db: Session, max_bytes: int = None):
+        self._db = db
+        self._max_bytes = settings.DATASET_EXPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_bytes > 0
+
+    @staticmethod
+    def columns_key(columns: List[str]) -> str:
+        return hashlib.sha256("\x1f".join(columns).encode('utf-8')).hexdigest()
+
+    def lookup(self, dataset: Dataset, columns: List[str], format: str) -> Optional[DatasetExport]:
+        if not self.enabled:
+            return None
+        export = self._db.query(DatasetExport).filter(
+            DatasetExport.dataset_id == dataset.id,
+            DatasetExport.data_version == (dataset.data_version or 0),
+            DatasetExport.columns_key == self.columns_key(columns),
+            DatasetExport.format == format
+        ).first()
+        if export is None:
+            return None
+        if not Path(settings.BASE_DIR, export.path).exists():
+            self._db.delete(export)
+            self._db.flush()
+            return None
+        export.last_used_at = datetime.datetime.utcnow()
+        self._db.add(export)
+        self._db.flush()
+        return export
+
+    def store(self, dataset_id: int, data_version: int, columns: List[str], format: str, path: Path, file: str) -> bool:
+        """
+        `path` is relative to BASE_DIR. Returns False when the cache is disabled, the file is larger than the whole
+        budget or the key is already stored.
+        """
+        if not self.enabled:
+            return False
+        size = Path(settings.BASE_DIR, path).stat().st_size
+        if size > self._max_bytes:
+            # it would be evicted (and its request expired) right away.
+            return False
+        export = DatasetExport(
+            dataset_id=dataset_id, data_version=data_version or 0, columns_key=self.columns_key(columns),
+            format=format, path=str(path), file=file, size=size, last_used_at=datetime.datetime.utcnow()
+        )
+        try:
+            self._db.add(export)
+            self._db.flush()
+        except IntegrityError:
+            # exported concurrently by another job, keep the first one.
+            self._db.rollback()
+            return False
+        self.evict()
+        return True
+
+    def invalidate(self, dataset: Dataset):
+        """Called whenever the data of the dataset changes."""
+        dataset.data_version = func.coalesce(Dataset.data_version, 0) + 1
+        self._db.add(dataset)
+        self._db.flush()
+        exports = self._db.query(DatasetExport).filter(DatasetExport.dataset_id == dataset.id).all()
+        self._remove(exports)
+
+    def evict(self):
+        total = self._db.query(func.coalesce(func.sum(DatasetExport.size), 0)).scalar()
+        if total <= self._max_bytes:
+            return
+        victims = []
+        for export in self._db.query(DatasetExport).order_by(DatasetExport.last_used_at.asc()).yield_per(100):
+            victims.append(export)
+            total -= export.size or 0
+            if total <= self._max_bytes:
+                break
+        self._remove(victims)
+
+    def _remove(self, exports: List[DatasetExport]):
+        if not exports:
+            return
+        self._db.query(DownloadRequest).filter(DownloadRequest.file.in_([export.file for export in exports])).update(
+            {DownloadRequest.expired: True, DownloadRequest.file: None}, synchronize_session='fetch'
+        )
+        for export in exports:
+            Path(settings.BASE_DIR, export.path).unlink(missing_ok=True)
+            self._db.delete(export)
+        self._db.flush()
@@ -1,17 +1,24 @@
 import datetime 
-from decimal import Decimal
 
-from bson.decimal128 import  Decimal128 
-from frictionless import describe_resource, Resource, Layout
+from frictionless import describe_resource, Resource, Layout, Schema, Field
 from pathlib import Path
 import pandas as pd 
+from pymongo.errors import PyMongoError
 
+from ..plugins.checkpoint import LoadCheckpoint 
+from ..plugins.coercion import BSONCoercer 
 from ..plugins.detector import Detector 
+from ..plugins.exportcache import ExportCache 
+from ..plugins.export import write_snapshot 
+from ..plugins.loader import ParallelLoader 
+from ..plugins.profile import DatasetProfiler 
 from ..helpers import ColumnFormatter 
 from ..models import Dataset 
 from ..exception import DatasetException
 from ...config import settings 
-from ...utils.db_connection import get_db, get_staggingdb
+from ...factory import gm_client 
+from ...utils import printer 
+from ...utils.db_connection import get_db, get_mongodb, get_staggingdb
 from application.project import helpers
 
 """
@@ -19,8 +26,15 @@ File Data Warehousing (FDW)
 
 This is a set of processes for extracting file data to the stagging database. The data can be extracted
 from csv, xls, xlsx, tdf, ods files. We leverage on the power of frictionless and pandas/numpy to realize it.
+
+Two modes are available (config `[dataset] ingestion_mode`):
+    streaming:  the schema is inferred from one bounded sample, then header renaming, date coercion, type casting
+                and loading are done in a single pass over the rows. Falls back to multipass when the file
+                fails, a database failure fails the job (its retry continues the load from the checkpoint).
+    multipass:  the original process, converting, cleaning and rewriting the file before loading it.
 """
 
+
 class FileDataWarehousing:
 
     def __init__(self, dataset_id:int) -> None:
@@ -28,6 +42,9 @@ class FileDataWarehousing:
         self._filepath = None 
         self._resource_file = None
         self._formatter = ColumnFormatter()
+        self._collection = None
+        self._checkpoint = None
+        self._profiler = None
         self._field_missing_values = helpers.DEFAULT_FIELD_MISSING_VALUES
         self._populate_initials()
 
@@ -36,6 +53,9 @@ class FileDataWarehousing:
         dataset = Dataset.get_dataset_by_id(db, self._dataset_id)
         if dataset is None: 
             raise DatasetException(msg=f"Dataset with Id {self._dataset_id} not found.")
+        # the upload the checkpoint belongs to: multipass converts spreadsheets to a csv of the same name, so the
+        # path is taken without its extension to resume the load of the converted file as well.
+        self._file = str(Path(dataset.file).with_suffix(''))
         self._filepath = f"{settings.BASE_DIR}/{dataset.file}"
 
         filename = Path(self._filepath).stem 
@@ -49,29 +69,151 @@ class FileDataWarehousing:
         db.flush()
 
     def run_data_extraction_processes(self):
+        streaming = settings.DATASET_INGESTION_MODE == 'streaming'
+        if streaming and LoadCheckpoint.interrupted_mode(get_staggingdb(), self._dataset_id, self._file) == 'multipass':
+            # an earlier attempt fell back to multipass and was interrupted, its load continues.
+            streaming = False
+        if streaming:
+            try:
+                return self.run_streaming_extraction_process()
+            except PyMongoError:
+                # the database failed, not the file: the next attempt of the job continues the load from its checkpoint.
+                raise
+            except Exception as e:
+                # the partial collection and its checkpoint are kept, multipass drops them when it starts its own
+                # load (the mode differs), a retry failing before that still continues the streaming load.
+                printer.rprint(
+                    f"Streaming extraction failed for dataset id: {self._dataset_id} ({e}). Falling back to multipass.",
+                    "project.plugins.fdw.run_data_extraction_processes", success=False
+                )
+                self._collection = None
+                self._checkpoint = None
+                self._profiler = None
+                # the headers were added by the sample, multipass names them again.
+                self._formatter = ColumnFormatter()
+        return self.run_multipass_extraction_process()
+
+    def run_multipass_extraction_process(self):
         start_time = datetime.datetime.utcnow()
         self._convert_file_to_csv()
         self._clean_imported_file()
 
         columns = self._rename_file_headers()
-        db = get_db()
-        dataset = Dataset.get_dataset_by_id(db, self._dataset_id)
         self._validate_data()
 
         rows_inserted, collection_name = self._load_data_to_data_warehouse()
         self._save_columns_to_dataset_columns(columns)
+        self._mark_dataset_as_extracted(rows_inserted, collection_name, start_time)
+
+    def run_streaming_extraction_process(self):
+        """
+        Reads the file once. The schema is detected on the first `ingestion_sample_size` rows, string fields that
+        parse as dates in that sample are converted batch by batch while the rows are being loaded.
+        """
+        start_time = datetime.datetime.utcnow()
+        detector = Detector(
+            field_missing_values=self._field_missing_values,
+            sample_size=settings.DATASET_INGESTION_SAMPLE_SIZE
+        )
+        resource = Resource(self._filepath, detector=detector)
+        with resource:
+            columns = self._get_sample_columns(resource)
+            date_fields = self._detect_sample_date_fields(resource, columns)
+            for col in columns:
+                if col['name'] in date_fields:
+                    col['type'] = 'datetime'
+            self._collection = self._open_checkpoint('streaming', resource.name)
+            rows_inserted, modified_columns = self._load_row_stream_to_data_warehouse(
+                resource.row_stream, columns, date_fields
+            )
+
+        for col in columns:
+            col['type'] = modified_columns.get(col['name'], col['type'])
+        self._write_resource_file(resource, columns)
+        self._save_columns_to_dataset_columns(columns)
+        self._mark_dataset_as_extracted(rows_inserted, self._collection.name, start_time)
+
+    def _open_checkpoint(self, mode:str, proposed_name:str):
+        """
+        The collection of an interrupted load of the same file when there is one (the load continues after its last
+        written row), a new one otherwise.
+        """
+        staggingdb = get_staggingdb()
+        self._checkpoint = LoadCheckpoint(staggingdb, self._dataset_id, self._file, mode)
+        collection = self._checkpoint.resume()
+        if collection is not None:
+            printer.rprint(
+                f"Resuming the load of dataset id: {self._dataset_id} after row {self._checkpoint.rows}.",
+                "project.plugins.fdw._open_checkpoint"
+            )
+            return collection
+        return self._checkpoint.start(helpers.get_collection(proposed_name=proposed_name, mongodb=staggingdb))
+
+    def _loaded_row_count(self, collection, inserted:int) -> int:
+        # a resumed load only inserted the rows after the checkpoint.
+        if self._checkpoint.resumed:
+            return collection.count_documents({})
+        return inserted
 
+    def _mark_dataset_as_extracted(self, rows_inserted:int, collection_name:str, start_time:datetime.datetime):
+        db = get_db()
+        dataset = Dataset.get_dataset_by_id(db, self._dataset_id)
         duration = datetime.datetime.utcnow() - start_time
         dataset.stagging_tablename = collection_name
         dataset.prod_tablename = collection_name
         dataset.extraction_duration = duration.total_seconds()
         dataset.status = Dataset.progress.EXTRACTED
+        dataset.error = None
         dataset.stagging_recordcount = rows_inserted
+        dataset.prod_recordcount = rows_inserted
         dataset.locked = False
         db.add(dataset)
         db.flush()
-        print(f"The process took: {datetime.datetime.utcnow() - start_time}")
-    
+        if self._checkpoint is not None:
+            self._checkpoint.clear()
+        ExportCache(db).invalidate(dataset)
+        print(f"The process took: {duration}")
+        self._save_column_profiles()
+        self._write_columnar_snapshot()
+        if len(dataset.indexes) > 0:
+            # declared indexes belong to the previous collection.
+            gm_client.submit_job('dataset.index.build', {'dataset_id': dataset.id, 'rebuild': True}, background=True, wait_until_complete=False)
+
+    def _save_column_profiles(self):
+        if self._profiler is None:
+            return
+        try:
+            self._profiler.save(get_mongodb())
+        except Exception as e:
+            printer.rprint(
+                f"Saving column profiles failed for dataset id: {self._dataset_id} ({e}).",
+                "project.plugins.fdw._save_column_profiles", success=False
+            )
+
+    def _write_columnar_snapshot(self):
+        """
+        Keeps a parquet copy of the loaded data beside the ingested file. Exports read it instead of the collection
+        as long as the dataset data_version doesn't change. A failure here never fails the ingestion.
+        """
+        db = get_db()
+        dataset = Dataset.get_dataset_by_id(db, self._dataset_id)
+        snapshot_path = Path(Path(dataset.file).parent, f"{Path(dataset.file).stem}.parquet")
+        try:
+            write_snapshot(
+                get_staggingdb()[dataset.prod_tablename], dataset.get_column_name_dict(),
+                Path(settings.BASE_DIR, snapshot_path)
+            )
+        except Exception as e:
+            printer.rprint(
+                f"Columnar snapshot failed for dataset id: {self._dataset_id} ({e}).",
+                "project.plugins.fdw._write_columnar_snapshot", success=False
+            )
+            return
+        dataset.snapshot_file = str(snapshot_path)
+        dataset.snapshot_version = dataset.data_version
+        db.add(dataset)
+        db.flush()
+
     def _convert_file_to_csv(self) -> None:
         if Path(self._filepath).suffix == '.csv':
             return 
@@ -172,48 +314,127 @@ class FileDataWarehousing:
 
     def _load_data_to_data_warehouse(self):
         resource = Resource(self._resource_file)
-        db = get_staggingdb()
         data_list = []
         row_count = 0
-        collection = helpers.get_collection(proposed_name=resource.name, mongodb=db)
-        modified_columns = {}
-        max_int = helpers.MAX_INTEGER
+        collection = self._collection = self._open_checkpoint('multipass', resource.name)
+        checkpoint = self._checkpoint
+        coercer = BSONCoercer({field.name: field.type for field in resource.schema.fields})
+        profiler = DatasetProfiler(self._dataset_id, {field.name: field.type for field in resource.schema.fields})
+        batch_size = settings.DATASET_LOADER_BATCH_SIZE
 
-        with resource:
+        with resource, ParallelLoader(collection, committed=checkpoint.rows, on_commit=checkpoint.commit) as loader:
             row_stream = resource.row_stream
-            i = 0 
             for row in row_stream:
                 row_count += 1
-                for key, val in row.items():
-                    if type(val) == Decimal:
-                        row[key] = Decimal128(val)
-                    if type(val) == int and val > max_int:
-                        val = Decimal128(Decimal(val))
-                        row[key] = val
-                        if not key in modified_columns.keys():
-                            modified_columns[key] = "number"
-                    
-                    if type(val) == datetime.date:
-                        val = datetime.datetime(year=val.year, month=val.month, day=val.day, hour=0, minute=0, second=0)
-                        row[key] = val 
-
-                row = dict(row)
-                data_list.append(row)
-                if i >= 1000: 
-                    collection.insert_many(data_list)
-                    i = 0 
+                data_list.append(dict(row))
+                if len(data_list) >= batch_size: 
+                    profiler.update_rows(data_list)
+                    self._submit_batch(loader, row_count - len(data_list), coercer.coerce_rows(data_list))
                     data_list = []
-                i += 1
             if len(data_list) > 0: # insert the remaining records if any.
-                collection.insert_many(data_list)
+                profiler.update_rows(data_list)
+                self._submit_batch(loader, row_count - len(data_list), coercer.coerce_rows(data_list))
+            self._profiler = profiler
 
             # if some column types were modified in the process, modify the resource file with changes.
+            modified_columns = coercer.modified_columns
             if len(modified_columns) > 0:
                 for key, val in modified_columns.items():
                     resource.schema.get_field(key).type = val
                 resource.to_json(self._resource_file)
         return row_count, collection.name 
 
+    def _get_sample_columns(self, resource: Resource) -> list:
+        columns = []
+        for label, field in zip(resource.header, resource.schema.fields):
+            label, formatted_name = self._formatter.add_column(label)
+            columns.append({"name": formatted_name, "label": label, "type": field.type})
+        return columns
+
+    def _detect_sample_date_fields(self, resource: Resource, columns: list) -> list:
+        """
+        Same rule as `_clean_imported_file`, applied on the sample only: a `string` field is a date field when
+        all its sampled values can be converted by pd.to_datetime.
+        """
+        date_fields = []
+        for position, col in enumerate(columns):
+            if col['type'] != 'string':
+                continue
+            values = []
+            for cells in resource.fragment:
+                value = cells[position] if len(cells) > position else None
+                values.append(None if value in self._field_missing_values else value)
+            if all(value is None for value in values):
+                continue
+            values = pd.Series(values, dtype=object)
+            dates = pd.to_datetime(values, dayfirst=True, errors='coerce')
+            if dates[values.notnull()].notnull().all():
+                date_fields.append(col['name'])
+        return date_fields
+
+    def _load_row_stream_to_data_warehouse(self, row_stream, columns:list, date_fields:list):
+        names = [col['name'] for col in columns]
+        date_positions = [names.index(name) for name in date_fields]
+        coercer = BSONCoercer({col['name']: col['type'] for col in columns})
+        self._profiler = DatasetProfiler(self._dataset_id, {col['name']: col['type'] for col in columns})
+        batch_size = settings.DATASET_LOADER_BATCH_SIZE
+        checkpoint = self._checkpoint
+        batch = []
+        batch_start = 0
+        with ParallelLoader(self._collection, committed=checkpoint.rows, on_commit=checkpoint.commit) as loader:
+            for row in row_stream:
+                cells = row.to_list()
+                if all(cell is None for cell in cells): # skip blank rows
+                    continue
+                batch.append(cells)
+                if len(batch) >= batch_size:
+                    self._submit_batch(loader, batch_start, self._prepare_batch(batch, names, date_positions, coercer))
+                    batch_start += len(batch)
+                    batch = []
+            if len(batch) > 0: # insert the remaining records if any.
+                self._submit_batch(loader, batch_start, self._prepare_batch(batch, names, date_positions, coercer))
+        return self._loaded_row_count(self._collection, loader.inserted), coercer.modified_columns
+
+    def _prepare_batch(self, batch:list, names:list, date_positions:list, coercer:BSONCoercer) -> list:
+        columns = [list(column) for column in zip(*batch)]
+        for position in date_positions:
+            values = pd.to_datetime(columns[position], dayfirst=True, errors='coerce', infer_datetime_format=True)
+            for cell, value in zip(columns[position], values):
+                if cell is not None and pd.isnull(value):
+                    # the sample said date, a value after it isn't one: multipass keeps such columns as strings.
+                    raise DatasetException(f"Value {cell} of column {names[position]} is not a date.")
+            columns[position] = [None if pd.isnull(value) else value.to_pydatetime() for value in values]
+        if self._profiler is not None:
+            self._profiler.update_columns(names, columns)
+        coercer.coerce_columns(names, columns)
+        return [dict(zip(names, cells)) for cells in zip(*columns)]
+
+    def _submit_batch(self, loader:ParallelLoader, start:int, documents:list):
+        """
+        Rows get their checkpoint _id. The rows before the checkpoint are already in the collection, they are still
+        read (and profiled, coerced) so the profiles and column types cover the whole file, but not written again.
+        """
+        for row_number, document in enumerate(documents, start):
+            document['_id'] = self._checkpoint.row_id(row_number)
+        skip = self._checkpoint.rows - start
+        if skip >= len(documents):
+            return
+        skip = max(skip, 0)
+        loader.submit(documents[skip:], start + skip)
+
+    def _write_resource_file(self, resource: Resource, columns: list):
+        schema = Schema()
+        schema.missing_values = self._field_missing_values
+        for col in columns:
+            field = Field(name=col['name'], type=col['type'])
+            if col['type'] == 'datetime':
+                field.format = 'any'
+            schema.add_field(field)
+        resource.schema = schema
+        resource.path = Path(resource.path).name
+        resource['_scheme'] = 'file'
+        resource.to_json(self._resource_file)
+
     def _save_columns_to_dataset_columns(self, columns):
         from ..dataset import controller 
         controller.write.save_dataset_columns(self._dataset_id, columns)
@@ -0,0 +1,124 @@
+import datetime
+from typing import List
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.database import Database
+from pymongo.errors import OperationFailure, PyMongoError
+from pymongo.write_concern import WriteConcern
+from sqlalchemy.orm.session import Session
+
+from ..models import Dataset, DatasetIndex
+
+QUERY_STATS_COLLECTION = "rims_query_stats"
+
+
+class IndexManager:
+    """
+    Builds and drops the secondary indexes declared on a dataset (DatasetIndex rows) and keeps their status.
+    Runs on the gearman worker: builds are slow on large collections. An index is built on (column, _id), the sort
+    of RowQuery, so sorting on the column reads the index in order instead of sorting the rows in memory.
+
+    usage example:
+        manager = IndexManager(db, get_mongodb())
+        manager.build(dataset) => number of indexes ready
+    """
+
+    def __init__(self, db: Session, mongodb: Database):
+        self._db = db
+        self._mongodb = mongodb
+
+    def build(self, dataset: Dataset, rebuild: bool = False) -> int:
+        """
+        Builds the pending and failed indexes, every index when `rebuild` (e.g. on a new collection). Ready indexes
+        missing from the collection or built on other keys (single column, before the _id sort key) are built again.
+        """
+        collection = self._mongodb[dataset.prod_tablename]
+        existing = collection.index_information()
+        ready = 0
+        for index in dataset.indexes:
+            keys = index_keys(index.column)
+            current = existing.get(index.name)
+            built = current is not None and [tuple(key) for key in current['key']] == keys
+            if index.status == DatasetIndex.progress.READY and built and not rebuild:
+                ready += 1
+                continue
+            self._set_status(index, DatasetIndex.progress.BUILDING)
+            try:
+                if current is not None and not built:
+                    collection.drop_index(index.name)
+                collection.create_index(keys, name=index.name, background=True)
+            except PyMongoError as e:
+                self._set_status(index, DatasetIndex.progress.FAILED, str(e)[:1000])
+                continue
+            self._set_status(index, DatasetIndex.progress.READY)
+            ready += 1
+        return ready
+
+    def drop(self, dataset: Dataset, index: DatasetIndex):
+        if dataset.prod_tablename:
+            try:
+                self._mongodb[dataset.prod_tablename].drop_index(index.name)
+            except OperationFailure:
+                # never built or already dropped.
+                pass
+        self._db.delete(index)
+        self._db.flush()
+
+    def _set_status(self, index: DatasetIndex, status: str, error: str = None):
+        index.status = status
+        index.error = error
+        self._db.add(index)
+        self._db.flush()
+
+
+def index_keys(column: str) -> List[tuple]:
+    return [(column, ASCENDING), ('_id', ASCENDING)]
+
+
+class QueryStats:
+    """
+    Counts the columns used by row filters and sorts, per dataset, to suggest indexes (RowQuery.columns, contains
+    filters are left out: they can't use an index). Counts are sent without waiting for an acknowledgement, reads
+    never wait on them.
+
+    usage example:
+        stats = QueryStats(get_mongodb())
+        stats.record(dataset.id, ["age", "country"])
+        stats.suggest(dataset) => [{"column": "age", "queries": 120, "last_seen": datetime}]
+    """
+
+    def __init__(self, mongodb: Database):
+        self._collection = mongodb.get_collection(QUERY_STATS_COLLECTION, write_concern=WriteConcern(w=0))
+
+    def record(self, dataset_id: int, columns: List[str]):
+        for update in self._updates(dataset_id, columns):
+            self._collection.update_one(*update, upsert=True)
+
+    async def record_async(self, dataset_id: int, columns: List[str]):
+        """`record` when built on a motor database."""
+        for update in self._updates(dataset_id, columns):
+            await self._collection.update_one(*update, upsert=True)
+
+    @staticmethod
+    def _updates(dataset_id: int, columns: List[str]) -> List[tuple]:
+        now = datetime.datetime.utcnow()
+        return [
+            ({'dataset_id': dataset_id, 'column': column}, {'$inc': {'queries': 1}, '$set': {'last_seen': now}})
+            for column in set(columns)
+        ]
+
+    def suggest(self, dataset: Dataset, min_queries: int = 10, limit: int = 5) -> List[dict]:
+        """Most queried columns without a declared index."""
+        indexed = [index.column for index in dataset.indexes]
+        columns = dataset.get_column_name_list()
+        stats = self._collection.find(
+            {'dataset_id': dataset.id, 'queries': {'$gte': min_queries}}, {'_id': 0, 'dataset_id': 0}
+        ).sort('queries', DESCENDING)
+        suggestions = []
+        for stat in stats:
+            if stat['column'] in indexed or stat['column'] not in columns:
+                continue
+            suggestions.append(stat)
+            if len(suggestions) == limit:
+                break
+        return suggestions
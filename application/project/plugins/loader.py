@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+from ...config import settings
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class ParallelLoader:
+    """
+    Writes batches of documents to a collection concurrently through a bounded thread pool, using unordered
+    bulk inserts. At most `max_pending` batches are held in memory (queued or being written); `submit` blocks
+    until a slot is free, so the producer can never run ahead of the database.
+
+    When batches are submitted with the position of their first row (`start`), `committed` is the position up to
+    which every row is written (starting from the initial `committed`), `on_commit(committed)` is called when it moves.
+    Documents already present (duplicate _id) are skipped, so batches with fixed _ids can be written again.
+
+    usage example:
+        with ParallelLoader(collection) as loader:
+            for batch in batches:
+                loader.submit(batch)
+        loader.inserted => number of documents written.
+    """
+
+    def __init__(
+        self, collection: Collection, workers: int = None, max_pending: int = None, committed: int = 0,
+        on_commit: Callable[[int], None] = None
+    ):
+        self._collection = collection
+        self._workers = workers or settings.DATASET_LOADER_WORKERS
+        self._max_pending = max_pending or self._workers * 2
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="fdw-loader")
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+        self._lock = threading.Lock()
+        self._error = None
+        self._done_ranges = {}
+        self._on_commit = on_commit
+        self.committed = committed
+        self.inserted = 0
+
+    def submit(self, documents: list, start: int = None) -> None:
+        self._raise_on_error()
+        if len(documents) == 0:
+            return
+        self._slots.acquire()
+        future = self._executor.submit(self._write, documents)
+        future.add_done_callback(lambda future: self._on_done(future, start, len(documents)))
+
+    def close(self) -> int:
+        """Waits for every pending batch to be written and returns the number of inserted documents."""
+        self._executor.shutdown(wait=True)
+        self._raise_on_error()
+        return self.inserted
+
+    def _write(self, documents: list) -> int:
+        try:
+            result = self._collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get('code') != DUPLICATE_KEY_ERROR for error in e.details.get('writeErrors', [])):
+                raise
+            return e.details.get('nInserted', 0)
+        return len(result.inserted_ids)
+
+    def _on_done(self, future, start: int = None, rows: int = 0) -> None:
+        committed = None
+        with self._lock:
+            if future.exception() is not None:
+                if self._error is None:
+                    self._error = future.exception()
+            else:
+                self.inserted += future.result()
+                if start is not None:
+                    self._done_ranges[start] = start + rows
+                    while self.committed in self._done_ranges:
+                        self.committed = self._done_ranges.pop(self.committed)
+                    committed = self.committed
+        self._slots.release()
+        if committed is not None and self._on_commit is not None:
+            self._on_commit(committed)
+
+    def _raise_on_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._executor.shutdown(wait=True)
+            return False
+        self.close()
+        return False
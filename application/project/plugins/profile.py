@@ -0,0 +1,430 @@
+import asyncio
+import datetime
+import heapq
+import math
+import random
+from collections import Counter
+from decimal import Decimal
+from operator import itemgetter
+from typing import Dict, List
+
+import numpy as np
+from pandas.util import hash_array
+from bson.binary import Binary
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from pymongo import ReplaceOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from ..helpers import MAX_INTEGER, MIN_INTEGER
+
+PROFILES_COLLECTION = "rims_column_profiles"
+NUMERIC_TYPES = ['number', 'integer']
+ORDERED_TYPES = NUMERIC_TYPES + ['string', 'date', 'datetime', 'time', 'year', 'yearmonth']
+
+HLL_PRECISION = 12
+TOP_K = 10
+TOP_K_CAPACITY = 100
+# top values are counted on their first characters, long texts don't grow the stored profile.
+TOP_VALUE_MAX_LENGTH = 200
+RESERVOIR_SIZE = 2000
+HISTOGRAM_BINS = 10
+MAX_SAVE_ATTEMPTS = 5
+
+
+class HyperLogLog:
+    """Distinct count estimate in 2^precision one byte registers, about 1.6% standard error at precision 12."""
+
+    def __init__(self, registers: bytes = None, precision: int = HLL_PRECISION):
+        self._precision = precision
+        self._size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self._size)
+
+    def add(self, value):
+        self.update([str(value)])
+
+    def update(self, values):
+        """
+        Adds the strings, a string added twice counts once: callers pass the distinct values of a batch. They're
+        hashed together (pandas' siphash with a fixed key, the registers can be updated by any process).
+        """
+        values = np.array(list(values), dtype=object)
+        if len(values) == 0:
+            return
+        shift = np.uint64(64 - self._precision)
+        digests = hash_array(values, categorize=False)
+        indexes = (digests >> shift).astype(np.intp)
+        # rank: position of the first 1 bit after the index bits, from the exponent of the remaining bits.
+        _, exponents = np.frexp((digests & np.uint64((1 << int(shift)) - 1)).astype(np.float64))
+        ranks = (int(shift) + 1 - exponents).astype(np.uint8)
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        np.maximum.at(registers, indexes, ranks)
+
+    def estimate(self) -> int:
+        size = self._size
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw = alpha * size * size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * size and zeros > 0:
+            return round(size * math.log(size / zeros))
+        return round(raw)
+
+
+class ColumnProfile:
+    """
+    Streaming summary of one column: rows, nulls, distinct estimate, min/max, mean/stddev for numerics, top values
+    and a reservoir sample the histogram is computed from. The state is a plain dictionary so it can be stored in
+    Mongo and updated later.
+
+    Values are summarized a batch at a time: the distinct values of the batch are counted (Counter) and hashed once,
+    the top values keep the TOP_K_CAPACITY largest counts of the stored ones plus the batch's (lower bounds for
+    values that were dropped once), mean/stddev combine the batch's (Chan et al.) and the sample only visits the
+    values that enter it (Li's algorithm L).
+    """
+
+    def __init__(self, name: str, datatype: str, state: dict = None, version: int = 0):
+        self.name = name
+        self.datatype = datatype
+        self.version = version
+        self.changed = False
+        state = state or {}
+        self.rows = state.get('rows', 0)
+        self.nulls = state.get('nulls', 0)
+        self.minimum = state.get('min')
+        self.maximum = state.get('max')
+        self.numeric_count = state.get('numeric_count', 0)
+        self.mean = state.get('mean', 0.0)
+        self.m2 = state.get('m2', 0.0)
+        self.top = {item['value']: item['count'] for item in state.get('top', [])}
+        self.reservoir = state.get('reservoir', [])
+        self.hll = HyperLogLog(state.get('hll'))
+        # algorithm L state, not stored: drawn again from numeric_count after a load.
+        self._weight = None
+        self._next_sample = None
+
+    def update(self, values: list):
+        self.changed = True
+        present = [value for value in map(_normalize, values) if value is not None and value != '']
+        self.rows += len(values)
+        self.nulls += len(values) - len(present)
+        if not present:
+            return
+
+        counts = Counter(map(str, present))
+        self.hll.update(counts)
+        self._count_top(counts)
+        if self.datatype in ORDERED_TYPES:
+            self._update_range(present)
+        if self.datatype in NUMERIC_TYPES:
+            self._add_numbers([float(value) for value in present if value.__class__ in (int, float)])
+
+    def remove(self, values: list):
+        """
+        Takes replaced values out of the counters that allow it (rows, nulls, mean/stddev, top values).
+        The distinct estimate, min/max and the sample keep them, they are approximations after row updates.
+        """
+        self.changed = True
+        numeric = self.datatype in NUMERIC_TYPES
+        for value in values:
+            self.rows -= 1
+            value = _normalize(value)
+            if value is None or value == '':
+                self.nulls -= 1
+                continue
+            key = str(value)[:TOP_VALUE_MAX_LENGTH]
+            if key in self.top:
+                self.top[key] -= 1
+                if self.top[key] <= 0:
+                    del self.top[key]
+            if numeric and value.__class__ in (int, float) and self.numeric_count > 0:
+                self._remove_number(float(value))
+
+    def _count_top(self, counts: Counter):
+        top = self.top
+        if len(counts) > TOP_K_CAPACITY:
+            # a value that isn't among the batch's TOP_K_CAPACITY largest counts can only stay if it's stored.
+            candidates = dict(heapq.nlargest(TOP_K_CAPACITY, counts.items(), key=itemgetter(1)))
+            candidates.update((key, counts[key]) for key in top.keys() & counts.keys())
+            counts = candidates
+        for key, count in counts.items():
+            if len(key) > TOP_VALUE_MAX_LENGTH:
+                key = key[:TOP_VALUE_MAX_LENGTH]
+            top[key] = top.get(key, 0) + count
+        if len(top) > TOP_K_CAPACITY:
+            self.top = dict(heapq.nlargest(TOP_K_CAPACITY, top.items(), key=itemgetter(1)))
+
+    def _update_range(self, values: list):
+        try:
+            low, high = min(values), max(values)
+            if self.minimum is None or low < self.minimum:
+                self.minimum = low
+            if self.maximum is None or high > self.maximum:
+                self.maximum = high
+        except TypeError:
+            # values of different types (manual entries), the comparable ones are kept.
+            for value in values:
+                try:
+                    if self.minimum is None or value < self.minimum:
+                        self.minimum = value
+                    if self.maximum is None or value > self.maximum:
+                        self.maximum = value
+                except TypeError:
+                    pass
+
+    def _add_numbers(self, numbers: List[float]):
+        if not numbers:
+            return
+        self._sample(numbers)
+        count = len(numbers)
+        mean = sum(numbers) / count
+        m2 = sum((number - mean) ** 2 for number in numbers)
+        total = self.numeric_count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.numeric_count * count / total
+        self.numeric_count = total
+
+    def _sample(self, numbers: List[float]):
+        """Reservoir sample of the numbers, self.numeric_count doesn't count them yet."""
+        reservoir = self.reservoir
+        seen = self.numeric_count
+        free = RESERVOIR_SIZE - len(reservoir)
+        if free > 0:
+            reservoir.extend(numbers[:free])
+            if len(reservoir) < RESERVOIR_SIZE:
+                return
+
+        end = seen + len(numbers)
+        if self._next_sample is None:
+            start = max(seen, RESERVOIR_SIZE)
+            self._weight = RESERVOIR_SIZE / (start + 1)
+            self._next_sample = start + self._skip()
+        while self._next_sample < end:
+            reservoir[random.randrange(RESERVOIR_SIZE)] = numbers[self._next_sample - seen]
+            self._weight *= math.exp(math.log(1.0 - random.random()) / RESERVOIR_SIZE)
+            self._next_sample += self._skip() + 1
+
+    def _skip(self) -> int:
+        """Number of values to pass before the next one enters the sample."""
+        return int(math.log(1.0 - random.random()) / math.log(1.0 - self._weight))
+
+    def _remove_number(self, value: float):
+        if self.numeric_count == 1:
+            self.numeric_count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        mean = (self.numeric_count * self.mean - value) / (self.numeric_count - 1)
+        self.m2 = max(self.m2 - (value - self.mean) * (value - mean), 0.0)
+        self.mean = mean
+        self.numeric_count -= 1
+
+    def histogram(self, bins: int = HISTOGRAM_BINS) -> List[dict]:
+        """Counts per equal width bin of the sample, scaled to the number of numeric values."""
+        if not self.reservoir:
+            return []
+        low, high = min(self.reservoir), max(self.reservoir)
+        if self.minimum.__class__ in (int, float) and self.maximum.__class__ in (int, float):
+            low, high = min(low, self.minimum), max(high, self.maximum)
+        width = (high - low) / bins or 1.0
+        counts = [0] * bins
+        for value in self.reservoir:
+            counts[max(0, min(int((value - low) / width), bins - 1))] += 1
+        scale = self.numeric_count / len(self.reservoir)
+        return [
+            {"start": low + i * width, "end": low + (i + 1) * width, "count": round(count * scale)}
+            for i, count in enumerate(counts)
+        ]
+
+    def state(self) -> dict:
+        return {
+            'rows': self.rows, 'nulls': self.nulls, 'min': self.minimum, 'max': self.maximum,
+            'numeric_count': self.numeric_count, 'mean': self.mean, 'm2': self.m2,
+            'top': [{'value': value, 'count': count} for value, count in self.top.items()],
+            'reservoir': self.reservoir, 'hll': Binary(bytes(self.hll.registers)),
+        }
+
+    def summary(self) -> dict:
+        numeric = self.datatype in NUMERIC_TYPES and self.numeric_count > 0
+        top = sorted(self.top.items(), key=lambda item: item[1], reverse=True)[:TOP_K]
+        return {
+            "column": self.name,
+            "datatype": self.datatype,
+            "rows": self.rows,
+            "null_count": self.nulls,
+            "distinct_estimate": min(self.hll.estimate(), self.rows - self.nulls),
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": self.mean if numeric else None,
+            "stddev": math.sqrt(self.m2 / (self.numeric_count - 1)) if numeric and self.numeric_count > 1 else None,
+            "top": [{"value": value, "count": count} for value, count in top],
+            "histogram": self.histogram() if numeric else [],
+        }
+
+
+class DatasetProfiler:
+    """
+    Column profiles of a dataset, computed while rows are loaded and kept in the rims_column_profiles collection,
+    one document per column ({_id: "<dataset id>:<column>", dataset_id, column, version, state}) so the size of a
+    document doesn't depend on the number of columns. Later inserts and row updates are applied to the stored
+    profiles.
+
+    usage example:
+        profiler = DatasetProfiler(dataset.id, {"age": "integer", "name": "string"})
+        profiler.update_columns(["age", "name"], [[31, 40], ["Joe", "Ann"]])
+        profiler.save(get_mongodb())
+
+        DatasetProfiler.load(dataset.id, column_types, mongodb).summaries()
+    """
+
+    def __init__(self, dataset_id: int, column_types: Dict[str, str], documents: List[dict] = None):
+        documents = {document['column']: document for document in documents or []}
+        self.dataset_id = dataset_id
+        self.profiles = {}
+        for name, datatype in column_types.items():
+            document = documents.get(name, {})
+            self.profiles[name] = ColumnProfile(name, datatype, document.get('state'), document.get('version', 0))
+
+    @classmethod
+    def load(cls, dataset_id: int, column_types: Dict[str, str], mongodb: Database) -> 'DatasetProfiler':
+        documents = mongodb[PROFILES_COLLECTION].find({'_id': {'$in': cls._document_ids(dataset_id, column_types)}})
+        return cls(dataset_id, column_types, list(documents))
+
+    @classmethod
+    async def load_async(cls, dataset_id: int, column_types: Dict[str, str], mongodb) -> 'DatasetProfiler':
+        """`load` on a motor database."""
+        cursor = mongodb[PROFILES_COLLECTION].find({'_id': {'$in': cls._document_ids(dataset_id, column_types)}})
+        return cls(dataset_id, column_types, await cursor.to_list(None))
+
+    def update_columns(self, names: List[str], columns: List[list]):
+        for name, values in zip(names, columns):
+            profile = self.profiles.get(name)
+            if profile is not None:
+                profile.update(values)
+
+    def update_rows(self, rows: List[dict]):
+        for name, profile in self.profiles.items():
+            profile.update([row.get(name) for row in rows])
+
+    def replace_values(self, old: dict, new: dict):
+        """A row update: the values of `new` replace the ones of `old` (the row before the update)."""
+        for name, value in new.items():
+            profile = self.profiles.get(name)
+            if profile is not None:
+                profile.remove([old.get(name)])
+                profile.update([value])
+
+    def summaries(self) -> List[dict]:
+        return [profile.summary() for profile in self.profiles.values()]
+
+    def save(self, mongodb: Database, replace: bool = True) -> List[str]:
+        """
+        replace: overwrite the stored profiles (after a full load). Otherwise only the changed profiles are written,
+        each one if nobody saved it since `load`, see `apply`.
+        returns; the columns that were not saved because of a concurrent save
+        """
+        names = self._written(replace)
+        if not names:
+            return []
+        writer = ObjectId()
+        collection = mongodb[PROFILES_COLLECTION]
+        try:
+            result = collection.bulk_write(self._replacements(names, replace, writer), ordered=False)
+            if replace or result.matched_count + result.upserted_count == len(names):
+                return []
+        except BulkWriteError:
+            # a concurrent first save of a column won (duplicate _id), the other columns may have been written.
+            pass
+        saved = collection.find(self._saved_query(names, writer), {'column': 1})
+        return self._conflicts(names, list(saved))
+
+    async def save_async(self, mongodb, replace: bool = True) -> List[str]:
+        """`save` on a motor database."""
+        names = self._written(replace)
+        if not names:
+            return []
+        writer = ObjectId()
+        collection = mongodb[PROFILES_COLLECTION]
+        try:
+            result = await collection.bulk_write(self._replacements(names, replace, writer), ordered=False)
+            if replace or result.matched_count + result.upserted_count == len(names):
+                return []
+        except BulkWriteError:
+            pass
+        saved = await collection.find(self._saved_query(names, writer), {'column': 1}).to_list(None)
+        return self._conflicts(names, saved)
+
+    def _written(self, replace: bool) -> List[str]:
+        return [name for name, profile in self.profiles.items() if replace or profile.changed]
+
+    def _replacements(self, names: List[str], replace: bool, writer: ObjectId) -> List[ReplaceOne]:
+        """writer: tells the documents written by this save from concurrent ones."""
+        requests = []
+        for name, _id in zip(names, self._document_ids(self.dataset_id, names)):
+            profile = self.profiles[name]
+            document = {
+                'dataset_id': self.dataset_id, 'column': name, 'version': profile.version + 1, 'writer': writer,
+                'state': profile.state()
+            }
+            if replace:
+                requests.append(ReplaceOne({'_id': _id}, document, upsert=True))
+            else:
+                requests.append(ReplaceOne({'_id': _id, 'version': profile.version}, document, upsert=profile.version == 0))
+        return requests
+
+    def _saved_query(self, names: List[str], writer: ObjectId) -> dict:
+        return {'_id': {'$in': self._document_ids(self.dataset_id, names)}, 'writer': writer}
+
+    @staticmethod
+    def _conflicts(names: List[str], saved: List[dict]) -> List[str]:
+        saved = {document['column'] for document in saved}
+        return [name for name in names if name not in saved]
+
+    @staticmethod
+    def _document_ids(dataset_id: int, names) -> List[str]:
+        return [f"{dataset_id}:{name}" for name in names]
+
+    @classmethod
+    def apply(cls, dataset_id: int, column_types: Dict[str, str], mongodb: Database, change) -> bool:
+        """
+        Loads the stored profiles, calls change(profiler) and saves the changed ones. The columns another process
+        saved in between are loaded and changed again, alone.
+        """
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            profiler = cls.load(dataset_id, column_types, mongodb)
+            change(profiler)
+            conflicts = profiler.save(mongodb, replace=False)
+            if not conflicts:
+                return True
+            column_types = {name: column_types[name] for name in conflicts}
+        return False
+
+    @classmethod
+    async def apply_async(cls, dataset_id: int, column_types: Dict[str, str], mongodb, change) -> bool:
+        """`apply` on a motor database, change(profiler) runs on the loop's default executor, not on the loop."""
+        loop = asyncio.get_running_loop()
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            profiler = await cls.load_async(dataset_id, column_types, mongodb)
+            await loop.run_in_executor(None, change, profiler)
+            conflicts = await profiler.save_async(mongodb, replace=False)
+            if not conflicts:
+                return True
+            column_types = {name: column_types[name] for name in conflicts}
+        return False
+
+
+def _normalize(value):
+    cls = value.__class__
+    if cls is Decimal128:
+        value = value.to_decimal()
+        cls = Decimal
+    if cls is Decimal:
+        return float(value) if value.is_finite() else None
+    if cls is int and not MIN_INTEGER <= value <= MAX_INTEGER:
+        return float(value)
+    if cls is datetime.date:
+        return datetime.datetime(value.year, value.month, value.day)
+    if cls in (list, dict):
+        return str(value)
+    if cls is datetime.time:
+        return value.isoformat()
+    return value
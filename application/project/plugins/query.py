@@ -0,0 +1,118 @@
+import re
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+
+from ..helpers import get_frictionless_cell_caster
+from ..exception import DatasetException
+from ..plugins.coercion import BSONCoercer
+
+COMPARISON_OPERATORS = {'eq': '$eq', 'ne': '$ne', 'gt': '$gt', 'gte': '$gte', 'lt': '$lt', 'lte': '$lte'}
+LIST_OPERATORS = {'in': '$in', 'nin': '$nin'}
+OPERATORS = list(COMPARISON_OPERATORS) + list(LIST_OPERATORS) + ['between', 'contains', 'null', 'notnull']
+
+# datatypes without an order, only equality, lists and null checks apply to them.
+UNORDERED_TYPES = ['boolean', 'object', 'array', 'geopoint', 'geojson', 'any']
+
+
+class RowQuery:
+    """
+    Compiles filter and sort expressions on dataset rows to a Mongo filter and sort. Columns and values are checked
+    against the dataset column types ({column name: datatype}, see Dataset.get_column_name_dict) and values are cast
+    to what ingestion stores (Decimal128 numbers, datetime dates ...) so the comparisons can run on an index.
+
+    filter expressions, all of them must match:
+        column:eq:value, column:ne:value, column:gt:value, column:gte:value, column:lt:value, column:lte:value
+        column:between:low,high    low <= column <= high
+        column:in:a,b,c            column:nin:a,b,c
+        column:contains:text       case insensitive, string columns only. An unanchored case insensitive $regex,
+                                   it can't use an index and scans every row left by the other conditions.
+        column:null                column:notnull
+    sort expressions: column (ascending) or -column (descending). _id is always the last sort key, in the direction
+    of the last sorted column, so the {column: 1, _id: 1} index of IndexManager serves a one column sort either way.
+
+    usage example:
+        query = RowQuery({"age": "integer", "name": "string"}, ["age:gte:18", "name:contains:jo"], ["-age"])
+        collection.find(query.filter).sort(query.sort)
+    """
+
+    def __init__(self, column_types: Dict[str, str], filters: List[str] = None, sort: List[str] = None):
+        self._column_types = column_types
+        self._coercer = BSONCoercer(column_types)
+        self.filter = self._compile_filters(filters or [])
+        self.sort = self._compile_sort(sort or [])
+
+    @property
+    def is_filtered(self) -> bool:
+        return len(self.filter) > 0
+
+    @property
+    def is_sorted(self) -> bool:
+        return len(self.sort) > 1
+
+    @property
+    def columns(self) -> List[str]:
+        """Columns the query filters or sorts on that an index could serve, i.e. not filtered by contains only."""
+        filtered = [column for column, condition in self.filter.items() if set(condition) - {'$regex', '$options'}]
+        return filtered + [column for column, _ in self.sort[:-1]]
+
+    def _compile_filters(self, expressions: List[str]) -> dict:
+        conditions = {}
+        for expression in expressions:
+            column, operator, value = self._parse_filter(expression)
+            conditions.setdefault(column, {}).update(self._compile_condition(column, operator, value))
+        return conditions
+
+    def _parse_filter(self, expression: str) -> Tuple[str, str, str]:
+        parts = expression.split(':', 2)
+        if len(parts) < 2:
+            raise DatasetException(f"Invalid filter {expression}. Expected column:operator:value.")
+        column, operator = parts[0], parts[1].lower()
+        value = parts[2] if len(parts) == 3 else None
+        if column not in self._column_types:
+            raise DatasetException(f"Invalid filter {expression}. Column {column} not found.")
+        if operator not in OPERATORS:
+            raise DatasetException(f"Invalid filter {expression}. Operator must be one of: {', '.join(OPERATORS)}.")
+        if value is None and operator not in ['null', 'notnull']:
+            raise DatasetException(f"Invalid filter {expression}. A value is required.")
+        return column, operator, value
+
+    def _compile_condition(self, column: str, operator: str, value: str) -> dict:
+        datatype = self._column_types[column]
+        if operator == 'null':
+            return {'$eq': None}
+        if operator == 'notnull':
+            return {'$ne': None}
+        if operator == 'contains':
+            if datatype != 'string':
+                raise DatasetException(f"Operator contains only applies to string columns, {column} is {datatype}.")
+            return {'$regex': re.escape(value), '$options': 'i'}
+        if operator in LIST_OPERATORS:
+            return {LIST_OPERATORS[operator]: [self._cast(column, v) for v in value.split(',')]}
+
+        if datatype in UNORDERED_TYPES and operator not in ['eq', 'ne']:
+            raise DatasetException(f"Operator {operator} doesn't apply to {datatype} column {column}.")
+        if operator == 'between':
+            bounds = value.split(',')
+            if len(bounds) != 2:
+                raise DatasetException(f"Operator between expects two values low,high for column {column}.")
+            return {'$gte': self._cast(column, bounds[0]), '$lte': self._cast(column, bounds[1])}
+        return {COMPARISON_OPERATORS[operator]: self._cast(column, value)}
+
+    def _cast(self, column: str, value: str):
+        datatype = self._column_types[column]
+        cast_value = get_frictionless_cell_caster(datatype)(value)
+        if cast_value is None:
+            raise DatasetException(f"Value {value} is not a valid {datatype} for column {column}.")
+        return self._coercer.coerce_rows([{column: cast_value}])[0][column]
+
+    def _compile_sort(self, expressions: List[str]) -> List[Tuple[str, int]]:
+        sort = []
+        for expression in expressions:
+            direction = DESCENDING if expression.startswith('-') else ASCENDING
+            column = expression.lstrip('-+')
+            if column not in self._column_types:
+                raise DatasetException(f"Invalid sort {expression}. Column {column} not found.")
+            sort.append((column, direction))
+        sort.append(('_id', sort[-1][1] if sort else ASCENDING))
+        return sort
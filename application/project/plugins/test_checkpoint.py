@@ -0,0 +1,97 @@
+from .checkpoint import CHECKPOINTS_COLLECTION, LoadCheckpoint
+
+
+class FakeCollection:
+    """The few collection methods LoadCheckpoint uses, on a dictionary."""
+
+    def __init__(self, name):
+        self.name = name
+        self.documents = {}
+        self.dropped = False
+
+    def find_one(self, filter, projection=None):
+        document = self.documents.get(filter['_id'])
+        return dict(document) if document is not None else None
+
+    def replace_one(self, filter, document, upsert=False):
+        self.documents[filter['_id']] = dict(document)
+
+    def update_one(self, filter, update):
+        document = self.documents.get(filter['_id'])
+        if document is None:
+            return
+        for key, value in update.get('$max', {}).items():
+            document[key] = max(document.get(key, value), value)
+        document.update(update.get('$set', {}))
+
+    def delete_one(self, filter):
+        self.documents.pop(filter['_id'], None)
+
+    def drop(self):
+        self.dropped = True
+
+
+class FakeDatabase(dict):
+
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection(name)
+        return collection
+
+
+def test_row_ids_follow_the_row_order():
+    checkpoint = LoadCheckpoint(FakeDatabase(), 1, "file.csv", "streaming")
+    checkpoint.start(FakeCollection("data"))
+    ids = [checkpoint.row_id(row_number) for row_number in [0, 1, 255, 256, 70000, 2 ** 40]]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert checkpoint.row_id(5) == checkpoint.row_id(5)
+
+
+def test_row_ids_carry_the_load_epoch():
+    checkpoint = LoadCheckpoint(FakeDatabase(), 1, "file.csv", "streaming")
+    checkpoint.epoch = 1600000000
+    assert int(checkpoint.row_id(7).generation_time.timestamp()) == 1600000000
+    assert checkpoint.row_id(7).binary[4:] == (7).to_bytes(8, 'big')
+
+
+def test_interrupted_load_resumes_after_its_committed_rows():
+    mongodb = FakeDatabase()
+    checkpoint = LoadCheckpoint(mongodb, 1, "file.csv", "streaming")
+    assert checkpoint.resume() is None
+    checkpoint.start(mongodb["data"])
+    checkpoint.commit(500)
+    checkpoint.commit(200)
+
+    resumed = LoadCheckpoint(mongodb, 1, "file.csv", "streaming")
+    assert resumed.resume() is mongodb["data"]
+    assert resumed.resumed
+    assert resumed.rows == 500
+    assert resumed.row_id(3) == checkpoint.row_id(3)
+    assert LoadCheckpoint.interrupted_mode(mongodb, 1, "file.csv") == "streaming"
+
+
+def test_load_of_another_file_or_mode_drops_the_leftover():
+    mongodb = FakeDatabase()
+    LoadCheckpoint(mongodb, 1, "file.csv", "streaming").start(mongodb["data"])
+
+    other = LoadCheckpoint(mongodb, 1, "file.csv", "multipass")
+    assert other.resume() is None
+    assert mongodb["data"].dropped
+    assert mongodb[CHECKPOINTS_COLLECTION].documents == {}
+    assert LoadCheckpoint.interrupted_mode(mongodb, 1, "file.csv") is None
+
+
+def test_interrupted_mode_ignores_other_files():
+    mongodb = FakeDatabase()
+    LoadCheckpoint(mongodb, 1, "old.csv", "multipass").start(mongodb["data"])
+    assert LoadCheckpoint.interrupted_mode(mongodb, 1, "new.csv") is None
+    assert LoadCheckpoint.interrupted_mode(mongodb, 1, "old.csv") == "multipass"
+
+
+def test_clear_forgets_the_load():
+    mongodb = FakeDatabase()
+    checkpoint = LoadCheckpoint(mongodb, 1, "file.csv", "streaming")
+    checkpoint.start(mongodb["data"])
+    checkpoint.clear()
+    assert LoadCheckpoint(mongodb, 1, "file.csv", "streaming").resume() is None
+    assert not mongodb["data"].dropped
@@ -0,0 +1,79 @@
+import datetime
+import types
+
+import pytest
+
+from . import fdw
+from .coercion import BSONCoercer
+from .fdw import FileDataWarehousing
+from ..exception import DatasetException
+from ..helpers import DEFAULT_FIELD_MISSING_VALUES, ColumnFormatter
+
+CSV = "Full Name,Age,Born\nJoe,31,02/01/1990\nAnn,40,15/06/1981\n"
+
+
+def extraction(tmp_path, content=CSV) -> FileDataWarehousing:
+    """A FileDataWarehousing on a local file, without the dataset row _populate_initials reads."""
+    path = tmp_path / "people.csv"
+    path.write_text(content)
+    process = FileDataWarehousing.__new__(FileDataWarehousing)
+    process._dataset_id = 1
+    process._file = "people.csv"
+    process._filepath = str(path)
+    process._resource_file = tmp_path / "people.resource.json"
+    process._formatter = ColumnFormatter()
+    process._collection = None
+    process._checkpoint = None
+    process._profiler = None
+    process._field_missing_values = DEFAULT_FIELD_MISSING_VALUES
+    return process
+
+
+def test_multipass_fallback_names_the_columns_once(tmp_path, monkeypatch):
+    process = extraction(tmp_path)
+    saved = []
+    monkeypatch.setattr(fdw.settings, "DATASET_INGESTION_MODE", "streaming")
+    monkeypatch.setattr(fdw, "get_staggingdb", lambda: None)
+    monkeypatch.setattr(fdw.LoadCheckpoint, "interrupted_mode", staticmethod(lambda *args: None))
+
+    def fail_streaming_load(mode, proposed_name):
+        raise DatasetException("streaming failed after the sample")
+    monkeypatch.setattr(process, "_open_checkpoint", fail_streaming_load)
+    monkeypatch.setattr(process, "_load_data_to_data_warehouse", lambda: (2, "people"))
+    monkeypatch.setattr(process, "_save_columns_to_dataset_columns", saved.append)
+    monkeypatch.setattr(process, "_mark_dataset_as_extracted", lambda *args: None)
+
+    process.run_data_extraction_processes()
+    assert [col["name"] for col in saved[0]] == ["full_name", "age", "born"]
+    assert [col["label"] for col in saved[0]] == ["Full Name", "Age", "Born"]
+
+
+def test_prepare_batch_converts_date_columns(tmp_path):
+    process = extraction(tmp_path)
+    documents = process._prepare_batch(
+        [["Joe", "02/01/1990"], ["Ann", None]], ["name", "born"], [1], BSONCoercer({"name": "string", "born": "datetime"})
+    )
+    assert documents == [{"name": "Joe", "born": datetime.datetime(1990, 1, 2)}, {"name": "Ann", "born": None}]
+
+
+def test_prepare_batch_fails_on_a_value_that_is_not_a_date(tmp_path):
+    process = extraction(tmp_path)
+    with pytest.raises(DatasetException):
+        process._prepare_batch(
+            [["Joe", "02/01/1990"], ["Ann", "someday"]], ["name", "born"], [1], BSONCoercer({"name": "string", "born": "datetime"})
+        )
+
+
+def test_checkpoint_belongs_to_the_upload_not_the_converted_file(monkeypatch):
+    class FakeSession:
+        def add(self, dataset):
+            pass
+
+        def flush(self):
+            pass
+    monkeypatch.setattr(fdw, "get_db", FakeSession)
+    uploaded = types.SimpleNamespace(file="datasets/1/4f1c.xlsx")
+    converted = types.SimpleNamespace(file="datasets/1/4f1c.csv")
+    for dataset in [uploaded, converted]:
+        monkeypatch.setattr(fdw.Dataset, "get_dataset_by_id", staticmethod(lambda db, id, dataset=dataset: dataset))
+        assert FileDataWarehousing(1)._file == "datasets/1/4f1c"
@@ -0,0 +1,141 @@
+import datetime
+import random
+import statistics
+from decimal import Decimal
+
+import pytest
+from bson.decimal128 import Decimal128
+
+from .profile import TOP_K_CAPACITY, TOP_VALUE_MAX_LENGTH, ColumnProfile, DatasetProfiler, HyperLogLog
+
+
+def update_in_batches(profile, values, size=1000):
+    for start in range(0, len(values), size):
+        profile.update(values[start:start + size])
+
+
+@pytest.mark.parametrize("count", [0, 10, 1000, 50000])
+def test_hyperloglog_estimate(count):
+    hll = HyperLogLog()
+    hll.update(str(value) for value in range(count))
+    assert hll.estimate() == pytest.approx(count, rel=0.05, abs=1)
+
+
+def test_hyperloglog_counts_a_value_once():
+    hll = HyperLogLog()
+    hll.update(["a", "b", "a"])
+    hll.add("a")
+    hll.add("b")
+    assert hll.estimate() == 2
+
+
+def test_hyperloglog_continues_from_stored_registers():
+    first = HyperLogLog()
+    first.update(str(value) for value in range(5000))
+    restored = HyperLogLog(bytes(first.registers))
+    restored.update(str(value) for value in range(2500, 7500))
+    assert restored.estimate() == pytest.approx(7500, rel=0.05)
+
+
+def test_column_profile_numbers():
+    random.seed(1)
+    values = [random.gauss(50, 10) for _ in range(20000)]
+    profile = ColumnProfile("score", "number")
+    update_in_batches(profile, values + [None, ""], size=700)
+    summary = profile.summary()
+    assert summary["rows"] == 20002
+    assert summary["null_count"] == 2
+    assert summary["min"] == min(values)
+    assert summary["max"] == max(values)
+    assert summary["mean"] == pytest.approx(statistics.mean(values))
+    assert summary["stddev"] == pytest.approx(statistics.stdev(values))
+    assert summary["distinct_estimate"] == pytest.approx(20000, rel=0.05)
+    assert sum(bucket["count"] for bucket in summary["histogram"]) == pytest.approx(20000, abs=10)
+
+
+def test_column_profile_stored_numbers_are_normalized():
+    profile = ColumnProfile("amount", "number")
+    profile.update([Decimal128("1.5"), Decimal("2.5"), 2 ** 70, Decimal("NaN")])
+    assert profile.nulls == 1
+    assert profile.numeric_count == 3
+    assert profile.minimum == 1.5
+    assert profile.maximum == float(2 ** 70)
+
+
+def test_column_profile_top_values():
+    values = ["a"] * 500 + ["b"] * 300 + [f"unique-{i}" for i in range(5000)] + ["c"] * 200
+    random.seed(2)
+    random.shuffle(values)
+    profile = ColumnProfile("name", "string")
+    update_in_batches(profile, values, size=250)
+    top = profile.summary()["top"]
+    assert top[:3] == [{"value": "a", "count": 500}, {"value": "b", "count": 300}, {"value": "c", "count": 200}]
+    assert len(profile.top) <= TOP_K_CAPACITY
+
+
+def test_column_profile_cuts_long_top_values():
+    profile = ColumnProfile("text", "string")
+    profile.update(["x" * 1000, "x" * 1000])
+    assert profile.top == {"x" * TOP_VALUE_MAX_LENGTH: 2}
+
+
+def test_column_profile_mixed_values_keep_comparable_range():
+    profile = ColumnProfile("born", "date")
+    profile.update([datetime.date(1990, 1, 2), "unknown", datetime.date(1980, 5, 6)])
+    assert profile.minimum == datetime.datetime(1980, 5, 6)
+    assert profile.maximum == datetime.datetime(1990, 1, 2)
+
+
+def test_column_profile_reservoir_is_bounded_and_uniform():
+    profile = ColumnProfile("n", "integer")
+    update_in_batches(profile, list(range(100000)))
+    assert len(profile.reservoir) == 2000
+    assert statistics.mean(profile.reservoir) == pytest.approx(50000, rel=0.1)
+
+
+def test_column_profile_remove():
+    profile = ColumnProfile("n", "integer")
+    profile.update([1, 2, 3, 10, None])
+    profile.remove([10, None])
+    profile.update([4, 5])
+    summary = profile.summary()
+    assert summary["rows"] == 5
+    assert summary["null_count"] == 0
+    assert summary["mean"] == pytest.approx(3)
+    assert summary["stddev"] == pytest.approx(statistics.stdev([1, 2, 3, 4, 5]))
+    assert "10" not in profile.top
+
+
+def test_column_profile_state_round_trip():
+    profile = ColumnProfile("n", "integer")
+    profile.update([1, 2, 2, None])
+    restored = ColumnProfile("n", "integer", profile.state(), version=3)
+    restored.update([3])
+    assert restored.version == 3
+    assert restored.summary()["rows"] == 5
+    assert restored.summary()["distinct_estimate"] == 3
+    assert restored.summary()["top"][0] == {"value": "2", "count": 2}
+
+
+def test_dataset_profiler_saves_changed_columns():
+    documents = [{"column": "age", "version": 2, "state": ColumnProfile("age", "integer").state()}]
+    profiler = DatasetProfiler(4, {"age": "integer", "name": "string"}, documents)
+    assert profiler.profiles["age"].version == 2
+    assert profiler.profiles["name"].version == 0
+
+    profiler.update_columns(["age", "unknown"], [[31], ["x"]])
+    assert profiler._written(replace=False) == ["age"]
+    assert profiler._written(replace=True) == ["age", "name"]
+    assert DatasetProfiler._document_ids(4, ["age", "name"]) == ["4:age", "4:name"]
+    assert DatasetProfiler._conflicts(["age", "name"], [{"column": "name"}]) == ["age"]
+
+
+def test_dataset_profiler_replace_values():
+    profiler = DatasetProfiler(4, {"age": "integer", "name": "string"})
+    profiler.update_rows([{"age": 30, "name": "Joe"}, {"age": 40, "name": "Ann"}])
+    profiler.replace_values({"age": 40, "name": "Ann"}, {"age": 50})
+    summaries = {summary["column"]: summary for summary in profiler.summaries()}
+    assert summaries["age"]["rows"] == 2
+    assert summaries["age"]["mean"] == pytest.approx(40)
+    assert summaries["age"]["max"] == 50
+    assert summaries["name"]["rows"] == 2
@@ -0,0 +1,79 @@
+import datetime
+
+import pytest
+from bson.decimal128 import Decimal128
+from pymongo import ASCENDING, DESCENDING
+
+from .query import RowQuery
+from ..exception import DatasetException
+
+COLUMN_TYPES = {"age": "integer", "amount": "number", "name": "string", "born": "date", "active": "boolean"}
+
+
+def test_comparison_filters_are_cast():
+    query = RowQuery(COLUMN_TYPES, ["age:gte:18", "amount:lt:10.5", "born:eq:1990-01-02"])
+    assert query.filter == {
+        "age": {"$gte": 18},
+        "amount": {"$lt": Decimal128("10.5")},
+        "born": {"$eq": datetime.datetime(1990, 1, 2)},
+    }
+    assert query.is_filtered
+
+
+def test_conditions_on_one_column_are_merged():
+    query = RowQuery(COLUMN_TYPES, ["age:gt:18", "age:lte:65"])
+    assert query.filter == {"age": {"$gt": 18, "$lte": 65}}
+
+
+def test_between_in_and_null_filters():
+    query = RowQuery(COLUMN_TYPES, ["age:between:18,65", "name:in:Joe,Ann", "born:null"])
+    assert query.filter == {
+        "age": {"$gte": 18, "$lte": 65},
+        "name": {"$in": ["Joe", "Ann"]},
+        "born": {"$eq": None},
+    }
+
+
+def test_contains_is_escaped_and_case_insensitive():
+    query = RowQuery(COLUMN_TYPES, ["name:contains:a.b"])
+    assert query.filter == {"name": {"$regex": r"a\.b", "$options": "i"}}
+
+
+def test_contains_only_columns_are_not_index_candidates():
+    query = RowQuery(COLUMN_TYPES, ["name:contains:jo", "age:gte:18"], ["-amount"])
+    assert query.columns == ["age", "amount"]
+
+
+def test_operator_is_case_insensitive_and_values_keep_colons():
+    query = RowQuery(COLUMN_TYPES, ["name:EQ:a:b"])
+    assert query.filter == {"name": {"$eq": "a:b"}}
+
+
+def test_sort_ends_with_id_in_the_last_direction():
+    assert RowQuery(COLUMN_TYPES).sort == [("_id", ASCENDING)]
+    assert not RowQuery(COLUMN_TYPES).is_sorted
+
+    query = RowQuery(COLUMN_TYPES, sort=["name", "-age"])
+    assert query.sort == [("name", ASCENDING), ("age", DESCENDING), ("_id", DESCENDING)]
+    assert query.is_sorted
+    assert query.columns == ["name", "age"]
+
+
+@pytest.mark.parametrize("expression", [
+    "age",                  # no operator
+    "height:eq:1",          # unknown column
+    "age:like:1",           # unknown operator
+    "age:eq",               # missing value
+    "age:eq:abc",           # not an integer
+    "age:between:1",        # one bound
+    "age:contains:1",       # contains on a number
+    "active:gt:true",       # order on an unordered type
+])
+def test_invalid_filters_raise(expression):
+    with pytest.raises(DatasetException):
+        RowQuery(COLUMN_TYPES, [expression])
+
+
+def test_invalid_sort_raises():
+    with pytest.raises(DatasetException):
+        RowQuery(COLUMN_TYPES, sort=["-height"])
@@ -7,12 +7,15 @@ from . import schema as ProjectSchema
 from ..base import schema as ResponseSchema
 from ..session.controller import get_current_active_user
 from .dataset import routes as datasetRoutes
+from ..config import settings
+from ..utils import filemanagement
 
 
 router = APIRouter(
     prefix='/v1/projects',
     tags=["projects"],
-    dependencies=[Depends(get_current_active_user)]
+    dependencies=[Depends(get_current_active_user)],
+    route_class=filemanagement.UploadLimitRoute
 )
 
 router.include_router(datasetRoutes.router)
@@ -36,19 +39,23 @@ async def update_project(schema: ProjectSchema.ProjectUpdate):
 @router.put('/{project_id}/bannerphoto', response_model=ProjectSchema._Project, responses={
     404: {"model": ResponseSchema.FailedResponse, "description": "Project Not Found"},
     403: {"model": ResponseSchema.FailedResponse, "description": "Insufficient Permission"},
-    406: {"model": ResponseSchema.FailedResponse, "description": "Image Format Not Supported"}
+    406: {"model": ResponseSchema.FailedResponse, "description": "Image Format Not Supported"},
+    413: {"model": ResponseSchema.FailedResponse, "description": "Image Too Large"}
 })
-def upload_banner_photo(project_id: int = Path(...), file: UploadFile = File(...)):
-    return controller.upload_banner_photo(project_id, file)
+@filemanagement.max_upload_size(settings.MAX_IMAGE_UPLOAD_BYTES)
+async def upload_banner_photo(project_id: int = Path(...), file: UploadFile = File(...)):
+    return await controller.upload_banner_photo(project_id, file)
 
 
 @router.put('/{project_id}/profilephoto', response_model=ProjectSchema._Project, responses={
     404: {"model": ResponseSchema.FailedResponse, "description": "Project Not Found"},
     403: {"model": ResponseSchema.FailedResponse, "description": "Insufficient Permission"},
-    406: {"model": ResponseSchema.FailedResponse, "description": "Image Format Not Supported"}
+    406: {"model": ResponseSchema.FailedResponse, "description": "Image Format Not Supported"},
+    413: {"model": ResponseSchema.FailedResponse, "description": "Image Too Large"}
 })
-def upload_profile_photo(project_id: int = Path(...), file: UploadFile = File(...)):
-    return controller.upload_profile_photo(project_id, file)
+@filemanagement.max_upload_size(settings.MAX_IMAGE_UPLOAD_BYTES)
+async def upload_profile_photo(project_id: int = Path(...), file: UploadFile = File(...)):
+    return await controller.upload_profile_photo(project_id, file)
 
 
 @router.get('/{id}', response_model=ProjectSchema._Project, responses={404: {"model": ResponseSchema.FailedResponse, "description": "Not Found"}})
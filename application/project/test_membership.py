@@ -0,0 +1,116 @@
+import types
+
+import pytest
+
+from . import membership
+from .membership import MembershipIndex
+
+MEMBERSHIPS = {1: {10: "Manager", 11: "Viewer"}, 2: {10: "Dataentry"}, 3: {}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(membership, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """User ids loaded from the database, the memberships come from MEMBERSHIPS."""
+    loads = []
+
+    def load_user(user_id):
+        loads.append(user_id)
+        return dict(MEMBERSHIPS[user_id])
+    monkeypatch.setattr(MembershipIndex, "_load_user", staticmethod(load_user))
+    return loads
+
+
+def test_permission_lookups_load_a_user_once(clock, loads):
+    index = MembershipIndex(ttl=60, max_size=10)
+    assert index.permission(1, 10) == "Manager"
+    assert index.permission(1, 11) == "Viewer"
+    assert index.permission(1, 12) is None
+    assert sorted(index.project_ids(1)) == [10, 11]
+    assert index.project_ids(3) == []
+    assert loads == [1, 3]
+
+
+def test_users_are_loaded_again_after_ttl(clock, loads):
+    index = MembershipIndex(ttl=60, max_size=10)
+    index.permission(1, 10)
+    clock.now += 60
+    index.permission(1, 10)
+    clock.now += 1
+    index.permission(1, 10)
+    assert loads == [1, 1]
+
+
+def test_least_recently_used_user_goes_first(clock, loads):
+    index = MembershipIndex(ttl=60, max_size=2)
+    index.permission(1, 10)
+    index.permission(2, 10)
+    index.permission(1, 10)
+    index.permission(3, 10)
+    index.permission(1, 10)
+    index.permission(2, 10)
+    assert loads == [1, 2, 3, 2]
+
+
+def test_invalidate_user_and_project(clock, loads):
+    index = MembershipIndex(ttl=60, max_size=10)
+    for user_id in [1, 2, 3]:
+        index.permission(user_id, 10)
+    index.invalidate_user(2)
+    index.permission(2, 10)
+    assert loads == [1, 2, 3, 2]
+
+    index.invalidate_project(11)
+    for user_id in [1, 2, 3]:
+        index.permission(user_id, 10)
+    assert loads == [1, 2, 3, 2, 1]
+
+    index.clear()
+    index.permission(3, 10)
+    assert loads == [1, 2, 3, 2, 1, 3]
+
+
+def test_zero_ttl_always_loads(clock, loads):
+    index = MembershipIndex(ttl=0, max_size=10)
+    index.permission(1, 10)
+    index.permission(1, 10)
+    assert loads == [1, 1]
+
+
+class FakeSession:
+    """Answers the dataset project query with `projects` ({dataset_id: project_id})."""
+
+    def __init__(self, projects):
+        self.projects = projects
+        self.queries = 0
+
+    def query(self, *entities):
+        return self
+
+    def filter(self, criterion):
+        self.dataset_id = criterion.right.value
+        return self
+
+    def first(self):
+        self.queries += 1
+        project_id = self.projects.get(self.dataset_id)
+        return types.SimpleNamespace(project_id=project_id) if project_id is not None else None
+
+
+def test_dataset_project_ids_are_kept(monkeypatch):
+    session = FakeSession({5: 10, 6: 11})
+    monkeypatch.setattr(membership, "get_db", lambda: session)
+    index = MembershipIndex(ttl=60, max_size=1)
+    assert index.dataset_project_id(5) == 10
+    assert index.dataset_project_id(5) == 10
+    assert session.queries == 1
+    assert index.dataset_project_id(6) == 11
+    assert index.dataset_project_id(5) == 10
+    assert session.queries == 3
+    assert index.dataset_project_id(7) is None
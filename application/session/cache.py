@@ -0,0 +1,92 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from ..config import settings
+
+
+class CachedUser:
+    """What get_current_user resolves from a token: the request context of the user and its principals."""
+
+    __slots__ = ("id", "active", "deleted", "context", "principals")
+
+    def __init__(self, id: int, active: bool, deleted: bool, context: dict, principals: List[str]):
+        self.id = id
+        self.active = active
+        self.deleted = deleted
+        self.context = context
+        self.principals = principals
+
+
+class PrincipalCache:
+    """
+    Bounded TTL cache of resolved users, keyed by token subject (the user uuid), so authenticated requests don't
+    query the user and its roles every time. Least recently used entries go first once `max_size` is reached.
+    The cache is per process: changes made by this process invalidate the user right away (`invalidate`), other
+    processes see them after at most `ttl` seconds.
+
+    usage example:
+        cached = principal_cache.get(uuid)
+        if cached is None:
+            cached = principal_cache.set(uuid, CachedUser(...))
+        ...
+        principal_cache.invalidate(user.id)
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._subjects: Dict[int, Set[str]] = {}
+
+    def get(self, subject: str) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                self._remove(subject)
+                return None
+            self._entries.move_to_end(subject)
+        # callers get their own copy of the context, it ends up in the request context.
+        return CachedUser(user.id, user.active, user.deleted, copy.deepcopy(user.context), list(user.principals))
+
+    def set(self, subject: str, user: CachedUser) -> CachedUser:
+        if self._ttl <= 0 or self._max_size <= 0:
+            return user
+        stored = CachedUser(user.id, user.active, user.deleted, copy.deepcopy(user.context), list(user.principals))
+        with self._lock:
+            self._remove(subject)
+            self._entries[subject] = (time.monotonic() + self._ttl, stored)
+            self._subjects.setdefault(user.id, set()).add(subject)
+            while len(self._entries) > self._max_size:
+                self._remove(next(iter(self._entries)))
+        return user
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            for subject in list(self._subjects.get(user_id, ())):
+                self._remove(subject)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._subjects.clear()
+
+    def _remove(self, subject: str) -> None:
+        entry = self._entries.pop(subject, None)
+        if entry is None:
+            return
+        user_id = entry[1].id
+        subjects = self._subjects.get(user_id)
+        if subjects is not None:
+            subjects.discard(subject)
+            if not subjects:
+                del self._subjects[user_id]
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL, settings.PRINCIPAL_CACHE_SIZE)
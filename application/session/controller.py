@@ -8,10 +8,10 @@ from typing import Optional
 from fastapi import Depends, status, HTTPException, UploadFile
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm.session import Session 
 from typing import Optional
 
+from starlette.concurrency import run_in_threadpool
 from starlette_context import context 
 
 from ..base.api_response import SuccessResponse, CustomException
@@ -19,12 +19,14 @@ from ..config import settings
 from ..factory import gm_client 
 from ..messaging import Message, Mail
 from ..session import schema as UserSchema
+from ..session.cache import CachedUser, principal_cache
 from ..session.models import User, Principals
+from ..session import passwords
+from ..session.passwords import pwd_context
 from ..utils.db_connection import get_db, session_hook
 from ..utils import filemanagement
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_VERSION}/auth/f/token")
 
 DEFAULT_ROLE = "guest"
@@ -32,8 +34,8 @@ ADMIN_INDEX_KEY = 1
 
 
 @session_hook
-def signup(db: Session, schema: UserSchema.UserCreate) -> list:
-    hashed_password = pwd_context.hash(schema.password)
+def signup(db: Session, schema: UserSchema.UserCreate, hashed_password: str) -> list:
+    """hashed_password: hash of schema.password, see passwords.hash_password."""
     data = schema.dict()
 
     if 'username' in data.keys() and schema.username != None and schema.username != "":
@@ -57,12 +59,12 @@ def signup(db: Session, schema: UserSchema.UserCreate) -> list:
 
 
 @session_hook
-def update_user(db: Session, schema: UserSchema.UserUpdate):
+def update_user(db: Session, schema: UserSchema.UserUpdate, hashed_password: Optional[str] = None):
+    """hashed_password: hash of schema.password when it's set, computed here if not given."""
     data = schema.dict()
     if 'password' in data.keys():
         if schema.password != None and schema.password != "":
-            hashed_password = pwd_context.hash(schema.password)
-            data["password"] = hashed_password
+            data["password"] = hashed_password or pwd_context.hash(schema.password)
     
     if 'username' in data.keys() and schema.username != None and schema.username != "":
         existing_user = User.get_user_by_username(db, schema.username)
@@ -90,6 +92,7 @@ def update_user(db: Session, schema: UserSchema.UserUpdate):
             user.__setattr__(key, value)
     db.add(user)
     db.flush()
+    principal_cache.invalidate(user.id)
 
     def __acl__():
         return [ 
@@ -98,24 +101,29 @@ def update_user(db: Session, schema: UserSchema.UserUpdate):
     return SuccessResponse(data=UserSchema._User.from_orm(user)).response()
 
 
-def upload_profile_photo(file: UploadFile):
-    db:Session = get_db()
-    
+async def upload_profile_photo(file: UploadFile):
     file_format = Path(file.filename).suffix.lower()
     if not file_format in settings.IMAGE_FORMATS:
         raise CustomException(error="Image format not supported.", status=status.HTTP_406_NOT_ACCEPTABLE)
 
     filepath = Path("session", "media", "profile", date.today().strftime("%b-%Y"), f"{str(uuid4()).replace('-', '')}{file_format.lower()}")
     storage_path = Path(settings.BASE_DIR, filepath)
-    saved = filemanagement.save_upload_file(file, storage_path)
+    try:
+        await filemanagement.save_upload_file_async(file, storage_path, settings.MAX_IMAGE_UPLOAD_BYTES)
+    except OSError:
+        raise CustomException(error="Unable to Save the image.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return await run_in_threadpool(_save_profile_photo, filepath)
+
 
+def _save_profile_photo(filepath: Path):
+    db:Session = get_db()
     user = User.get_user_by_id(db, context.get("user")["id"])
-    if saved:
-        user.photo = filepath
-        db.add(user)
-        db.flush
-        return SuccessResponse(data=UserSchema._User.from_orm(user)).response()
-    raise CustomException(error="Unable to Save the image.", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    user.photo = filepath
+    db.add(user)
+    db.flush()
+    principal_cache.invalidate(user.id)
+    return SuccessResponse(data=UserSchema._User.from_orm(user)).response()
     
 
 @session_hook
@@ -124,6 +132,7 @@ def delete_user(db: Session, id: int) -> bool:
     user.deleted = True 
     db.add(user)
     db.flush()
+    principal_cache.invalidate(user.id)
     return SuccessResponse(data={}).response()
 
 
@@ -181,11 +190,7 @@ def send_password_reset_email(email: str, code: str ) -> bool:
     return status 
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def authenticate_user(username: str, password:str):
+async def authenticate_user(username: str, password:str):
     db = get_db()
     user = User.get_user_by_username(db, username)
     if not user:
@@ -193,8 +198,13 @@ def authenticate_user(username: str, password:str):
         if not user:
             raise CustomException(error="Invalid username or password", status=401)
     
-    if not verify_password(password, user.password):
+    valid, new_hash = await passwords.verify_password(password, user.password)
+    if not valid:
         raise CustomException(error="Invalid username or password", status=401)
+    if new_hash is not None: # hashed with a lower cost than configured.
+        user.password = new_hash
+        db.add(user)
+        db.flush()
     
     if not user.is_verified:
 
@@ -273,15 +283,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
     except JWTError as e:
         raise credentials_exception
-    db = get_db()
-    user = User.get_user_using_uuid(db, uuid)
+    user = principal_cache.get(uuid)
     if user is None:
-        raise credentials_exception
-    context["user"] = UserSchema._User.from_orm(user).dict()
+        db = get_db()
+        db_user = User.get_user_using_uuid(db, uuid)
+        if db_user is None:
+            raise credentials_exception
+        user = principal_cache.set(uuid, CachedUser(
+            db_user.id, db_user.active, db_user.deleted, UserSchema._User.from_orm(db_user).dict(),
+            db_user.get_principals()
+        ))
+    context["user"] = user.context
+    context["principals"] = user.principals
     return user 
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: CachedUser = Depends(get_current_user)) -> CachedUser:
     if current_user.deleted or not current_user.active:
         raise CustomException(error="Inactive user", status=status.HTTP_403_FORBIDDEN)
     return current_user
@@ -294,6 +311,7 @@ def reset_password(email: str):
         raise CustomException(error="Account with this email does not exist.", status=404)
     user.uuid = str(uuid4()).replace("-", "")
     db.flush()
+    principal_cache.invalidate(user.id)
 
     gm_client.submit_job(
         'session.email.passwordreset', {"email": email, "code": user.uuid},
@@ -302,12 +320,12 @@ def reset_password(email: str):
     return SuccessResponse(data={}, message="Password reset link sent").response()
 
 
-def reset_password_confirm(code: str, new_password:str):
+async def reset_password_confirm(code: str, new_password:str):
     db = get_db()
     user = User.get_user_using_uuid(db, code)
     if user is None:
         raise CustomException(error="Invalid or Expired link", status=status.HTTP_406_NOT_ACCEPTABLE)
-    user.password = pwd_context.hash(new_password)
+    user.password = await passwords.hash_password(new_password)
     db.flush()
     return SuccessResponse(data={}, message="Password reset completed. Proceed to login.").response()
  
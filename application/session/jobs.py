@@ -1,17 +1,20 @@
 from ..factory import gm_worker
 from . import controller 
+from ..utils.db_connection import session_scope
 
 
 def send_password_reset_email(worker, job):
     email = job.data.get('email')
     code = job.data.get('code')
-    controller.send_password_reset_email(email, code)
+    with session_scope():
+        controller.send_password_reset_email(email, code)
 
 
 def send_email_verification_email(worker, job):
     email = job.data.get('email')
     code = job.data.get('code')
-    controller.send_email_verification_mail(email, code)
+    with session_scope():
+        controller.send_email_verification_mail(email, code)
 
 
 gm_worker.register_task('session.email.passwordreset', send_password_reset_email)
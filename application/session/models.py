@@ -6,8 +6,7 @@ from sqlalchemy.orm.session import Session
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.mysql import JSON
 from ..base.models import Base
-from ..permission.models import Role 
-from ..utils.db_connection import get_db
+from ..permission.registry import role_registry
 
 
 class User(Base):
@@ -32,27 +31,20 @@ class User(Base):
 
     @property 
     def role(self):
+        """The role with the lowest key (the highest privilege)."""
         _role = {}
-        key = 100
-        db = get_db()
-        for principal in self.principals:
-            if principal.value.split(":")[0].lower() == "role":
-                code = principal.value.split(":")[1].lower()
-                role = db.query(Role).filter(Role.code == code).first()
-                if role.key < key: 
-                    _role = {"code": code, "name": role.name, "key": role.key} 
-                key = role.key 
+        for role in self.roles:
+            if not _role or role["key"] < _role["key"]:
+                _role = role
         return _role 
 
     @property
     def roles(self):
         _roles = []
-        db = get_db()
-        for principal in self.principals:
-            if principal.value.split(":")[0].lower() == "role":
-                code = principal.value.split(":")[1].lower()
-                role = db.query(Role).filter(Role.code == code).first()
-                _roles.append({"code": code, "name": role.name, "key": role.key})
+        for code in self.get_roles():
+            role = role_registry.get(code)
+            if role is not None:
+                _roles.append(role)
         return _roles
     
     def get_roles(self):
@@ -0,0 +1,34 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from ..config import settings
+
+# hashes below the configured cost are upgraded on the next successful login (see verify_password).
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS, bcrypt__min_rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL, so the hashes run in parallel up to the number of workers, the others wait in the queue.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1, thread_name_prefix="password-hash"
+)
+
+
+async def hash_password(password: str) -> str:
+    """Hashes on the password executor, the event loop keeps serving other requests meanwhile."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Returns (valid, new_hash). new_hash is set when the password is valid and the stored hash uses a lower cost
+    than [user] bcrypt_rounds (or a deprecated scheme), the caller saves it in place of the old one.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pwd_context.verify_and_update, password, hashed_password)
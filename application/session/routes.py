@@ -4,6 +4,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from starlette_context import context 
 
 from ..session import controller as user_controller
+from ..session import passwords
 from ..session import schema as UserSchema
 from ..base import schema as BaseSchema
 from ..permission import schema as PermissionsSchema
@@ -12,6 +13,8 @@ from ..utils.db_connection import get_db
 from ..base.api_response import SuccessResponse, CustomException
 from ..permission.lib.core import Permission, Allow
 from ..factory import gm_client
+from ..config import settings
+from ..utils import filemanagement
 
 router = APIRouter(
     prefix='/v1/auth',
@@ -22,7 +25,8 @@ router = APIRouter(
 user_router = APIRouter(
     prefix="/v1/users",
     tags=['users'], 
-    dependencies=[Depends(user_controller.get_current_active_user)]
+    dependencies=[Depends(user_controller.get_current_active_user)],
+    route_class=filemanagement.UploadLimitRoute
 )
 
 
@@ -38,7 +42,8 @@ async def signup(schema: UserSchema.UserCreate = Body(...)):
         if user:
             raise CustomException(error="An account with the provided username already exist.", status=409)
         
-    result = user_controller.signup(schema)
+    hashed_password = await passwords.hash_password(schema.password)
+    result = user_controller.signup(schema, hashed_password)
     user = result[0]
     gm_client.submit_job(
         'session.email.verification', {"email": schema.email, "code": result[1]}, background=True, 
@@ -84,19 +89,19 @@ async def reset_password(email: str = Body(...), ignore:str = Body(None, descrip
     406: {"model": BaseSchema.FailedResponse, "description": "Invalid or Expired code"}
 })
 async def reset_password_confirm(new_password:str = Body(...), code:str = Body(...)):
-    return user_controller.reset_password_confirm(code, new_password)
+    return await user_controller.reset_password_confirm(code, new_password)
 
 
 @router.post('/token', response_model=UserSchema.Token, responses={401: {"model": BaseSchema.FailedResponse, "description": "Invalid Login Credentials"}})
 async def login(username: str = Body(...), password:str = Body(...)):
-    return user_controller.authenticate_user(username, password)
+    return await user_controller.authenticate_user(username, password)
 
 
 @router.post('/f/token', response_model=UserSchema.Token, responses={401: {"model": BaseSchema.FailedResponse, "description": "Invalid Login Credentials"}})
 async def login(auth: OAuth2PasswordRequestForm = Depends()):
     username = auth.username 
     password = auth.password 
-    return user_controller.authenticate_user(username, password)
+    return await user_controller.authenticate_user(username, password)
     
 
 @router.post('/refresh', response_model=UserSchema.Token, responses={401: {"model": BaseSchema.FailedResponse, "description": "Refresh Token Invalid or Expired"}})
@@ -114,20 +119,24 @@ async def get_token_from_refresh_token(refresh_token: str = Body(...), ignore:st
 async def update_personal_info(user: UserSchema.UserUpdate = Body(...)):
     if user.id and user.id != context.get("user").get("id"):
         raise CustomException(error="You can only update your account information.", status=status.HTTP_406_NOT_ACCEPTABLE)
-    return user_controller.update_user(user)
+    hashed_password = await passwords.hash_password(user.password) if user.password else None
+    return user_controller.update_user(user, hashed_password)
 
 
 @user_router.put('/update', response_model=UserSchema.User, responses={409: {"model": BaseSchema.FailedResponse, "description": "Account Already Exist."}})
 async def update_user(user: UserSchema.UserUpdate = Body(...), acl: list = Permission("edit", PermissionsSchema.AdminOnlyACL)):
-    return user_controller.update_user(user)
+    hashed_password = await passwords.hash_password(user.password) if user.password else None
+    return user_controller.update_user(user, hashed_password)
 
 
 @user_router.put('/upload/profilephoto', response_model=UserSchema.User, responses = {
     406: {"model": BaseSchema.FailedResponse, "description": "Image Format not supported."},
+    413: {"model": BaseSchema.FailedResponse, "description": "Image too large."},
     500: {"model": BaseSchema.FailedResponse, "description": "Server Error"}
 })
+@filemanagement.max_upload_size(settings.MAX_IMAGE_UPLOAD_BYTES)
 async def upload_profile_photo(file: UploadFile = File(...)):
-    return user_controller.upload_profile_photo(file)
+    return await user_controller.upload_profile_photo(file)
 
 
 @user_router.delete('/delete/{id}', response_model=BaseSchema.SuccessResponse)
@@ -0,0 +1,83 @@
+import types
+
+import pytest
+
+from . import cache
+from .cache import CachedUser, PrincipalCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def user(id, principals=None):
+    return CachedUser(id, True, False, {"id": id, "roles": [{"code": "USER"}]}, principals or [f"user:{id}"])
+
+
+def test_get_returns_a_copy(clock):
+    principals = PrincipalCache(ttl=60, max_size=10)
+    principals.set("uuid-1", user(1))
+    cached = principals.get("uuid-1")
+    assert cached.id == 1
+    assert cached.principals == ["user:1"]
+
+    cached.context["roles"].append({"code": "ADMIN"})
+    cached.principals.append("role:ADMIN")
+    assert principals.get("uuid-1").context["roles"] == [{"code": "USER"}]
+    assert principals.get("uuid-1").principals == ["user:1"]
+
+
+def test_entries_expire_after_ttl(clock):
+    principals = PrincipalCache(ttl=60, max_size=10)
+    principals.set("uuid-1", user(1))
+    clock.now += 60
+    assert principals.get("uuid-1") is not None
+    clock.now += 1
+    assert principals.get("uuid-1") is None
+
+
+def test_least_recently_used_entry_goes_first(clock):
+    principals = PrincipalCache(ttl=60, max_size=2)
+    principals.set("uuid-1", user(1))
+    principals.set("uuid-2", user(2))
+    principals.get("uuid-1")
+    principals.set("uuid-3", user(3))
+    assert principals.get("uuid-2") is None
+    assert principals.get("uuid-1") is not None
+    assert principals.get("uuid-3") is not None
+
+
+def test_invalidate_removes_every_subject_of_the_user(clock):
+    principals = PrincipalCache(ttl=60, max_size=10)
+    principals.set("uuid-1", user(1))
+    principals.set("uuid-1b", user(1))
+    principals.set("uuid-2", user(2))
+    principals.invalidate(1)
+    assert principals.get("uuid-1") is None
+    assert principals.get("uuid-1b") is None
+    assert principals.get("uuid-2") is not None
+    principals.invalidate(3)
+
+
+def test_subject_set_again_belongs_to_the_new_user(clock):
+    principals = PrincipalCache(ttl=60, max_size=10)
+    principals.set("uuid-1", user(1))
+    principals.set("uuid-1", user(2))
+    principals.invalidate(1)
+    assert principals.get("uuid-1").id == 2
+
+
+def test_disabled_cache_stores_nothing(clock):
+    for principals in [PrincipalCache(ttl=0, max_size=10), PrincipalCache(ttl=60, max_size=0)]:
+        principals.set("uuid-1", user(1))
+        assert principals.get("uuid-1") is None
+
+
+def test_clear(clock):
+    principals = PrincipalCache(ttl=60, max_size=10)
+    principals.set("uuid-1", user(1))
+    principals.clear()
+    assert principals.get("uuid-1") is None
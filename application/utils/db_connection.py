@@ -1,15 +1,92 @@
+import asyncio
+import os
+import threading
 import traceback
-
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient
 
 from ..config import Config
+from .pool_stats import mongo_pool_stats, sql_pool_stats
+
+
+engine = create_engine(
+    Config.SQLALCHEMY_DATABASE_URI, 
+    echo=False,
+    pool_size=Config.DB_POOL_SIZE,
+    max_overflow=Config.DB_MAX_OVERFLOW,
+    pool_timeout=Config.DB_POOL_TIMEOUT,
+    pool_recycle=Config.DB_POOL_RECYCLE,
+    pool_pre_ping=Config.DB_POOL_PRE_PING
+)
+SessionLocal = sessionmaker(autocommit=True, autoflush=True, bind=engine)
+sql_pool_stats.attach(engine)
+
+
+class SessionScope:
+    """
+    Session shared by everything running inside one request (or job). The session and its connection are only
+    opened by the first get_db() call of the scope, and kept until the scope is closed: one pool checkout per
+    scope instead of one per get_db() call and statement. The session stays in autocommit mode, every flush is
+    still committed right away.
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._session = None
+
+    def get_session(self):
+        if self._session is None:
+            self._connection = engine.connect()
+            self._session = SessionLocal(bind=self._connection)
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            try:
+                self._session.close()
+            finally:
+                self._connection.close()
+                self._session = None
+                self._connection = None
+
+
+_session_scope: ContextVar = ContextVar("session_scope", default=None)
+
+
+async def request_session_scope():
+    """
+    FastAPI dependency (registered for every route in create_app), opens the SessionScope of the request.
+    It's async so that the scope is set in the request's context, which sync endpoints and dependencies get a copy of.
+    """
+    scope = SessionScope()
+    _session_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        scope.close()
 
 
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, echo=False)
-SessionLocal = sessionmaker(autocommit=True, autoflush=True, bind=engine)
+@contextmanager
+def session_scope():
+    """
+    Same as request_session_scope, for code running outside of a request (gearman and scheduler jobs).
+
+    usage example:
+        with session_scope():
+            process = fdw.FileDataWarehousing(dataset_id=dataset_id)
+    """
+    scope = SessionScope()
+    token = _session_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _session_scope.reset(token)
+        scope.close()
 
 
 def session_hook(func: object) -> object:
@@ -21,9 +98,10 @@ def session_hook(func: object) -> object:
 
     def run(*args, **kwargs):
         global db
+        scope = _session_scope.get()
         # error = False
         try:
-            db = SessionLocal()
+            db = SessionLocal() if scope is None else scope.get_session()
 
             data = func(db, *args, **kwargs)
             # return error, data
@@ -34,13 +112,18 @@ def session_hook(func: object) -> object:
             raise Exception(e)
 
         finally:
-            db.close()
+            if scope is None:
+                db.close()
 
     return run
 
 
 def get_db():
     global db
+    scope = _session_scope.get()
+    if scope is not None:
+        return scope.get_session()
+
     # error = False
     try:
         db = SessionLocal()
@@ -54,11 +137,87 @@ def get_db():
         db.close()
 
 
-def get_staggingdb():
-    global client 
+_mongo_clients = {}
+_mongo_clients_pid = os.getpid()
+_mongo_clients_lock = threading.Lock()
+
+
+def get_mongo_client(uri: str) -> pymongo.MongoClient:
+    """
+    Returns the MongoClient of this process for <uri>, created on first use and shared afterwards. A MongoClient is
+    not fork-safe, a forked process (e.g the gearman worker) starts with an empty registry and builds its own.
+    """
+    global _mongo_clients, _mongo_clients_pid, _mongo_clients_lock
+
+    pid = os.getpid()
+    if pid != _mongo_clients_pid:
+        # the inherited clients (and lock) belong to the parent process, they're dropped without being closed.
+        _mongo_clients = {}
+        _mongo_clients_pid = pid
+        _mongo_clients_lock = threading.Lock()
+
+    client = _mongo_clients.get(uri)
+    if client is not None:
+        return client
+
+    with _mongo_clients_lock:
+        client = _mongo_clients.get(uri)
+        if client is None:
+            client = pymongo.MongoClient(
+                uri,
+                maxPoolSize=Config.MONGODB_MAX_POOL_SIZE,
+                minPoolSize=Config.MONGODB_MIN_POOL_SIZE,
+                connectTimeoutMS=Config.MONGODB_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=Config.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                waitQueueTimeoutMS=Config.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+                event_listeners=[mongo_pool_stats]
+            )
+            _mongo_clients[uri] = client
+    return client
+
+
+_async_mongo_clients = {}
+_async_mongo_clients_pid = os.getpid()
+
+
+def get_async_mongo_client(uri: str) -> AsyncIOMotorClient:
+    """
+    Motor (asyncio) counterpart of get_mongo_client, one client per uri, process and event loop. It must be called
+    from the running loop the client will be used on.
+    """
+    global _async_mongo_clients, _async_mongo_clients_pid
+
+    pid = os.getpid()
+    if pid != _async_mongo_clients_pid:
+        _async_mongo_clients = {}
+        _async_mongo_clients_pid = pid
+
+    loop = asyncio.get_running_loop()
+    client = _async_mongo_clients.get((uri, loop))
+    if client is None:
+        client = AsyncIOMotorClient(
+            uri,
+            io_loop=loop,
+            maxPoolSize=Config.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=Config.MONGODB_MIN_POOL_SIZE,
+            connectTimeoutMS=Config.MONGODB_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=Config.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            waitQueueTimeoutMS=Config.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            event_listeners=[mongo_pool_stats]
+        )
+        _async_mongo_clients[(uri, loop)] = client
+    return client
+
+
+def get_async_mongodb():
+    """get_mongodb for coroutines, every operation is awaited instead of holding a thread."""
+    client = get_async_mongo_client(Config.MONGODB_DATABASE_URI)
+    return client[Config.MONGODB_NAME]
 
+
+def get_staggingdb():
     try:
-        client = pymongo.MongoClient(Config.MONGODB_STAGGING_DATABASE_URI)
+        client = get_mongo_client(Config.MONGODB_STAGGING_DATABASE_URI)
         staggingdb = client[Config.STAGGING_MONGODB_NAME]
         return staggingdb
     except Exception as e: 
@@ -66,12 +225,9 @@ def get_staggingdb():
 
 
 def get_mongodb():
-    global client 
-
     try:
-        client = pymongo.MongoClient(Config.MONGODB_DATABASE_URI)
+        client = get_mongo_client(Config.MONGODB_DATABASE_URI)
         mongodb = client[Config.MONGODB_NAME]
         return mongodb
     except Exception as e: 
         raise Exception(e)
-   
\ No newline at end of file
@@ -1,9 +1,23 @@
+import asyncio
+import hashlib
+import os
 import shutil
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import Callable
+from uuid import uuid4
 
-from fastapi import UploadFile
+import aiofiles
+import aiofiles.os
+from fastapi import Request, Response, UploadFile, status
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from ..base.api_response import CustomException
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# room for the multipart boundaries and the other form fields in the Content-Length of an upload.
+MULTIPART_OVERHEAD = 64 * 1024
 
 
 def save_upload_file(upload_file: UploadFile, destination: Path) -> bool:
@@ -23,6 +37,97 @@ def save_upload_file(upload_file: UploadFile, destination: Path) -> bool:
     return True 
 
 
+async def save_upload_file_async(upload_file: UploadFile, destination: Path, max_size: int = None) -> str:
+    """
+    Streams the upload in chunks to a temporary file beside `destination`, then renames it (atomic on the same
+    filesystem), so a partially written file is never visible at `destination`. Uploads bigger than `max_size`
+    bytes are rejected with a 413: declared sizes by UploadLimitRoute before the body is received, spooled ones
+    here before anything is written, and the byte count while streaming. Returns the SHA-256 of the file, hashed
+    in the threadpool while the chunk is written.
+    """
+    if max_size is not None and _upload_size(upload_file) > max_size:
+        await upload_file.close()
+        raise _file_too_large(max_size)
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary = destination.with_name(f".{destination.name}.{uuid4().hex}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temporary, "wb") as buffer:
+            while True:
+                chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise _file_too_large(max_size)
+                # hashlib releases the GIL on large buffers, the hash and the write run in parallel.
+                await asyncio.gather(run_in_threadpool(sha256.update, chunk), buffer.write(chunk))
+        await aiofiles.os.rename(temporary, destination)
+    except BaseException:
+        if temporary.exists():
+            await aiofiles.os.remove(temporary)
+        raise
+    finally:
+        await upload_file.close()
+    return sha256.hexdigest()
+
+
+def max_upload_size(max_size: int):
+    """
+    Endpoint decorator setting the largest upload the endpoint accepts, checked by UploadLimitRoute. It goes
+    below the router decorator.
+
+    usage example:
+        @router.put('/uploadlogo', response_model=...)
+        @filemanagement.max_upload_size(settings.MAX_IMAGE_UPLOAD_BYTES)
+        async def upload_logo(file: UploadFile = File(...)):
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.max_upload_size = max_size
+        return endpoint
+    return decorator
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Route class of the routers with upload endpoints. A request to an endpoint decorated with max_upload_size
+    whose Content-Length is above the limit is answered with a 413 before its body is received, FastAPI reads and
+    spools a form before the dependencies run. Requests without the header (chunked) are still limited while the
+    file is saved by save_upload_file_async.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        max_size = getattr(self.endpoint, "max_upload_size", None)
+        if max_size is None:
+            return handler
+
+        async def limited_handler(request: Request) -> Response:
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > max_size + MULTIPART_OVERHEAD:
+                raise _file_too_large(max_size)
+            return await handler(request)
+        return limited_handler
+
+
+def _upload_size(upload_file: UploadFile) -> int:
+    # the multipart parser spooled the whole upload already, its size is known without reading it.
+    file = upload_file.file
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size
+
+
+def _file_too_large(max_size: int) -> CustomException:
+    return CustomException(
+        error=f"File too large. The maximum size is {max_size / (1024 * 1024):g} MB.",
+        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    )
+
+
 def copy(source: Path, dest: Path) -> bool:
 
     # create the directory if it does not exist.
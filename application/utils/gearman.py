@@ -1,6 +1,11 @@
-import json 
+import json
+import time
+import traceback
 
-import python3_gearman as gearman 
+import python3_gearman as gearman
+
+from . import job_ledger
+from .job_ledger import JOB_ID_KEY, SUBMITTED_AT_KEY
 
 
 class JSONDataEncoder(gearman.DataEncoder):
@@ -15,8 +20,61 @@ class JSONDataEncoder(gearman.DataEncoder):
 
 
 class JSONGearmanClient(gearman.GearmanClient):
+    """Jobs with dictionary data are recorded in the job ledger (utils.job_ledger) and stamped with their submit time."""
     data_encoder = JSONDataEncoder
 
+    def submit_job(self, task, data, *args, max_attempts=None, **kwargs):
+        if isinstance(data, dict):
+            data = {**data, SUBMITTED_AT_KEY: time.time()}
+            if JOB_ID_KEY not in data:
+                data[JOB_ID_KEY] = job_ledger.record_submission(task, data, max_attempts)
+        return super().submit_job(task, data, *args, **kwargs)
+
 
 class JSONGearmanWorker(gearman.GearmanWorker):
+    """Keeps the job ledger entry of every job up to date, failed jobs are retried or dead-lettered."""
     data_encoder = JSONDataEncoder
+
+    def on_job_execute(self, current_job):
+        data = current_job.data if isinstance(current_job.data, dict) else {}
+        job_id = data.get(JOB_ID_KEY)
+        self._job_error = None
+        if job_id is not None:
+            job_ledger.job_started(job_id)
+        try:
+            return super().on_job_execute(current_job)
+        finally:
+            if job_id is not None:
+                job_ledger.job_finished(job_id, current_job.task, data, self._job_error)
+
+    def on_job_exception(self, current_job, exc_info):
+        self._job_error = ''.join(traceback.format_exception_only(exc_info[0], exc_info[1])).strip()
+        return super().on_job_exception(current_job, exc_info)
+
+
+class PooledGearmanWorker(JSONGearmanWorker):
+    """
+    Worker of a supervised pool (see utils.worker_pool). `drain()` lets the running job finish and stops the work
+    loop at the next poll. Every job is reported to `metrics` (a WorkerMetrics).
+    """
+
+    def __init__(self, host_list, metrics=None):
+        super().__init__(host_list)
+        self._draining = False
+        self._metrics = metrics
+
+    def drain(self):
+        self._draining = True
+
+    def after_poll(self, any_activity):
+        return not self._draining
+
+    def on_job_execute(self, current_job):
+        if self._metrics is None:
+            return super().on_job_execute(current_job)
+        submitted_at = current_job.data.get(SUBMITTED_AT_KEY) if isinstance(current_job.data, dict) else None
+        started = self._metrics.job_started(current_job.task, submitted_at)
+        try:
+            return super().on_job_execute(current_job)
+        finally:
+            self._metrics.job_finished(current_job.task, started, self._job_error is not None)
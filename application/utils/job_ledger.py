@@ -0,0 +1,141 @@
+import datetime
+from typing import Callable, Dict, List
+
+from sqlalchemy import func
+
+from ..base.models import Job
+from ..config import Config
+from .db_connection import get_db, session_scope
+from . import printer
+
+# keys added to the data of tracked jobs.
+JOB_ID_KEY = "_job_id"
+SUBMITTED_AT_KEY = "_submitted_at"
+INTERNAL_KEYS = [JOB_ID_KEY, SUBMITTED_AT_KEY]
+
+_failure_handlers: Dict[str, Callable] = {}
+
+
+def on_failure(task: str):
+    """
+    Registers handler(data, error, dead) called on the worker each time a job of `task` fails, `dead` is True
+    once it won't be retried anymore.
+
+    usage example:
+        @job_ledger.on_failure('dataset.stagging.extract')
+        def mark_dataset_as_failed(data, error, dead): ...
+    """
+    def decorator(handler: Callable):
+        _failure_handlers[task] = handler
+        return handler
+    return decorator
+
+
+def record_submission(task: str, data: dict, max_attempts: int = None) -> int:
+    now = datetime.datetime.utcnow()
+    job = Job(
+        task=task, data={k: v for k, v in data.items() if k not in INTERNAL_KEYS}, status=Job.progress.QUEUED,
+        attempts=0, max_attempts=max_attempts or Config.WORKER_MAX_ATTEMPTS, submitted_at=now, queued_at=now
+    )
+    db = get_db()
+    db.add(job)
+    db.flush()
+    return job.id
+
+
+def job_started(job_id: int):
+    with session_scope():
+        db = get_db()
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job is None:
+            return
+        now = datetime.datetime.utcnow()
+        job.status = Job.progress.RUNNING
+        job.attempts = (job.attempts or 0) + 1
+        job.started_at = now
+        job.queue_wait = (now - job.queued_at).total_seconds()
+        db.add(job)
+        db.flush()
+
+
+def job_finished(job_id: int, task: str, data: dict, error: str = None):
+    """Records the outcome. A failed job is scheduled for a retry with exponential backoff or dead-lettered."""
+    dead = False
+    with session_scope():
+        db = get_db()
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job is None:
+            return
+        now = datetime.datetime.utcnow()
+        job.finished_at = now
+        job.run_time = (now - job.started_at).total_seconds() if job.started_at else None
+        if error is None:
+            job.status = Job.progress.DONE
+            job.error = None
+        else:
+            job.error = error[:2000]
+            if job.attempts >= job.max_attempts:
+                job.status = Job.progress.DEAD
+                dead = True
+            else:
+                job.status = Job.progress.RETRYING
+                job.next_attempt_at = now + datetime.timedelta(seconds=retry_delay(job.attempts))
+        db.add(job)
+        db.flush()
+
+    handler = _failure_handlers.get(task)
+    if error is not None and handler is not None:
+        try:
+            with session_scope():
+                handler(data, error, dead)
+        except Exception as e:
+            printer.rprint(f"Failure handler of {task} failed ({e}).", "utils.job_ledger.job_finished", success=False)
+
+
+def retry_delay(attempts: int) -> float:
+    return min(Config.WORKER_RETRY_BASE_DELAY * 2 ** (attempts - 1), Config.WORKER_RETRY_MAX_DELAY)
+
+
+def resubmit_due_jobs(client) -> int:
+    """Submits again the jobs whose retry time has come. Called periodically by the worker supervisor."""
+    with session_scope():
+        db = get_db()
+        now = datetime.datetime.utcnow()
+        jobs = db.query(Job).filter(Job.status == Job.progress.RETRYING, Job.next_attempt_at <= now).limit(100).all()
+        for job in jobs:
+            requeue(job, client)
+        return len(jobs)
+
+
+def requeue(job: Job, client, reset_attempts: bool = False):
+    db = get_db()
+    job.status = Job.progress.QUEUED
+    job.queued_at = datetime.datetime.utcnow()
+    job.next_attempt_at = None
+    if reset_attempts:
+        job.attempts = 0
+    db.add(job)
+    db.flush()
+    client.submit_job(job.task, {**(job.data or {}), JOB_ID_KEY: job.id}, background=True, wait_until_complete=False)
+
+
+def task_statistics(since: datetime.datetime) -> List[dict]:
+    """Per task counts by status, queue wait and run time (seconds) of the jobs submitted since `since`."""
+    db = get_db()
+    tasks = {}
+    timings = db.query(
+        Job.task, func.count(Job.id), func.avg(Job.queue_wait), func.max(Job.queue_wait),
+        func.avg(Job.run_time), func.max(Job.run_time)
+    ).filter(Job.submitted_at >= since).group_by(Job.task).all()
+    for task, total, wait_avg, wait_max, run_avg, run_max in timings:
+        tasks[task] = {
+            "task": task, "total": total, "statuses": {},
+            "queue_wait_avg": wait_avg, "queue_wait_max": wait_max, "run_time_avg": run_avg, "run_time_max": run_max
+        }
+
+    statuses = db.query(Job.task, Job.status, func.count(Job.id)).filter(
+        Job.submitted_at >= since
+    ).group_by(Job.task, Job.status).all()
+    for task, status, count in statuses:
+        tasks[task]["statuses"][status] = count
+    return list(tasks.values())
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+from pymongo import monitoring
+from sqlalchemy import event
+
+
+class MongoPoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Collects connection pool statistics (CMAP events) of every MongoClient it is registered on, per server address.
+    The events are published on the thread doing the checkout, the wait is measured from check_out_started to
+    checked_out (or check_out_failed).
+
+    usage example:
+        listener = MongoPoolStatsListener()
+        client = pymongo.MongoClient(uri, event_listeners=[listener])
+        listener.snapshot() => {"127.0.0.1:27017": {"open": 3, "checked_out": 1, "wait_ms_max": 0.4, ...}}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._pools = {}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._check_pid()
+            result = {}
+            for address, stats in self._pools.items():
+                stats = dict(stats)
+                checkouts = stats["checkouts"]
+                stats["wait_ms_avg"] = round(stats["wait_ms_total"] / checkouts, 3) if checkouts else 0
+                stats["wait_ms_total"] = round(stats["wait_ms_total"], 3)
+                stats["wait_ms_max"] = round(stats["wait_ms_max"], 3)
+                result[address] = stats
+            return result
+
+    def pool_created(self, event):
+        self._update(event.address, lambda stats: None)
+
+    def pool_cleared(self, event):
+        self._update(event.address, lambda stats: stats.update(cleared=stats["cleared"] + 1))
+
+    def pool_closed(self, event):
+        self._update(event.address, lambda stats: None)
+
+    def connection_created(self, event):
+        self._update(event.address, lambda stats: stats.update(open=stats["open"] + 1, created=stats["created"] + 1))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, lambda stats: stats.update(open=max(stats["open"] - 1, 0)))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        self._update(event.address, lambda stats: stats.update(waiting=stats["waiting"] + 1))
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited()
+
+        def update(stats):
+            stats["waiting"] = max(stats["waiting"] - 1, 0)
+            stats["failed"] += 1
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], waited)
+        self._update(event.address, update)
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+
+        def update(stats):
+            stats["waiting"] = max(stats["waiting"] - 1, 0)
+            stats["checked_out"] += 1
+            stats["checkouts"] += 1
+            stats["wait_ms_total"] += waited
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], waited)
+        self._update(event.address, update)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, lambda stats: stats.update(checked_out=max(stats["checked_out"] - 1, 0)))
+
+    def _waited(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        if started is None:
+            return 0.0
+        return (time.perf_counter() - started) * 1000
+
+    def _update(self, address, update) -> None:
+        key = "%s:%s" % address
+        with self._lock:
+            self._check_pid()
+            stats = self._pools.get(key)
+            if stats is None:
+                stats = {
+                    "open": 0, "created": 0, "checked_out": 0, "waiting": 0, "checkouts": 0, "failed": 0,
+                    "cleared": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0
+                }
+                self._pools[key] = stats
+            update(stats)
+
+    def _check_pid(self) -> None:
+        # counters inherited from a parent process describe the parent's pools.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pools = {}
+
+
+class SQLPoolStats:
+    """
+    Counts the checkouts of a SQLAlchemy engine pool, next to the pool's own status (size, checked in/out, overflow).
+
+    usage example:
+        stats = SQLPoolStats()
+        stats.attach(engine)
+        stats.snapshot() => {"size": 10, "checked_out": 1, "checkouts": 42, ...}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = os.getpid()
+        self._counters = {"connects": 0, "checkouts": 0, "invalidated": 0}
+
+    def attach(self, engine) -> None:
+        self._pool = engine.pool
+        event.listen(engine.pool, "connect", lambda *args: self._increment("connects"))
+        event.listen(engine.pool, "checkout", lambda *args: self._increment("checkouts"))
+        event.listen(engine.pool, "invalidate", lambda *args: self._increment("invalidated"))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._check_pid()
+            result = dict(self._counters)
+        pool = self._pool
+        if pool is not None and hasattr(pool, "checkedout"):
+            result.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        return result
+
+    def _increment(self, counter: str) -> None:
+        with self._lock:
+            self._check_pid()
+            self._counters[counter] += 1
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._counters = {key: 0 for key in self._counters}
+
+
+mongo_pool_stats = MongoPoolStatsListener()
+sql_pool_stats = SQLPoolStats()
@@ -0,0 +1,124 @@
+import contextlib
+import datetime
+
+import pytest
+
+from . import job_ledger
+from ..base.models import Job
+from ..config import Config
+
+
+class FakeSession:
+    """Returns `job` for every query, like a session on a ledger holding that one job."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def query(self, *entities):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def limit(self, count):
+        return self
+
+    def first(self):
+        return self.job
+
+    def all(self):
+        return [self.job]
+
+    def add(self, instance):
+        pass
+
+    def flush(self):
+        pass
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit_job(self, task, data, **kwargs):
+        self.submitted.append((task, data))
+
+
+@pytest.fixture
+def job(monkeypatch):
+    now = datetime.datetime.utcnow()
+    job = Job(
+        id=7, task="dataset.download.export", data={"download_request_id": 3}, status=Job.progress.QUEUED,
+        attempts=0, max_attempts=2, submitted_at=now, queued_at=now
+    )
+    monkeypatch.setattr(job_ledger, "get_db", lambda: FakeSession(job))
+    monkeypatch.setattr(job_ledger, "session_scope", contextlib.nullcontext)
+    monkeypatch.setattr(Config, "WORKER_RETRY_BASE_DELAY", 30.0)
+    monkeypatch.setattr(Config, "WORKER_RETRY_MAX_DELAY", 100.0)
+    return job
+
+
+@pytest.fixture
+def failures(monkeypatch):
+    calls = []
+    monkeypatch.setitem(job_ledger._failure_handlers, "dataset.download.export", lambda *args: calls.append(args))
+    return calls
+
+
+def test_retry_delay_doubles_up_to_the_maximum(job):
+    assert [job_ledger.retry_delay(attempts) for attempts in [1, 2, 3, 4]] == [30.0, 60.0, 100.0, 100.0]
+
+
+def test_job_started_counts_the_attempt(job):
+    job_ledger.job_started(job.id)
+    assert job.status == Job.progress.RUNNING
+    assert job.attempts == 1
+    assert job.queue_wait >= 0
+
+
+def test_successful_job_is_done(job, failures):
+    job_ledger.job_started(job.id)
+    job_ledger.job_finished(job.id, job.task, job.data)
+    assert job.status == Job.progress.DONE
+    assert job.error is None
+    assert job.run_time >= 0
+    assert failures == []
+
+
+def test_failed_job_is_retried_then_dead(job, failures):
+    job_ledger.job_started(job.id)
+    job_ledger.job_finished(job.id, job.task, job.data, "ValueError: boom")
+    assert job.status == Job.progress.RETRYING
+    assert job.error == "ValueError: boom"
+    delay = (job.next_attempt_at - job.finished_at).total_seconds()
+    assert delay == pytest.approx(30.0)
+    assert failures == [(job.data, "ValueError: boom", False)]
+
+    client = FakeClient()
+    assert job_ledger.resubmit_due_jobs(client) == 1
+    assert job.status == Job.progress.QUEUED
+    assert job.next_attempt_at is None
+    assert client.submitted == [(job.task, {"download_request_id": 3, job_ledger.JOB_ID_KEY: job.id})]
+
+    job_ledger.job_started(job.id)
+    job_ledger.job_finished(job.id, job.task, job.data, "ValueError: boom")
+    assert job.attempts == 2
+    assert job.status == Job.progress.DEAD
+    assert failures[-1] == (job.data, "ValueError: boom", True)
+
+
+def test_failure_handler_errors_are_contained(job, monkeypatch):
+    def handler(data, error, dead):
+        raise RuntimeError("handler failed")
+    monkeypatch.setitem(job_ledger._failure_handlers, job.task, handler)
+    job_ledger.job_started(job.id)
+    job_ledger.job_finished(job.id, job.task, job.data, "ValueError: boom")
+    assert job.status == Job.progress.RETRYING
+
+
+def test_requeue_can_reset_the_attempts(job):
+    job.attempts, job.status = 2, Job.progress.DEAD
+    job_ledger.requeue(job, FakeClient(), reset_attempts=True)
+    assert job.status == Job.progress.QUEUED
+    assert job.attempts == 0
@@ -0,0 +1,40 @@
+from .worker_pool import ALL_OTHER_TASKS, WorkerSupervisor, parse_worker_pools
+
+REGISTERED = ["dataset.stagging.extract", "dataset.download.export", "notification.single", "notification.project"]
+
+
+def test_parse_worker_pools():
+    pools = parse_worker_pools("dataset.stagging.extract:2, notification.single|notification.project:4, *:2")
+    assert pools == {"dataset.stagging.extract": 2, "notification.single|notification.project": 4, "*": 2}
+
+
+def test_parse_worker_pools_skips_empty_items():
+    assert parse_worker_pools(" *:3 ,, ") == {"*": 3}
+    assert parse_worker_pools("") == {}
+
+
+def test_assign_tasks_gives_the_rest_to_the_catch_all_pool():
+    pools = WorkerSupervisor._assign_tasks(
+        {"dataset.stagging.extract": 2, "notification.single|notification.project": 4, ALL_OTHER_TASKS: 3}, REGISTERED
+    )
+    assert pools == {
+        "dataset.stagging.extract": (["dataset.stagging.extract"], 2),
+        "notification.single|notification.project": (["notification.single", "notification.project"], 4),
+        ALL_OTHER_TASKS: (["dataset.download.export"], 3),
+    }
+
+
+def test_assign_tasks_catch_all_pool_defaults_to_one_process():
+    pools = WorkerSupervisor._assign_tasks({"dataset.stagging.extract": 2}, REGISTERED)
+    assert pools[ALL_OTHER_TASKS] == (["dataset.download.export", "notification.single", "notification.project"], 1)
+
+
+def test_assign_tasks_ignores_unregistered_tasks():
+    pools = WorkerSupervisor._assign_tasks({"unknown.task": 2, "notification.single|unknown.task": 1}, REGISTERED)
+    assert "unknown.task" not in pools
+    assert pools["notification.single|unknown.task"] == (["notification.single"], 1)
+
+
+def test_assign_tasks_without_other_tasks_has_no_catch_all_pool():
+    pools = WorkerSupervisor._assign_tasks({"|".join(REGISTERED): 2, ALL_OTHER_TASKS: 4}, REGISTERED)
+    assert list(pools) == ["|".join(REGISTERED)]
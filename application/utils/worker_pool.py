@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Dict, List
+
+from ..config import Config
+from .gearman import JSONGearmanClient, PooledGearmanWorker
+from . import job_ledger, printer
+
+WORKER_METRICS_COLLECTION = "rims_worker_metrics"
+ALL_OTHER_TASKS = "*"
+
+
+def parse_worker_pools(value: str) -> Dict[str, int]:
+    """
+    "dataset.stagging.extract:2, notification.single|notification.project:4, *:2" =>
+        {"dataset.stagging.extract": 2, "notification.single|notification.project": 4, "*": 2}
+    Each pool is a group of processes handling only its tasks (separated by |), * stands for every task not
+    assigned to another pool. The number of processes of a pool is the concurrency limit of its tasks.
+    """
+    pools = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        tasks, _, processes = item.rpartition(':')
+        pools[tasks.strip()] = int(processes)
+    return pools
+
+
+class WorkerMetrics:
+    """
+    Jobs in flight, done and failed, with queue latency (submit to start) and run time per task, of one worker
+    process. Published to the rims_worker_metrics collection on every job start and end so the API can read them.
+    """
+
+    def __init__(self, pool: str, mongodb=None):
+        self._lock = threading.Lock()
+        self._mongodb = mongodb
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.pool = pool
+        self.in_flight = 0
+        self.tasks = {}
+
+    def job_started(self, task: str, submitted_at: float = None) -> float:
+        now = time.time()
+        with self._lock:
+            self.in_flight += 1
+            stats = self._task_stats(task)
+            if submitted_at is not None:
+                latency = max(now - submitted_at, 0)
+                stats["queue_latency_s_total"] += latency
+                stats["queue_latency_s_max"] = max(stats["queue_latency_s_max"], latency)
+                stats["queue_latency_s_last"] = latency
+                stats["measured"] += 1
+        self.publish()
+        return now
+
+    def job_finished(self, task: str, started: float, failed: bool = False):
+        duration = time.time() - started
+        with self._lock:
+            self.in_flight -= 1
+            stats = self._task_stats(task)
+            stats["failed" if failed else "done"] += 1
+            stats["run_s_total"] += duration
+            stats["run_s_max"] = max(stats["run_s_max"], duration)
+        self.publish()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            tasks = {}
+            for task, stats in self.tasks.items():
+                stats = dict(stats)
+                finished = stats["done"] + stats["failed"]
+                stats["queue_latency_s_avg"] = stats["queue_latency_s_total"] / stats["measured"] if stats["measured"] else 0
+                stats["run_s_avg"] = stats["run_s_total"] / finished if finished else 0
+                tasks[task.replace('.', '_')] = stats
+            return {"pool": self.pool, "pid": os.getpid(), "in_flight": self.in_flight, "tasks": tasks, "updated_at": time.time()}
+
+    def clear(self):
+        if self._mongodb is not None:
+            self._mongodb[WORKER_METRICS_COLLECTION].delete_one({"_id": self.id})
+
+    def publish(self):
+        if self._mongodb is None:
+            return
+        try:
+            self._mongodb[WORKER_METRICS_COLLECTION].replace_one({"_id": self.id}, self.snapshot(), upsert=True)
+        except Exception as e:
+            printer.rprint(f"Worker metrics not published ({e}).", "utils.worker_pool.WorkerMetrics.publish", success=False)
+
+    def _task_stats(self, task: str) -> dict:
+        stats = self.tasks.get(task)
+        if stats is None:
+            stats = self.tasks[task] = {
+                "done": 0, "failed": 0, "measured": 0, "queue_latency_s_total": 0.0, "queue_latency_s_max": 0.0,
+                "queue_latency_s_last": 0.0, "run_s_total": 0.0, "run_s_max": 0.0
+            }
+        return stats
+
+
+def run_pool_worker(pool: str, tasks: List[str]):
+    """Entry point of a worker process: registers `tasks` only and works until SIGTERM (or SIGINT) drains it."""
+    from ..factory import gm_client, gm_worker
+    from .db_connection import engine, get_mongodb
+
+    # connections inherited from the supervisor belong to it, they are opened again on first use.
+    engine.dispose()
+    gm_client.shutdown()
+    metrics = WorkerMetrics(pool, get_mongodb())
+    worker = PooledGearmanWorker(Config.GEARMAN_WORKER_HOST_LIST, metrics)
+    worker.set_client_id(f"{pool}:{os.getpid()}")
+    for task in tasks:
+        worker.register_task(task, gm_worker.worker_abilities[task])
+
+    def drain(signum, frame):
+        printer.rprint(f"Worker {os.getpid()} draining.", "utils.worker_pool.run_pool_worker")
+        worker.drain()
+    signal.signal(signal.SIGTERM, drain)
+    signal.signal(signal.SIGINT, drain)
+    metrics.publish()
+    worker.work(poll_timeout=Config.WORKER_POLL_TIMEOUT)
+    metrics.clear()
+
+
+class WorkerSupervisor:
+    """
+    Forks the worker processes of every pool, restarts the ones that exit while the supervisor runs, and on
+    SIGTERM/SIGINT forwards the signal so every worker finishes its job before exiting. Failed jobs due for a
+    retry (utils.job_ledger) are submitted again every [worker] retry_sweep_interval seconds.
+
+    usage example:
+        WorkerSupervisor({"dataset.stagging.extract": 2, "*": 4}).run()
+    """
+
+    def __init__(self, pools: Dict[str, int], restart_delay: float = 1.0):
+        from ..factory import gm_worker
+
+        self._context = multiprocessing.get_context("fork")
+        self._restart_delay = restart_delay
+        self._stopping = False
+        self._children: Dict[int, tuple] = {}
+        # not factory.gm_client: the workers are forked from this process and use that one.
+        self._client = JSONGearmanClient(Config.GEARMAN_CLIENT_HOST_LIST)
+        self._pools = self._assign_tasks(pools, list(gm_worker.worker_abilities.keys()))
+
+    @staticmethod
+    def _assign_tasks(pools: Dict[str, int], registered: List[str]) -> Dict[str, tuple]:
+        assigned = {}
+        for name, processes in pools.items():
+            if name == ALL_OTHER_TASKS:
+                continue
+            tasks = [task for task in name.split('|') if task in registered]
+            if tasks:
+                assigned[name] = (tasks, processes)
+        taken = [task for tasks, _ in assigned.values() for task in tasks]
+        others = [task for task in registered if task not in taken]
+        if others:
+            assigned[ALL_OTHER_TASKS] = (others, pools.get(ALL_OTHER_TASKS, 1))
+        return assigned
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for name, (tasks, processes) in self._pools.items():
+            printer.rprint(f"Pool {name}: {processes} process(es) for {', '.join(tasks)}", "utils.worker_pool.WorkerSupervisor")
+            for _ in range(processes):
+                self._start(name, tasks)
+
+        last_sweep = 0
+        while self._children:
+            if not self._stopping and time.time() - last_sweep >= Config.WORKER_RETRY_SWEEP_INTERVAL:
+                self._resubmit_due_jobs()
+                last_sweep = time.time()
+            for pid, (name, tasks, process) in list(self._children.items()):
+                if process.is_alive():
+                    continue
+                process.join()
+                del self._children[pid]
+                self._clear_metrics(pid)
+                if not self._stopping:
+                    printer.rprint(
+                        f"Worker {pid} of pool {name} exited with code {process.exitcode}, restarting.",
+                        "utils.worker_pool.WorkerSupervisor", success=False
+                    )
+                    time.sleep(self._restart_delay)
+                    self._start(name, tasks)
+            time.sleep(0.5)
+
+    def _resubmit_due_jobs(self):
+        try:
+            job_ledger.resubmit_due_jobs(self._client)
+        except Exception as e:
+            printer.rprint(f"Job retries not submitted ({e}).", "utils.worker_pool.WorkerSupervisor", success=False)
+
+    @staticmethod
+    def _clear_metrics(pid: int):
+        from .db_connection import get_mongodb
+        try:
+            get_mongodb()[WORKER_METRICS_COLLECTION].delete_one({"_id": f"{socket.gethostname()}:{pid}"})
+        except Exception:
+            pass
+
+    def _start(self, name: str, tasks: List[str]):
+        process = self._context.Process(target=run_pool_worker, args=(name, tasks), name=f"worker-{name}")
+        process.start()
+        self._children[process.pid] = (name, tasks, process)
+
+    def _stop(self, signum, frame):
+        if self._stopping:
+            return
+        self._stopping = True
+        printer.rprint("Stopping, waiting for running jobs to finish.", "utils.worker_pool.WorkerSupervisor")
+        for _, _, process in self._children.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
@@ -0,0 +1,99 @@
+"""
+Microbenchmark: per-cell BSON coercion loop (previously used in FileDataWarehousing and the manual data
+controllers) against the column-wise BSONCoercer.
+
+The rows are shaped like the ones frictionless produces for a numeric and date heavy file, they are generated in
+memory so that only the coercion cost is measured, chunk by chunk like the loaders do.
+
+usage:
+    python -m benchmarks.bench_coercion [--rows 1000000] [--chunk 1000]
+"""
+import argparse
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from bson.decimal128 import Decimal128
+
+from application.project.helpers import MAX_INTEGER
+from application.project.plugins.coercion import BSONCoercer
+
+
+SCHEMA = {
+    "name": "string", "age": "integer", "income": "number", "score": "number", "visits": "integer",
+    "born": "date", "visited": "date", "updated": "datetime", "active": "boolean", "city": "string",
+}
+
+
+def make_chunk(size: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    base = datetime.date(1950, 1, 1)
+    rows = []
+    for i in range(size):
+        rows.append({
+            "name": f"respondent {i}",
+            "age": rnd.randint(0, 99),
+            "income": Decimal(f"{rnd.randint(0, 10 ** 6)}.{rnd.randint(0, 99):02d}"),
+            "score": Decimal(f"{rnd.random():.4f}"),
+            "visits": rnd.randint(0, 10 ** 4),
+            "born": base + datetime.timedelta(days=rnd.randint(0, 20000)),
+            "visited": base + datetime.timedelta(days=rnd.randint(20000, 26000)),
+            "updated": datetime.datetime(2021, 1, 1, 12, 30),
+            "active": rnd.random() > 0.5,
+            "city": rnd.choice(["Douala", "Yaounde", "Buea", "Bamenda"]),
+        })
+    return rows
+
+
+def per_cell_loop(rows: list) -> list:
+    max_int = MAX_INTEGER
+    for row in rows:
+        for key, val in row.items():
+            if type(val) == Decimal:
+                row[key] = Decimal128(val)
+            if type(val) == int and val > max_int:
+                row[key] = Decimal128(Decimal(val))
+            if type(val) == datetime.date:
+                row[key] = datetime.datetime(year=val.year, month=val.month, day=val.day, hour=0, minute=0, second=0)
+    return rows
+
+
+def coercer_rows(rows: list) -> list:
+    return BSONCoercer(SCHEMA).coerce_rows(rows)
+
+
+def coercer_columns(rows: list) -> list:
+    names = list(SCHEMA.keys())
+    columns = [[row[name] for row in rows] for name in names]
+    BSONCoercer(SCHEMA).coerce_columns(names, columns)
+    return columns
+
+
+def run(total_rows: int, chunk_size: int) -> None:
+    timings = {"per-cell loop": 0.0, "BSONCoercer.coerce_rows": 0.0, "BSONCoercer.coerce_columns": 0.0}
+    functions = {"per-cell loop": per_cell_loop, "BSONCoercer.coerce_rows": coercer_rows, "BSONCoercer.coerce_columns": coercer_columns}
+    done = 0
+    seed = 0
+    while done < total_rows:
+        size = min(chunk_size, total_rows - done)
+        for label, func in functions.items():
+            chunk = make_chunk(size, seed)
+            start = time.perf_counter()
+            func(chunk)
+            timings[label] += time.perf_counter() - start
+        done += size
+        seed += 1
+
+    baseline = timings["per-cell loop"]
+    print(f"rows: {total_rows}, chunk: {chunk_size}")
+    for label, seconds in timings.items():
+        print(f"{label:<28} {seconds:8.3f}s  {baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.rows, args.chunk)
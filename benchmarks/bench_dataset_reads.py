@@ -0,0 +1,84 @@
+"""
+Load test: GET /datasets/{id}/data through the sync controller on the threadpool (read.get_dataset_data, previous
+behaviour) against the coroutine controller (aio.get_dataset_data) on the event loop.
+
+Both paths run the whole controller: the dataset query on MySQL, the page and count reads on Mongo, the query
+stats and the response. Every simulated request opens its own SessionScope like request_session_scope, so each one
+checks a connection out of the SQL pool. The sync path runs every request on a thread pool of --threads workers,
+the size of the pool sync endpoints run on; the async path runs the requests on the event loop and its SQL steps on
+the same pool (run_in_threadpool uses the loop's default executor).
+
+Runs against the databases of config.ini, on a dataset that already has rows.
+
+usage:
+    python -m benchmarks.bench_dataset_reads --dataset-id 12 [--requests 2000] [--concurrency 200] [--threads 40]
+        [--limit 100] [--count estimated]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from application.project.dataset.controller import aio, read
+from application.utils import db_connection
+
+
+def sync_request(args) -> None:
+    with db_connection.session_scope():
+        read.get_dataset_data(args.dataset_id, limit=args.limit, count=args.count)
+
+
+async def async_request(args) -> None:
+    with db_connection.session_scope():
+        await aio.get_dataset_data(args.dataset_id, limit=args.limit, count=args.count)
+
+
+async def run(label: str, request, total: int, concurrency: int) -> None:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            start = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed() for _ in range(total)])
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<12} {total / seconds:9.1f} req/s  p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+
+
+async def main(args) -> None:
+    executor = ThreadPoolExecutor(max_workers=args.threads)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(executor)
+
+    async def threadpool_request():
+        await loop.run_in_executor(executor, sync_request, args)
+
+    async def motor_request():
+        await async_request(args)
+
+    print(
+        f"dataset: {args.dataset_id}, requests: {args.requests}, concurrency: {args.concurrency}, "
+        f"threads: {args.threads}, page: {args.limit} rows, count: {args.count}"
+    )
+    await run("threadpool", threadpool_request, args.requests, args.concurrency)
+    await run("motor", motor_request, args.requests, args.concurrency)
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset-id", type=int, required=True)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--count", default="estimated", choices=["estimated", "exact", "none"])
+    asyncio.run(main(parser.parse_args()))
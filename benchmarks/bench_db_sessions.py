@@ -0,0 +1,73 @@
+"""
+Load test: pool checkouts per request with one session per get_db() call (previous behaviour, still used outside of
+a request) against the request-scoped session.
+
+Every simulated request does what a dataset endpoint does: the controller, the permission check, User.role and
+create_log_item each call get_db() and run their queries. The requests run concurrently on a thread pool, each in
+its own context like FastAPI requests.
+
+usage:
+    python -m benchmarks.bench_db_sessions [--uri sqlite:////tmp/bench.db] [--requests 2000] [--concurrency 16]
+"""
+import argparse
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from application.utils import db_connection
+from application.utils.pool_stats import SQLPoolStats
+
+
+HELPERS_PER_REQUEST = 4
+QUERIES_PER_HELPER = 2
+
+
+def handle_request() -> None:
+    for _ in range(HELPERS_PER_REQUEST):
+        db = db_connection.get_db()
+        for _ in range(QUERIES_PER_HELPER):
+            db.execute(text("SELECT 1")).fetchall()
+
+
+def legacy_request() -> None:
+    handle_request()
+
+
+def scoped_request() -> None:
+    with db_connection.session_scope():
+        handle_request()
+
+
+def run(label: str, request, total: int, concurrency: int, stats: SQLPoolStats) -> None:
+    before = stats.snapshot()["checkouts"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, request) for _ in range(total)]
+        for future in futures:
+            future.result()
+    seconds = time.perf_counter() - start
+    checkouts = stats.snapshot()["checkouts"] - before
+    print(f"{label:<16} {total / seconds:9.1f} req/s  {checkouts / total:6.2f} checkouts/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="sqlite:////tmp/bench_db_sessions.db")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    connect_args = {"check_same_thread": False} if args.uri.startswith("sqlite") else {}
+    engine = create_engine(args.uri, poolclass=QueuePool, pool_size=args.concurrency, max_overflow=0, connect_args=connect_args)
+    db_connection.engine = engine
+    db_connection.SessionLocal = sessionmaker(autocommit=True, autoflush=True, bind=engine)
+    stats = SQLPoolStats()
+    stats.attach(engine)
+
+    print(f"requests: {args.requests}, concurrency: {args.concurrency}, get_db() calls per request: {HELPERS_PER_REQUEST}")
+    run("session per call", legacy_request, args.requests, args.concurrency, stats)
+    run("request scoped", scoped_request, args.requests, args.concurrency, stats)
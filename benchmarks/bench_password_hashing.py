@@ -0,0 +1,65 @@
+"""
+Load test: logins hashing on the event loop (previous behaviour) against logins hashing on the password executor.
+
+A single event loop serves concurrent logins (one bcrypt verification each) mixed with light requests that only
+yield to the loop, like an endpoint answered from the caches. With inline hashing every light request waits behind
+the logins in progress; with the executor it is served right away and the logins run in parallel on the cores.
+
+usage:
+    python -m benchmarks.bench_password_hashing [--logins 32] [--requests 400] [--rounds 12]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+from application.session import passwords
+
+
+async def inline_login(password: str, hashed: str) -> None:
+    passwords.pwd_context.verify_and_update(password, hashed)
+
+
+async def executor_login(password: str, hashed: str) -> None:
+    await passwords.verify_password(password, hashed)
+
+
+async def light_request(latencies: list) -> None:
+    start = time.perf_counter()
+    await asyncio.sleep(0)
+    latencies.append(time.perf_counter() - start)
+
+
+async def run(label: str, login, password: str, hashed: str, logins: int, requests: int) -> None:
+    latencies = []
+    start = time.perf_counter()
+    tasks = []
+    for i in range(max(logins, requests)):
+        if i < logins:
+            tasks.append(asyncio.ensure_future(login(password, hashed)))
+        if i < requests:
+            tasks.append(asyncio.ensure_future(light_request(latencies)))
+    await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<10} {logins / seconds:7.1f} logins/s  light requests p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    passwords.pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=args.rounds)
+    password = "correct horse battery staple"
+    hashed = passwords.pwd_context.hash(password)
+
+    print(f"logins: {args.logins}, light requests: {args.requests}, bcrypt rounds: {args.rounds}, workers: {passwords._executor._max_workers}")
+    asyncio.run(run("inline", inline_login, password, hashed, args.logins, args.requests))
+    asyncio.run(run("executor", executor_login, password, hashed, args.logins, args.requests))
@@ -1,13 +1,21 @@
+import sys
+
+from application.config import settings
 from application.factory import gm_worker
+from application.utils.worker_pool import WorkerSupervisor, parse_worker_pools
 
 if __name__ == '__main__':
-    try:
-        print('Background job workers initialized and ready for work')
-        gm_worker.work()
-    except KeyboardInterrupt:
+    if '--single' in sys.argv:
+        # one process running every task, one job at a time.
+        try:
+            print('Background job workers initialized and ready for work')
+            gm_worker.work()
+        except KeyboardInterrupt:
+            print('Exiting')
+            pass
+        except Exception as e:
+            print('Exiting - %s' % e)
+    else:
+        print('Background job worker pools starting')
+        WorkerSupervisor(parse_worker_pools(settings.WORKER_POOLS)).run()
         print('Exiting')
-        pass
-    except Exception as e:
-        print('Exiting - %s' % e)
-
-    
\ No newline at end of file